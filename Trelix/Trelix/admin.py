@@ -1,6 +1,17 @@
 
 from django.contrib import admin
+from .models import BackgroundJob
 
 admin.site.site_header = "Trelix E-Learning Admin"
 admin.site.site_title = "Trelix Admin Portal"
 admin.site.index_title = "Welcome to Trelix Administration"
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('key', 'task', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status', 'task')
+    search_fields = ('key',)
+    readonly_fields = ('result', 'error', 'attempts', 'created_at', 'updated_at')
+    ordering = ('-created_at',)
+    list_per_page = 20
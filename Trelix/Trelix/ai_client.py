@@ -0,0 +1,427 @@
+"""
+Access to the AI providers (Gemini, Hugging Face router, Hugging Face image
+inference, NLP Cloud) used by the app. Every AI call goes through this module
+so they all share:
+
+- pooled connections: one requests.Session per thread for sync code; for
+  async views, one httpx.AsyncClient on the process' AI event loop, a daemon
+  thread the calls are handed to. Under WSGI every async view runs on an
+  event loop of its own: the client and limits must not depend on it
+- a default timeout (AI_HTTP_TIMEOUT) and retries with exponential backoff
+  (AI_HTTP_RETRIES, AI_HTTP_BACKOFF) on timeouts, connection errors, 429 and 5xx
+- a concurrency limit per provider (AI_MAX_CONCURRENCY); callers wait at most
+  AI_QUEUE_TIMEOUT seconds for a slot
+- a circuit breaker per provider: after AI_CIRCUIT_FAILURES failed calls in a
+  row (a call fails once its retries are exhausted, or when it is interrupted),
+  calls fail immediately for AI_CIRCUIT_RESET seconds, then a single trial
+  call decides whether the provider is back
+
+so an outage fails fast instead of piling up blocked workers.
+
+Functions come in pairs: gemini_generate_content for sync code (views,
+background jobs) and agemini_generate_content for async views. NLP Cloud
+summaries are only made by async views (anlpcloud_summarize).
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CONNECT_TIMEOUT = 10
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+_local = threading.local()
+_ai_loop = None
+_ai_loop_lock = threading.Lock()
+_async_client = None
+
+
+class AIProviderError(Exception):
+    """An AI provider answered with an error or an unexpected payload."""
+
+    def __init__(self, provider, message, status_code=None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class AIProviderUnavailable(AIProviderError):
+    """The call was refused without reaching the provider (open circuit or no free slot)."""
+
+
+class Provider:
+    """Circuit breaker and concurrency limits of one AI provider, shared by the process."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+            self._slots = threading.BoundedSemaphore(self.max_concurrency)
+            # Created on the AI loop on first use (see aslot)
+            self._async_slots = None
+
+    @property
+    def max_concurrency(self):
+        return settings.AI_MAX_CONCURRENCY.get(self.name, 10)
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= settings.AI_CIRCUIT_RESET:
+            return HALF_OPEN
+        return OPEN
+
+    def before_call(self):
+        """Raise AIProviderUnavailable while the circuit is open."""
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return
+            # Half-open: let one trial call through, keep refusing the others
+            if state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+        raise AIProviderUnavailable(self.name, "provider failing, circuit open")
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("AI provider %s is back, closing circuit", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """A call failed after all its retries, or did not finish."""
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            # A failed trial re-opens the circuit for a full period
+            if self.opened_at is not None or self.failures >= settings.AI_CIRCUIT_FAILURES:
+                if self.opened_at is None:
+                    logger.warning("AI provider %s failed %s times in a row, opening circuit",
+                                   self.name, self.failures)
+                self.opened_at = time.monotonic()
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(timeout=settings.AI_QUEUE_TIMEOUT):
+            raise AIProviderUnavailable(self.name, "too many concurrent calls")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        # Only used on the AI loop: a single semaphore per process
+        slots = self._async_slots
+        if slots is None:
+            slots = self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(slots.acquire(), settings.AI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise AIProviderUnavailable(self.name, "too many concurrent calls")
+        try:
+            yield
+        finally:
+            slots.release()
+
+
+PROVIDERS = {name: Provider(name) for name in ("gemini", "huggingface", "imagegen", "nlpcloud")}
+
+
+def get_provider(name):
+    return PROVIDERS[name]
+
+
+@receiver(setting_changed)
+def reset_providers(setting, **kwargs):
+    # Limits are read when the semaphores are created (override_settings in tests)
+    if setting.startswith("AI_"):
+        for provider in PROVIDERS.values():
+            provider.reset()
+        _close_async_client()
+        if hasattr(_local, "session"):
+            del _local.session
+
+
+def get_session():
+    """Session of the current thread, keeping its connections alive between calls."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=settings.AI_HTTP_MAX_CONNECTIONS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def get_ai_loop():
+    """Event loop running the async AI calls of the process, in a daemon thread (started on first use)."""
+    global _ai_loop
+    with _ai_loop_lock:
+        if _ai_loop is None:
+            _ai_loop = asyncio.new_event_loop()
+            threading.Thread(target=_ai_loop.run_forever, name="trelix-ai", daemon=True).start()
+        return _ai_loop
+
+
+async def _on_ai_loop(coro):
+    """Run coro on the AI loop and wait for it; cancelling the caller cancels it too."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_ai_loop()))
+
+
+def get_async_client():
+    """Client of the AI loop, shared by every async call of the process (created on first use)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.AI_HTTP_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+    return _async_client
+
+
+def _close_async_client():
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None and _ai_loop is not None:
+        asyncio.run_coroutine_threadsafe(client.aclose(), _ai_loop)
+
+
+def _check(name, status_code, text):
+    """
+    Returns:
+        AIProviderError or None: the error of a non-200 answer
+    """
+    if status_code == 200:
+        return None
+    return AIProviderError(name, f"API returned status {status_code}: {text[:200]}", status_code)
+
+
+def _send(name, method, url, **kwargs):
+    provider = get_provider(name)
+    retries = settings.AI_HTTP_RETRIES
+    with provider.slot():
+        provider.before_call()
+        finished = False
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    response = get_session().request(
+                        method, url, timeout=(CONNECT_TIMEOUT, settings.AI_HTTP_TIMEOUT), **kwargs
+                    )
+                except requests.RequestException as e:
+                    error = AIProviderError(name, f"{type(e).__name__}: {e}")
+                else:
+                    error = _check(name, response.status_code, response.text)
+                    if error is None or error.status_code not in RETRY_STATUSES:
+                        # The provider is up, even when it refused the request itself (4xx)
+                        finished = True
+                        provider.record_success()
+                        if error is not None:
+                            raise error
+                        return response
+                if attempt < retries:
+                    time.sleep(settings.AI_HTTP_BACKOFF * (2 ** attempt))
+            raise error
+        finally:
+            # Retries exhausted, or interrupted (unexpected exception): one failure
+            # per call, which also ends a half-open trial
+            if not finished:
+                provider.record_failure()
+
+
+async def _asend(name, method, url, **kwargs):
+    return await _on_ai_loop(_asend_on_ai_loop(name, method, url, **kwargs))
+
+
+async def _asend_on_ai_loop(name, method, url, **kwargs):
+    provider = get_provider(name)
+    retries = settings.AI_HTTP_RETRIES
+    async with provider.aslot():
+        provider.before_call()
+        finished = False
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    response = await get_async_client().request(method, url, **kwargs)
+                except httpx.HTTPError as e:
+                    error = AIProviderError(name, f"{type(e).__name__}: {e}")
+                else:
+                    error = _check(name, response.status_code, response.text)
+                    if error is None or error.status_code not in RETRY_STATUSES:
+                        finished = True
+                        provider.record_success()
+                        if error is not None:
+                            raise error
+                        return response
+                if attempt < retries:
+                    await asyncio.sleep(settings.AI_HTTP_BACKOFF * (2 ** attempt))
+            raise error
+        finally:
+            # Also reached on cancellation (client gone, task timeout)
+            if not finished:
+                provider.record_failure()
+
+
+def _json(name, response, *path):
+    try:
+        value = response.json()
+        for key in path:
+            value = value[key]
+        return value
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise AIProviderError(name, f"Unexpected response: {e!r}") from e
+
+
+# -- Hugging Face router (OpenAI compatible chat completions) --
+
+def _chat_request(model, messages):
+    return ("huggingface", "POST", f"{settings.HF_ROUTER_URL.rstrip('/')}/chat/completions"), {
+        "headers": {"Authorization": f"Bearer {settings.HF_API_TOKEN}"},
+        "json": {"model": model, "messages": messages},
+    }
+
+
+def hf_chat_completion(model, messages):
+    """
+    Chat completion through the Hugging Face router (what InferenceClient calls).
+
+    Returns:
+        str: content of the first choice
+    """
+    args, kwargs = _chat_request(model, messages)
+    return _json("huggingface", _send(*args, **kwargs), "choices", 0, "message", "content")
+
+
+async def ahf_chat_completion(model, messages):
+    """Async counterpart of hf_chat_completion."""
+    args, kwargs = _chat_request(model, messages)
+    return _json("huggingface", await _asend(*args, **kwargs), "choices", 0, "message", "content")
+
+
+# -- Gemini --
+
+def _gemini_headers():
+    return {"x-goog-api-key": settings.GOOGLE_API_KEY or ""}
+
+
+def _generate_request(model, prompt, generation_config=None):
+    model = model.replace('models/', '', 1) if model.startswith('models/') else model
+    body = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return ("gemini", "POST", f"{settings.GEMINI_API_URL.rstrip('/')}/models/{model}:generateContent"), {
+        "headers": _gemini_headers(),
+        "json": body,
+    }
+
+
+def _candidate_text(response):
+    parts = _json("gemini", response, "candidates", 0, "content", "parts")
+    return "".join(part.get("text", "") for part in parts)
+
+
+def gemini_generate_content(model, prompt, generation_config=None):
+    """
+    Gemini generateContent REST call.
+
+    Args:
+        model: model name, with or without the "models/" prefix
+        prompt: text prompt
+        generation_config: optional REST generationConfig (temperature, topP, maxOutputTokens, ...)
+
+    Returns:
+        str: text of the first candidate
+    """
+    args, kwargs = _generate_request(model, prompt, generation_config)
+    return _candidate_text(_send(*args, **kwargs))
+
+
+async def agemini_generate_content(model, prompt, generation_config=None):
+    """Async counterpart of gemini_generate_content."""
+    args, kwargs = _generate_request(model, prompt, generation_config)
+    return _candidate_text(await _asend(*args, **kwargs))
+
+
+def gemini_list_models():
+    """
+    Returns:
+        list: names of the models available to the API key ("models/...")
+    """
+    response = _send("gemini", "GET", f"{settings.GEMINI_API_URL.rstrip('/')}/models",
+                     headers=_gemini_headers(), params={"pageSize": 1000})
+    return [model["name"] for model in _json("gemini", response, "models")]
+
+
+# -- Hugging Face image inference --
+
+def _image_request(prompt):
+    return ("imagegen", "POST", settings.IMAGEGEN_API_URL), {
+        "headers": {"Authorization": f"Bearer {settings.IMAGEGEN_KEY}"},
+        "json": {"inputs": prompt},
+    }
+
+
+def hf_text_to_image(prompt):
+    """
+    Stable Diffusion XL on the Hugging Face inference API.
+
+    Returns:
+        bytes: the image
+    """
+    args, kwargs = _image_request(prompt)
+    return _send(*args, **kwargs).content
+
+
+async def ahf_text_to_image(prompt):
+    """Async counterpart of hf_text_to_image."""
+    args, kwargs = _image_request(prompt)
+    return (await _asend(*args, **kwargs)).content
+
+
+# -- NLP Cloud --
+
+def _summarization_request(text, min_length, max_length):
+    url = f"{settings.NLP_CLOUD_BASE_URL.rstrip('/')}/{settings.NLP_CLOUD_MODEL}/summarization"
+    return ("nlpcloud", "POST", url), {
+        "headers": {"Authorization": f"Token {settings.NLP_CLOUD_API_KEY}"},
+        "json": {"text": text, "min_length": min_length, "max_length": max_length},
+        "timeout": settings.SUMMARY_TIMEOUT,
+    }
+
+
+async def anlpcloud_summarize(text, min_length=50, max_length=300):
+    """
+    NLP Cloud summarization (model settings.NLP_CLOUD_MODEL).
+
+    Returns:
+        str: the summary text
+    """
+    args, kwargs = _summarization_request(text, min_length, max_length)
+    return _json("nlpcloud", await _asend(*args, **kwargs), "summary_text") or ""
@@ -0,0 +1,209 @@
+"""
+Rate-limited queue for AI generation jobs (quizzes, flashcards, ...).
+
+Requests from views become BackgroundJob rows (see Trelix/jobs.py) instead of
+calling the AI provider in the request:
+
+- coalescing: the job key describes the work (e.g. chapter + text hash), so
+  identical requests made while a job is pending or running share it and
+  cost nothing
+- quotas: a new job takes a token from the user's bucket and from the global
+  bucket; an empty bucket raises RateLimited with the time to wait
+- priority: instructors' jobs run before students' ones
+
+Token buckets live in the database by default (DatabaseBucketStore), shared
+by every worker process without Redis; LocalBucketStore keeps them in process
+memory for single-process deployments and development.
+
+Settings:
+    AI_RATE_LIMIT_BACKEND: dotted path of the bucket store class
+    AI_JOB_USER_BURST, AI_JOB_USER_PER_HOUR: per-user bucket size and refill rate
+    AI_JOB_GLOBAL_BURST, AI_JOB_GLOBAL_PER_MINUTE: same for all users together
+    AI_JOB_INSTRUCTOR_PRIORITY: priority of jobs queued by instructors
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import enqueue
+from .models import BackgroundJob, RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+AI_JOB_PREFIX = "ai-"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class RateLimited(Exception):
+    """A quota is exhausted: the request may be retried after retry_after seconds."""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Too many AI requests ({scope} quota), retry in {retry_after:.0f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def refill(tokens, elapsed, capacity, rate, cost):
+    """
+    Token bucket step.
+
+    Returns:
+        tuple: (tokens left, seconds to wait; 0 when the cost was taken)
+    """
+    tokens = min(capacity, tokens + elapsed * rate)
+    if tokens >= cost:
+        return tokens - cost, 0
+    return tokens, (cost - tokens) / rate
+
+
+class LocalBucketStore:
+    """Buckets in process memory: each worker process has its own quotas."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Returns:
+            float: 0 if the tokens were taken, else seconds until they are available
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, wait = refill(tokens, now - updated, capacity, rate, cost)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+    def give(self, key, capacity, cost=1):
+        """Return tokens taken for a request that was not queued after all."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, time.monotonic()))
+            self._buckets[key] = (min(capacity, tokens + cost), updated)
+
+
+class DatabaseBucketStore:
+    """Buckets as RateLimitBucket rows, locked while updated: quotas hold across processes."""
+
+    def take(self, key, capacity, rate, cost=1):
+        with transaction.atomic():
+            bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+                key=key, defaults={'tokens': capacity, 'updated_at': timezone.now()}
+            )
+            now = timezone.now()
+            elapsed = max(0, (now - bucket.updated_at).total_seconds())
+            bucket.tokens, wait = refill(bucket.tokens, elapsed, capacity, rate, cost)
+            bucket.updated_at = now
+            bucket.save(update_fields=['tokens', 'updated_at'])
+            return wait
+
+    def give(self, key, capacity, cost=1):
+        with transaction.atomic():
+            bucket = RateLimitBucket.objects.select_for_update().filter(key=key).first()
+            if bucket:
+                bucket.tokens = min(capacity, bucket.tokens + cost)
+                bucket.save(update_fields=['tokens'])
+
+
+def get_bucket_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(settings.AI_RATE_LIMIT_BACKEND)()
+        return _store
+
+
+@receiver(setting_changed)
+def reset_bucket_store(setting, **kwargs):
+    global _store
+    if setting == 'AI_RATE_LIMIT_BACKEND':
+        _store = None
+
+
+def user_quota():
+    return settings.AI_JOB_USER_BURST, settings.AI_JOB_USER_PER_HOUR / 3600
+
+
+def global_quota():
+    return settings.AI_JOB_GLOBAL_BURST, settings.AI_JOB_GLOBAL_PER_MINUTE / 60
+
+
+def take_tokens(user):
+    """
+    Charge one AI job to the user's and the global bucket.
+
+    Raises:
+        RateLimited: when either bucket is empty (nothing is charged then)
+    """
+    store = get_bucket_store()
+    user_key = f"ai-user:{user.pk}"
+    capacity, rate = user_quota()
+    wait = store.take(user_key, capacity, rate)
+    if wait:
+        logger.info("AI quota of user %s exhausted, retry in %.0fs", user.pk, wait)
+        raise RateLimited('user', wait)
+
+    wait = store.take("ai-global", *global_quota())
+    if wait:
+        store.give(user_key, capacity)
+        logger.warning("Global AI quota exhausted, retry in %.0fs", wait)
+        raise RateLimited('global', wait)
+
+
+def is_instructor(user):
+    if user.is_staff:
+        return True
+    profile = getattr(user, 'profile', None)
+    return bool(profile and profile.user_type == 'instructor')
+
+
+def job_priority(user):
+    return settings.AI_JOB_INSTRUCTOR_PRIORITY if is_instructor(user) else 0
+
+
+def submit_ai_job(user, task, key, payload=None):
+    """
+    Queue an AI generation job for a user, or join the identical one already queued.
+
+    Args:
+        user: requesting user (quota and priority)
+        task: dotted path of the task function
+        key: describes the work; requests with the same key share a job
+        payload: keyword arguments of the task
+
+    Returns:
+        BackgroundJob
+    Raises:
+        RateLimited: the user or global quota is exhausted
+    """
+    key = f"{AI_JOB_PREFIX}{key}"
+    priority = job_priority(user)
+    queued = BackgroundJob.objects.filter(
+        key=key, status__in=[BackgroundJob.PENDING, BackgroundJob.RUNNING]
+    ).exists()
+    if not queued:
+        take_tokens(user)
+    return enqueue(task, key=key, payload=payload, priority=priority)
+
+
+def ai_job_state(job):
+    """
+    Returns:
+        dict: {'status', 'result' (when done), 'error' (when failed)} as sent to the page
+    """
+    state = {'status': job.status}
+    if job.status == BackgroundJob.DONE:
+        state['result'] = job.result
+    elif job.status == BackgroundJob.FAILED:
+        # The traceback stays in the job row, the page gets its last line
+        state['error'] = job.error.strip().splitlines()[-1] if job.error else "Generation failed"
+    return state
@@ -0,0 +1,187 @@
+"""
+Database-backed background job queue.
+
+Jobs are BackgroundJob rows identified by an idempotency key: enqueueing the
+same key while a job is pending or running returns the existing job instead
+of scheduling a second one. Pending jobs of the default queue are executed
+by a small in-process thread pool right after the enqueueing transaction
+commits, highest priority first; the `run_jobs` management command drains
+whatever is left (e.g. after a restart) and can be run as a dedicated worker.
+
+Jobs of other queues (long ones, e.g. video transcoding) never run in the
+web processes: they wait for `run_jobs --queue <name>`, so they can't hold
+the pool needed by certificates and AI generations.
+
+Settings:
+    JOBS_WORKERS: size of the in-process worker pool (default 2)
+    JOBS_EAGER: run jobs synchronously on enqueue (useful in tests/dev)
+    JOBS_STALE_AFTER: seconds after which a running job of a queue is
+        considered dead and re-queued; longer than the queue's longest job
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = 'default'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Lazily create the process-wide worker pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_WORKERS', 2),
+                thread_name_prefix='trelix-jobs',
+            )
+        return _executor
+
+
+def enqueue(task, key, payload=None, priority=0, queue=DEFAULT_QUEUE):
+    """
+    Schedule `task` (dotted path to a function) with keyword arguments `payload`
+    on `queue`.
+
+    Idempotent per key: a pending or running job is returned as is (a pending
+    one is raised to `priority` if lower); a finished job is reset to pending
+    and scheduled again, so tasks must themselves be safe to re-run.
+
+    Returns:
+        BackgroundJob
+    """
+    job, created = BackgroundJob.objects.get_or_create(
+        key=key,
+        defaults={'task': task, 'payload': payload or {}, 'priority': priority, 'queue': queue},
+    )
+
+    if not created:
+        requeued = BackgroundJob.objects.filter(
+            pk=job.pk,
+            status__in=[BackgroundJob.DONE, BackgroundJob.FAILED],
+        ).update(status=BackgroundJob.PENDING, task=task, payload=payload or {}, error='', priority=priority,
+                 queue=queue, updated_at=timezone.now())
+        if not requeued:
+            BackgroundJob.objects.filter(
+                pk=job.pk, status=BackgroundJob.PENDING, priority__lt=priority
+            ).update(priority=priority)
+            return job
+        job.refresh_from_db()
+
+    transaction.on_commit(lambda: submit(job.pk, queue))
+    return job
+
+
+def submit(job_id, queue=DEFAULT_QUEUE):
+    """
+    Wake the worker pool for a new pending job (or run it now in eager mode).
+    Workers take the most urgent pending job, not necessarily this one. Jobs
+    of other queues are left to their `run_jobs` worker.
+    """
+    if getattr(settings, 'JOBS_EAGER', False):
+        run_job(job_id)
+    elif queue == DEFAULT_QUEUE:
+        get_executor().submit(_run_in_thread)
+
+
+def _run_in_thread():
+    try:
+        run_pending(limit=1)
+    finally:
+        # Worker threads own their DB connection: don't leak it
+        connection.close()
+
+
+def claim(job_id):
+    """Atomically move a job from pending to running. Returns True if we got it."""
+    return BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.PENDING).update(
+        status=BackgroundJob.RUNNING,
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def run_job(job_id):
+    """
+    Execute a job if it is still pending.
+
+    Returns:
+        BackgroundJob or None if another worker already claimed it
+    """
+    close_old_connections()
+    if not claim(job_id):
+        return None
+
+    job = BackgroundJob.objects.get(pk=job_id)
+    try:
+        func = import_string(job.task)
+        job.result = func(**job.payload)
+        job.status = BackgroundJob.DONE
+        job.error = ''
+    except Exception as e:
+        logger.error(f"Job {job.key} failed: {str(e)}")
+        job.status = BackgroundJob.FAILED
+        job.error = traceback.format_exc()
+    job.save(update_fields=['result', 'status', 'error', 'updated_at'])
+    return job
+
+
+def stale_after(queue=DEFAULT_QUEUE):
+    """How long a job of `queue` may run before it is considered dead (JOBS_STALE_AFTER)."""
+    stale = getattr(settings, 'JOBS_STALE_AFTER', {})
+    return timedelta(seconds=stale.get(queue, stale.get(DEFAULT_QUEUE, 30 * 60)))
+
+
+def requeue_stale(older_than=None, queue=DEFAULT_QUEUE):
+    """
+    Reset jobs of `queue` stuck in `running` (e.g. their worker died) back to
+    pending. `older_than` defaults to the queue's stale_after().
+    """
+    if older_than is None:
+        older_than = stale_after(queue)
+    return BackgroundJob.objects.filter(
+        status=BackgroundJob.RUNNING,
+        queue=queue,
+        updated_at__lt=timezone.now() - older_than,
+    ).update(status=BackgroundJob.PENDING, updated_at=timezone.now())
+
+
+def run_pending(limit=None, queue=DEFAULT_QUEUE):
+    """
+    Run up to `limit` pending jobs of `queue` in the current thread, highest
+    priority then oldest first. Jobs claimed meanwhile by another worker are
+    skipped.
+
+    Returns:
+        int: Number of jobs executed by this call
+    """
+    pending = BackgroundJob.objects.filter(
+        status=BackgroundJob.PENDING, queue=queue
+    ).order_by('-priority', 'created_at')
+    executed = 0
+    while limit is None or executed < limit:
+        # Re-read every time: a more urgent job may have been enqueued meanwhile
+        job_id = pending.values_list('pk', flat=True).first()
+        if job_id is None:
+            break
+        if run_job(job_id) is not None:
+            executed += 1
+    return executed
+
+
+def get_job(key):
+    return BackgroundJob.objects.filter(key=key).first()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import override_settings
+
+
+class MockAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_handler(latency):
+    class MockGeminiHandler(BaseHTTPRequestHandler):
+        """Answers like Gemini generateContent after a fixed latency."""
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            answer = json.dumps({"candidates": [{"content": {"parts": [{"text": "Mock description."}]}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(answer)))
+            self.end_headers()
+            self.wfile.write(answer)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockGeminiHandler
+
+
+def blocking_description(session, base_url):
+    """What the former sync view did: hold the worker until Gemini answers."""
+    response = session.post(f"{base_url}/models/gemini-2.5-flash:generateContent",
+                            json={"contents": [{"parts": [{"text": "Écris une description"}]}]})
+    response.raise_for_status()
+    return response.json()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the AI endpoints against a local mock AI server: N concurrent generate_description "
+        "calls with a few sync workers (former views) vs the async view on a single event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Concurrent requests per run")
+        parser.add_argument('--latency', type=float, default=1.0, help="Mock AI latency in seconds")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Sync workers (threads) for the blocking run, e.g. gunicorn workers")
+
+    def handle(self, *args, **options):
+        total, latency, workers = options['requests'], options['latency'], options['workers']
+        server = MockAIServer(('127.0.0.1', 0), make_handler(latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        self.stdout.write(f"{total} requests, {latency}s mock latency")
+
+        try:
+            with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda _: blocking_description(session, base_url), range(total)))
+                sync_time = time.perf_counter() - start
+
+            with override_settings(GEMINI_API_URL=base_url, GOOGLE_API_KEY="mock", ALLOWED_HOSTS=["testserver"]):
+                start = time.perf_counter()
+                statuses = asyncio.run(self.async_run(total))
+                async_time = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+        failed = sum(1 for status in statuses if status != 200)
+        self.stdout.write(f"Sync, {workers} workers:     {sync_time:6.2f}s  {total / sync_time:7.1f} req/s")
+        self.stdout.write(f"Async view, 1 thread: {async_time:6.2f}s  {total / async_time:7.1f} req/s "
+                          f"({failed} failed)")
+        self.stdout.write(f"Throughput: x{sync_time / async_time:.1f}")
+
+    async def async_run(self, total):
+        client = AsyncClient()
+
+        async def call():
+            response = await client.post("/evenements/generate-description/", data=json.dumps({"title": "Load test"}),
+                                         content_type="application/json")
+            return response.status_code
+
+        return await asyncio.gather(*(call() for _ in range(total)))
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from Trelix.jobs import DEFAULT_QUEUE, requeue_stale, run_pending, stale_after
+
+
+class Command(BaseCommand):
+    help = "Run pending background jobs (certificates, AI generation, ...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls")
+        parser.add_argument('--queue', default=DEFAULT_QUEUE,
+                            help="Queue to run, e.g. 'video' for chapter video transcoding")
+        parser.add_argument('--stale-after', type=int,
+                            help="Minutes after which a running job is considered dead and re-queued "
+                                 "(default: JOBS_STALE_AFTER of the queue)")
+
+    def handle(self, *args, **options):
+        queue = options['queue']
+        if options['stale_after'] is None:
+            stale = stale_after(queue)
+        else:
+            stale = timedelta(minutes=options['stale_after'])
+
+        while True:
+            requeued = requeue_stale(stale, queue=queue)
+            if requeued:
+                self.stdout.write(f"Re-queued {requeued} stale job(s)")
+
+            count = run_pending(queue=queue)
+            if count:
+                self.stdout.write(f"Ran {count} job(s)")
+
+            if options['once']:
+                break
+            if not count:
+                time.sleep(options['interval'])
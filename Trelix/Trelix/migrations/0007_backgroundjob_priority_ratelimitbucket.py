@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Trelix', '0006_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='priority',
+            field=models.SmallIntegerField(default=0, help_text='Higher runs first'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundjob',
+            index=models.Index(fields=['status', '-priority', 'created_at'], name='Trelix_back_status_d7d4c9_idx'),
+        ),
+    ]
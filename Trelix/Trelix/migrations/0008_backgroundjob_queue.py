@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Trelix', '0007_backgroundjob_priority_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='backgroundjob',
+            name='Trelix_back_status_d7d4c9_idx',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='queue',
+            field=models.CharField(default='default', help_text='Workers of the web processes only run the default queue', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundjob',
+            index=models.Index(fields=['status', 'queue', '-priority', 'created_at'], name='Trelix_back_status_4367a8_idx'),
+        ),
+    ]
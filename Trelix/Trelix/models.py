@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class BackgroundJob(models.Model):
+    """
+    A unit of work run outside the request/response cycle (see Trelix/jobs.py).
+    The database acts as the broker, so no external queue service is needed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200, help_text="Dotted path of the task function")
+    key = models.CharField(max_length=255, unique=True, help_text="Idempotency key: one job per key")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    queue = models.CharField(max_length=50, default='default',
+                             help_text="Workers of the web processes only run the default queue")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'queue', '-priority', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket state shared by all worker processes (see Trelix/ai_jobs.py)."""
+    key = models.CharField(max_length=255, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
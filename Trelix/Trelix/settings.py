@@ -80,7 +80,7 @@ cloudinary.config(
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'Trelix.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -131,6 +131,68 @@ DATABASES = {
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 IMAGEGEN_KEY = os.getenv('IMAGEGEN_KEY')  # ✅ pour la génération d'images
 
+# -------------------------------------------------------------
+# 🤖 AI PROVIDERS (see Trelix/ai_client.py)
+# -------------------------------------------------------------
+HF_ROUTER_URL = os.getenv('HF_ROUTER_URL', 'https://router.huggingface.co/v1')
+GEMINI_API_URL = os.getenv('GEMINI_API_URL', 'https://generativelanguage.googleapis.com/v1beta')
+IMAGEGEN_API_URL = os.getenv(
+    'IMAGEGEN_API_URL', 'https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0'
+)
+AI_HTTP_TIMEOUT = float(os.getenv('AI_HTTP_TIMEOUT', '60'))
+# Connections kept by the shared async client, i.e. concurrent AI calls per process
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '200'))
+# Retries (exponential backoff) on timeouts, connection errors, 429 and 5xx
+AI_HTTP_RETRIES = int(os.getenv('AI_HTTP_RETRIES', '2'))
+AI_HTTP_BACKOFF = float(os.getenv('AI_HTTP_BACKOFF', '0.5'))
+# Concurrent calls per provider and process; extra callers wait up to AI_QUEUE_TIMEOUT seconds
+AI_MAX_CONCURRENCY = {
+    'gemini': int(os.getenv('AI_MAX_CONCURRENCY_GEMINI', '50')),
+    'huggingface': int(os.getenv('AI_MAX_CONCURRENCY_HUGGINGFACE', '50')),
+    'imagegen': int(os.getenv('AI_MAX_CONCURRENCY_IMAGEGEN', '8')),
+    'nlpcloud': int(os.getenv('AI_MAX_CONCURRENCY_NLPCLOUD', '20')),
+}
+AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '10'))
+# Circuit breaker: after AI_CIRCUIT_FAILURES failed calls (retries exhausted) in a row
+# a provider is skipped (calls fail immediately) for AI_CIRCUIT_RESET seconds
+AI_CIRCUIT_FAILURES = int(os.getenv('AI_CIRCUIT_FAILURES', '5'))
+AI_CIRCUIT_RESET = float(os.getenv('AI_CIRCUIT_RESET', '30'))
+
+# -------------------------------------------------------------
+# 🧊 CACHE
+# -------------------------------------------------------------
+# Local memory (Django's default) unless CACHE_BACKEND/CACHE_LOCATION say
+# otherwise: entries and their invalidations (quiz answer keys, course
+# outlines, ...) are per process, so point them at Redis or Memcached when
+# running several worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# -------------------------------------------------------------
+# ⏳ BACKGROUND JOBS (see Trelix/jobs.py)
+# -------------------------------------------------------------
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+# Seconds a running job may take before run_jobs considers its worker dead, per queue
+JOBS_STALE_AFTER = {'default': int(os.getenv('JOBS_STALE_AFTER', '1800'))}
+
+# -------------------------------------------------------------
+# 🚦 AI JOB QUOTAS (see Trelix/ai_jobs.py)
+# -------------------------------------------------------------
+# Token buckets in the database (shared by all workers); 'Trelix.ai_jobs.LocalBucketStore' keeps them in memory
+AI_RATE_LIMIT_BACKEND = os.getenv('AI_RATE_LIMIT_BACKEND', 'Trelix.ai_jobs.DatabaseBucketStore')
+# Each user can queue bursts of AI_JOB_USER_BURST generations, refilled at AI_JOB_USER_PER_HOUR
+AI_JOB_USER_BURST = int(os.getenv('AI_JOB_USER_BURST', '5'))
+AI_JOB_USER_PER_HOUR = float(os.getenv('AI_JOB_USER_PER_HOUR', '30'))
+# All users together, to stay within the providers' capacity
+AI_JOB_GLOBAL_BURST = int(os.getenv('AI_JOB_GLOBAL_BURST', '50'))
+AI_JOB_GLOBAL_PER_MINUTE = float(os.getenv('AI_JOB_GLOBAL_PER_MINUTE', '60'))
+AI_JOB_INSTRUCTOR_PRIORITY = 10
+
 # -------------------------------------------------------------
 # 🔐 PASSWORD VALIDATION
 # -------------------------------------------------------------
@@ -239,10 +301,47 @@ load_dotenv()
 
 STABILITY_API_KEY = os.getenv("STABILITY_API_KEY")
 print("STABILITY_API_KEY:", STABILITY_API_KEY)
+# Badge icons are drawn locally unless this is enabled (see quiz/tasks.py)
+BADGE_ICON_USE_API = os.getenv("BADGE_ICON_USE_API", "False").lower() == "true"
 
 # NLP Cloud
 NLP_CLOUD_API_KEY = os.getenv('NLP_CLOUD_API_KEY')
 NLP_CLOUD_MODEL = os.getenv('NLP_CLOUD_MODEL')
+NLP_CLOUD_BASE_URL = os.getenv('NLP_CLOUD_BASE_URL', 'https://api.nlpcloud.io/v1')
+# Course summaries (see cours/summarization.py)
+SUMMARY_MAX_WORKERS = int(os.getenv('SUMMARY_MAX_WORKERS', '4'))
+# Per request; retries, circuit breaker and concurrency limit are those of Trelix/ai_client.py
+SUMMARY_TIMEOUT = float(os.getenv('SUMMARY_TIMEOUT', '30'))
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '500'))
+SUMMARY_TARGET_TOKENS = int(os.getenv('SUMMARY_TARGET_TOKENS', '600'))
+SUMMARY_MAX_CALLS = int(os.getenv('SUMMARY_MAX_CALLS', '40'))
+# Rendered summary PDFs, one file per course content hash (see cours/summary_pdf.py)
+SUMMARY_PDF_CACHE_DIR = os.getenv('SUMMARY_PDF_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'summary_pdfs'))
+# Courses with more text than this are rendered in a background job on first download
+SUMMARY_PDF_ASYNC_CHARS = int(os.getenv('SUMMARY_PDF_ASYNC_CHARS', '50000'))
+# Chapter videos are transcoded to HLS renditions by jobs of the 'video' queue, run by
+# `manage.py run_jobs --queue video` (see chapitre/transcoding.py); off unless such a worker runs
+VIDEO_TRANSCODING = os.getenv('VIDEO_TRANSCODING', 'False').lower() == 'true'
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv('VIDEO_TRANSCODE_TIMEOUT', '7200'))
+# A transcode still running is never re-queued: ffmpeg is killed at the timeout first
+JOBS_STALE_AFTER['video'] = VIDEO_TRANSCODE_TIMEOUT + 15 * 60
+VIDEO_HLS_SEGMENT_SECONDS = 6
+# Bitrate ladder, highest first; renditions taller than the upload are skipped
+VIDEO_RENDITIONS = [
+    {'height': 1080, 'video_bitrate': '5000k', 'audio_bitrate': '128k'},
+    {'height': 720, 'video_bitrate': '2800k', 'audio_bitrate': '128k'},
+    {'height': 480, 'video_bitrate': '1400k', 'audio_bitrate': '96k'},
+    {'height': 360, 'video_bitrate': '800k', 'audio_bitrate': '96k'},
+]
+# Chapter videos served from MEDIA_ROOT with range requests (see chapitre/media.py)
+VIDEO_SERVE_LOCAL = os.getenv('VIDEO_SERVE_LOCAL', 'True').lower() == 'true'
+# e.g. 'X-Accel-Redirect' with VIDEO_SENDFILE_ROOT='/protected-media/' behind nginx,
+# or 'X-Sendfile' with VIDEO_SENDFILE_ROOT=MEDIA_ROOT + '/' behind Apache
+VIDEO_SENDFILE_HEADER = os.getenv('VIDEO_SENDFILE_HEADER', '')
+VIDEO_SENDFILE_ROOT = os.getenv('VIDEO_SENDFILE_ROOT', '/protected-media/')
+VIDEO_CACHE_MAX_AGE = int(os.getenv('VIDEO_CACHE_MAX_AGE', '3600'))
 # Session configuration (required for OAuth flow)
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
@@ -288,4 +387,7 @@ if SENDGRID_API_KEY:
 # -------------------------------------------------------------
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'models/gemini-2.5-flash-lite')
\ No newline at end of file
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'models/gemini-2.5-flash-lite')
+# Generated flashcards kept in the database (cours.FlashcardCache)
+FLASHCARD_CACHE_TTL = int(os.getenv('FLASHCARD_CACHE_TTL', str(60 * 60 * 24 * 7)))
+FLASHCARD_CACHE_MAX_ENTRIES = int(os.getenv('FLASHCARD_CACHE_MAX_ENTRIES', '500'))
\ No newline at end of file
@@ -0,0 +1,38 @@
+// Lecture adaptative (HLS) des vidéos de chapitre : <video data-stream="master.m3u8">
+// Native HLS (Safari) or hls.js; the <source> of the original upload is the fallback.
+const hlsPlayers = new WeakMap();
+
+// Stop loading segments and close the media source of a video's hls.js player
+function detachStream(video) {
+    const hls = hlsPlayers.get(video);
+    if (hls) {
+        hls.destroy();
+        hlsPlayers.delete(video);
+    }
+}
+
+function attachStream(video) {
+    detachStream(video);
+    const stream = video.dataset.stream;
+    if (!stream) return;
+
+    if (video.canPlayType('application/vnd.apple.mpegurl')) {
+        video.src = stream;
+    } else if (window.Hls && Hls.isSupported()) {
+        const hls = new Hls();
+        hlsPlayers.set(video, hls);
+        hls.on(Hls.Events.ERROR, function(event, data) {
+            if (data.fatal) {
+                // Stream unavailable: back to the original file
+                detachStream(video);
+                video.load();
+            }
+        });
+        hls.loadSource(stream);
+        hls.attachMedia(video);
+    }
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    document.querySelectorAll('video[data-stream]').forEach(attachStream);
+});
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+import requests
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import Profile
+from . import ai_client
+from .ai_client import (
+    AIProviderError, AIProviderUnavailable, OPEN, HALF_OPEN, CLOSED,
+    agemini_generate_content, gemini_generate_content, get_provider,
+)
+from .ai_jobs import LocalBucketStore, RateLimited, submit_ai_job
+from .jobs import enqueue, requeue_stale, run_job, run_pending
+from .models import BackgroundJob, RateLimitBucket
+
+CALLS = []
+
+
+def record_call(value):
+    CALLS.append(value)
+    return {'value': value}
+
+
+def failing_task():
+    raise RuntimeError("boom")
+
+
+class BackgroundJobTestCase(TestCase):
+    """Test the database-backed job queue"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_is_idempotent_per_key(self):
+        """Test that a pending job is not scheduled twice"""
+        first = enqueue('Trelix.tests.record_call', key='job:1', payload={'value': 1})
+        second = enqueue('Trelix.tests.record_call', key='job:1', payload={'value': 1})
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_run_pending(self):
+        """Test that pending jobs run once and store their result"""
+        job = enqueue('Trelix.tests.record_call', key='job:2', payload={'value': 2})
+        self.assertEqual(run_pending(), 1)
+        self.assertIsNone(run_job(job.pk))  # already done
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.DONE)
+        self.assertEqual(job.result, {'value': 2})
+        self.assertEqual(CALLS, [2])
+
+    def test_failed_job_is_requeued(self):
+        """Test failure reporting and re-enqueueing of a failed job"""
+        job = enqueue('Trelix.tests.failing_task', key='job:3')
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertIn("boom", job.error)
+
+        job = enqueue('Trelix.tests.failing_task', key='job:3')
+        self.assertEqual(job.status, BackgroundJob.PENDING)
+
+    def test_other_queue_left_to_its_worker(self):
+        """Test that jobs of another queue are not run by the default workers"""
+        job = enqueue('Trelix.tests.record_call', key='job:4', payload={'value': 4}, queue='video')
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(run_pending(queue='video'), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, CALLS), (BackgroundJob.DONE, [4]))
+
+    @override_settings(JOBS_STALE_AFTER={'default': 60, 'video': 3600})
+    def test_stale_timeout_per_queue(self):
+        """Test that a long job is only re-queued after its own queue's timeout"""
+        started = timezone.now() - timedelta(minutes=10)
+        for key, queue in (('job:5', 'default'), ('job:6', 'video')):
+            job = enqueue('Trelix.tests.record_call', key=key, queue=queue)
+            BackgroundJob.objects.filter(pk=job.pk).update(status=BackgroundJob.RUNNING, updated_at=started)
+
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(requeue_stale(queue='video'), 0)
+        self.assertEqual(BackgroundJob.objects.get(key='job:6').status, BackgroundJob.RUNNING)
+
+
+def gemini_transport(status=200, text="A generated description"):
+    """MockTransport answering generateContent calls and recording their bodies."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(status, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+    return httpx.MockTransport(handler), requests
+
+
+def gemini_response(status=200, text="A generated description"):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode()
+    return response
+
+
+@override_settings(GEMINI_API_URL="http://gemini.test/v1beta", GOOGLE_API_KEY="key",
+                   AI_HTTP_RETRIES=0, AI_HTTP_BACKOFF=0)
+class AsyncAIClientTestCase(TestCase):
+    """Test the pooled async AI client and the async views using it"""
+
+    async def test_gemini_generate_content(self):
+        """Test the REST payload and the parsed answer"""
+        transport, requests = gemini_transport()
+        with patch('Trelix.ai_client.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            text = await agemini_generate_content('models/gemini-2.5-flash', "Hi", {"temperature": 0.5})
+
+        self.assertEqual(text, "A generated description")
+        self.assertEqual(requests[0].url.path, "/v1beta/models/gemini-2.5-flash:generateContent")
+        self.assertEqual(requests[0].headers["x-goog-api-key"], "key")
+        self.assertEqual(json.loads(requests[0].content)["generationConfig"], {"temperature": 0.5})
+
+    async def test_provider_error(self):
+        """Test that a non-200 answer raises AIProviderError"""
+        transport, _ = gemini_transport(status=503)
+        with patch('Trelix.ai_client.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            with self.assertRaises(AIProviderError) as ctx:
+                await agemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(ctx.exception.status_code, 503)
+
+    def test_calls_from_per_request_loops_share_client(self):
+        """Test that calls made on short-lived event loops (async views under WSGI) share one client"""
+        transport, requests = gemini_transport()
+        with patch('Trelix.ai_client._async_client', httpx.AsyncClient(transport=transport)) as client:
+            for _ in range(2):
+                asyncio.run(agemini_generate_content('gemini-2.5-flash', "Hi"))
+            self.assertIs(ai_client.get_async_client(), client)
+        self.assertEqual(len(requests), 2)
+        self.assertFalse(client.is_closed)
+
+    async def test_generate_description_view(self):
+        """Test the async description endpoint end to end"""
+        transport, _ = gemini_transport()
+        with patch('Trelix.ai_client.get_async_client', return_value=httpx.AsyncClient(transport=transport)):
+            response = await self.async_client.post('/evenements/generate-description/',
+                                                    data=json.dumps({"title": "Hackathon"}),
+                                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"description": "A generated description"})
+
+
+@override_settings(GEMINI_API_URL="http://gemini.test/v1beta", GOOGLE_API_KEY="key",
+                   AI_HTTP_RETRIES=1, AI_HTTP_BACKOFF=0, AI_CIRCUIT_FAILURES=2, AI_CIRCUIT_RESET=30,
+                   AI_QUEUE_TIMEOUT=0, AI_MAX_CONCURRENCY={'gemini': 1})
+class AIProviderPolicyTestCase(TestCase):
+    """Test retries, circuit breaker and concurrency limit of the provider client"""
+
+    def setUp(self):
+        self.provider = get_provider('gemini')
+        self.provider.reset()
+        self.session = Mock()
+        patcher = patch('Trelix.ai_client.get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transient_error_is_retried(self):
+        """Test that a 503 is retried and does not count once the call succeeds"""
+        self.session.request.side_effect = [gemini_response(503), gemini_response()]
+        self.assertEqual(gemini_generate_content('gemini-2.5-flash', "Hi"), "A generated description")
+        self.assertEqual(self.session.request.call_count, 2)
+        self.assertEqual(self.provider.failures, 0)
+
+    def test_client_error_is_not_retried(self):
+        """Test that a 400 fails at once and leaves the circuit closed"""
+        self.session.request.return_value = gemini_response(400)
+        with self.assertRaises(AIProviderError) as ctx:
+            gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.provider.state, CLOSED)
+
+    def test_circuit_opens_and_fails_fast(self):
+        """Test that an outage opens the circuit and a trial call closes it"""
+        self.session.request.side_effect = requests.ConnectionError("down")
+        with self.assertRaises(AIProviderError):
+            gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual((self.provider.failures, self.provider.state), (1, CLOSED))  # one per call, not per attempt
+        with self.assertRaises(AIProviderError):
+            gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(self.provider.state, OPEN)
+
+        with self.assertRaises(AIProviderUnavailable):
+            gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(self.session.request.call_count, 4)  # refused without a request
+
+        self.provider.opened_at -= 30
+        self.assertEqual(self.provider.state, HALF_OPEN)
+        self.session.request.side_effect = None
+        self.session.request.return_value = gemini_response()
+        gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(self.provider.state, CLOSED)
+
+    def test_interrupted_trial_reopens_circuit(self):
+        """Test that a trial call ending in an unexpected exception still ends the trial"""
+        self.provider.failures, self.provider.opened_at = 2, time.monotonic() - 30
+        self.session.request.side_effect = RuntimeError("bug")
+        with self.assertRaises(RuntimeError):
+            gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual(self.provider.state, OPEN)
+
+        self.provider.opened_at -= 30
+        self.session.request.side_effect = None
+        self.session.request.return_value = gemini_response()
+        gemini_generate_content('gemini-2.5-flash', "Hi")  # the next trial is let through
+        self.assertEqual(self.provider.state, CLOSED)
+
+    @override_settings(AI_QUEUE_TIMEOUT=1)
+    async def test_cancelled_call_counts_as_failure(self):
+        """Test that a cancelled async call releases the half-open trial"""
+        self.provider.failures, self.provider.opened_at = 2, time.monotonic() - 30
+        client = Mock(request=AsyncMock(side_effect=asyncio.CancelledError))
+        with patch('Trelix.ai_client.get_async_client', return_value=client):
+            with self.assertRaises(asyncio.CancelledError):
+                await agemini_generate_content('gemini-2.5-flash', "Hi")
+        self.assertEqual((self.provider.failures, self.provider._trial), (3, False))
+
+    def test_concurrency_limit(self):
+        """Test that a call finding no free slot is refused"""
+        self.session.request.return_value = gemini_response()
+        with self.provider.slot():
+            with self.assertRaises(AIProviderUnavailable):
+                gemini_generate_content('gemini-2.5-flash', "Hi")
+        self.session.request.assert_not_called()
+
+
+@override_settings(AI_JOB_USER_BURST=2, AI_JOB_USER_PER_HOUR=1, AI_JOB_GLOBAL_BURST=3, AI_JOB_GLOBAL_PER_MINUTE=1)
+class AIJobQueueTestCase(TestCase):
+    """Test quotas, coalescing and priority of the AI job queue"""
+
+    def setUp(self):
+        CALLS.clear()
+        self.student = User.objects.create(username='student')
+        self.other = User.objects.create(username='other')
+        self.instructor = User.objects.create(username='teacher')
+        Profile.objects.create(user=self.instructor, user_type='instructor')
+
+    def submit(self, user, key, value=0):
+        return submit_ai_job(user, 'Trelix.tests.record_call', key, {'value': value})
+
+    def test_identical_requests_share_a_job(self):
+        """Test that a queued job is joined for free, even by another user"""
+        first = self.submit(self.student, 'quiz:1')
+        second = self.submit(self.other, 'quiz:1')
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.key, 'ai-quiz:1')
+        self.assertFalse(RateLimitBucket.objects.filter(key=f"ai-user:{self.other.pk}").exists())
+
+    def test_user_quota(self):
+        """Test that a user is limited once their bucket is empty"""
+        self.submit(self.student, 'quiz:1')
+        self.submit(self.student, 'quiz:2')
+        with self.assertRaises(RateLimited) as ctx:
+            self.submit(self.student, 'quiz:3')
+        self.assertEqual(ctx.exception.scope, 'user')
+        self.assertGreater(ctx.exception.retry_after, 3000)
+
+        self.submit(self.other, 'quiz:3')  # other users keep their own quota
+
+    def test_global_quota_refunds_user(self):
+        """Test that a request refused by the global bucket costs the user nothing"""
+        self.submit(self.student, 'quiz:1')
+        self.submit(self.student, 'quiz:2')
+        self.submit(self.other, 'quiz:3')
+        with self.assertRaises(RateLimited) as ctx:
+            self.submit(self.other, 'quiz:4')
+        self.assertEqual(ctx.exception.scope, 'global')
+        self.assertAlmostEqual(RateLimitBucket.objects.get(key=f"ai-user:{self.other.pk}").tokens, 1, places=2)
+
+    def test_instructor_jobs_run_first(self):
+        """Test that an instructor's job overtakes earlier student jobs"""
+        self.submit(self.student, 'quiz:1', value=1)
+        self.submit(self.instructor, 'quiz:2', value=2)
+        run_pending(limit=1)
+        self.assertEqual(CALLS, [2])
+
+    def test_local_bucket_store(self):
+        """Test the in-memory token bucket"""
+        store = LocalBucketStore()
+        self.assertEqual(store.take('k', capacity=1, rate=1), 0)
+        self.assertGreater(store.take('k', capacity=1, rate=1), 0)
+        store.give('k', capacity=1)
+        self.assertEqual(store.take('k', capacity=1, rate=1), 0)
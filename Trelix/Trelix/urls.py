@@ -1,6 +1,7 @@
 from django.contrib import admin
 from examan.models import Exam 
 from examan import views as exam_views 
+from chapitre import views as chapter_views
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
@@ -28,9 +29,17 @@ urlpatterns += [
     path('exam/<int:exam_id>/submit/', exam_views.submit_exam_view, name='submit_exam'),
     # examapp/urls.py
     path('exam/<int:exam_id>/submitted/', exam_views.exam_submitted_view, name='exam_submitted'),
+    path('exam/<int:exam_id>/certificate/status/', exam_views.certificate_status_view, name='certificate_status'),
     path('exam/result/<int:student_exam_id>/', exam_views.exam_result_view, name='exam-result'),
     path('meeting/', views.jitsi_meeting, name='jitsi_meeting'),
 ]
 
+# Chapter videos and HLS streams with range requests, before the generic media route
+if settings.VIDEO_SERVE_LOCAL and settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}chapters/<path:path>", chapter_views.serve_chapter_media,
+             name='chapter-media'),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,3 +5,4 @@ pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate
 python manage.py createsuperuser --noinput || true
+python manage.py warm_badge_icons || true
@@ -6,11 +6,15 @@ from .models import Chapter
 class ChapterAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'order', 'video_tag')
     list_filter = ('course',)
+    list_select_related = ('course', 'stream')
     search_fields = ('title', 'course__title')
     readonly_fields = ('video_preview',)  # Pour aperçu dans le formulaire
 
-    # Aperçu vidéo dans la liste
+    # Aperçu vidéo dans la liste : l'image du flux transcodé, sinon la vidéo originale
     def video_tag(self, obj):
+        stream = getattr(obj, 'stream', None)
+        if stream and stream.is_ready:
+            return format_html('<img src="{}" width="100" height="60" style="object-fit: cover">', stream.poster_url)
         if obj.video:
             return format_html(
                 '<video width="100" height="60" controls><source src="{}" type="video/mp4"></video>',
@@ -19,11 +23,25 @@ class ChapterAdmin(admin.ModelAdmin):
         return "-"
     video_tag.short_description = "Vidéo"
 
-    # Aperçu vidéo dans le formulaire
+    # Aperçu vidéo dans le formulaire : flux adaptatif (HLS) une fois transcodé
     def video_preview(self, obj):
         html = ''
         if obj and obj.video:
-            html = f'<video width="300" height="200" controls><source src="{obj.video.url}" type="video/mp4"></video>'
+            stream = getattr(obj, 'stream', None)
+            if stream and stream.is_ready:
+                html = format_html(
+                    '<video width="300" height="200" controls data-stream="{}" poster="{}">'
+                    '<source src="{}" type="video/mp4"></video>'
+                    '<p>Adaptive stream: {}</p>',
+                    stream.playlist_url, stream.poster_url, obj.video.url,
+                    ", ".join(r['name'] for r in stream.renditions),
+                )
+            else:
+                html = format_html(
+                    '<video width="300" height="200" controls><source src="{}" type="video/mp4"></video>'
+                    '<p>Adaptive stream: {}</p>',
+                    obj.video.url, stream.get_status_display() if stream else "not transcoded",
+                )
         # Toujours retourner un div avec un id fixe pour le JS
         return format_html('<div id="video_preview_container">{}</div>', html)
 
@@ -31,4 +49,8 @@ class ChapterAdmin(admin.ModelAdmin):
 
 
     class Media:
-        js = ('js/video_preview.js',)  # Pour aperçu instantané avant submit
+        js = (
+            'js/video_preview.js',  # Pour aperçu instantané avant submit
+            'https://cdn.jsdelivr.net/npm/hls.js@1/dist/hls.min.js',
+            'js/hls_player.js',
+        )
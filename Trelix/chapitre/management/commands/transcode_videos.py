@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from chapitre.models import Chapter, VideoStream
+from chapitre.transcoding import transcode_chapter_video
+
+
+class Command(BaseCommand):
+    help = (
+        "Transcode chapter videos into adaptive HLS streams with ffmpeg, in this process. "
+        "Chapters whose current upload already has a ready stream are skipped unless --force is given. "
+        "Run it on a worker host, or once for videos uploaded before transcoding was enabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('chapter_ids', nargs='*', type=int, help="Only these chapters (default: all)")
+        parser.add_argument('--force', action='store_true', help="Transcode again videos that have a ready stream")
+
+    def handle(self, *args, **options):
+        chapters = Chapter.objects.exclude(video='').exclude(video__isnull=True).select_related('stream').order_by('pk')
+        if options['chapter_ids']:
+            chapters = chapters.filter(pk__in=options['chapter_ids'])
+
+        for chapter in chapters:
+            stream = getattr(chapter, 'stream', None)
+            if (not options['force'] and stream and stream.status == VideoStream.READY
+                    and stream.source == chapter.video.name):
+                self.stdout.write(f"✔ {chapter.title}: stream already ready")
+                continue
+            try:
+                result = transcode_chapter_video(chapter.pk)
+            except Exception as e:
+                self.stderr.write(f"❌ {chapter.title}: {str(e)}")
+                continue
+            if result.get('skipped'):
+                self.stdout.write(f"✔ {chapter.title}: video changed meanwhile, skipped")
+            else:
+                self.stdout.write(f"✅ {chapter.title}: {', '.join(result['renditions'])} ({result['stream_dir']})")
@@ -0,0 +1,114 @@
+"""
+Chapter videos (uploads and their HLS streams) served from MEDIA_ROOT with
+HTTP range requests, so players can seek without downloading from the start.
+
+- Range: a single byte range is answered with 206 Partial Content, read in
+  STREAM_CHUNK_SIZE chunks (memory per request stays bounded whatever the
+  file size); several ranges or an unknown unit get the whole file (200),
+  a range past the end gets 416
+- whole files are handed to the server's wsgi.file_wrapper, i.e. sendfile()
+  when available; with VIDEO_SENDFILE_HEADER set (X-Accel-Redirect for
+  nginx, X-Sendfile for Apache) every request is delegated to the front
+  server, which then serves ranges zero-copy too
+- ETag (mtime and size) and Last-Modified: If-None-Match/If-Modified-Since
+  get 304, and If-Range only honours a range of the unchanged file
+
+Settings:
+    VIDEO_SERVE_LOCAL: route MEDIA_URL/chapters/ to this view (local media storage)
+    VIDEO_SENDFILE_HEADER, VIDEO_SENDFILE_ROOT: delegation header and the
+        prefix (internal URI or directory) put before the media file name
+    VIDEO_CACHE_MAX_AGE: seconds browsers and proxies may reuse a response
+"""
+import mimetypes
+import os
+
+from django.utils.http import parse_http_date_safe
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Not (or wrongly) known to the mimetypes module
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts past the end of the file."""
+
+
+def parse_range(header, size):
+    """
+    Byte range asked by a Range header.
+
+    Args:
+        header: value of the Range header (or None)
+        size: file size in bytes
+
+    Returns:
+        tuple: (first, last) byte positions, inclusive, or None to send the
+        whole file (no header, not a single byte range, invalid syntax)
+    Raises:
+        RangeNotSatisfiable
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """Whether a range may be sent: no If-Range header, or it names the current version of the file."""
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def content_type(name):
+    extension = os.path.splitext(name)[1].lower()
+    return CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class FileRange:
+    """File-like reading at most `length` bytes from `start`: the body of a 206 response."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
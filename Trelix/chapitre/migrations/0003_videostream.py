@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chapitre', '0002_remove_chapter_video_url_chapter_video_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Name of the upload the stream was built from', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('stream_dir', models.CharField(blank=True, max_length=255)),
+                ('renditions', models.JSONField(blank=True, default=list)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stream', to='chapitre.chapter')),
+            ],
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from cours.models import Course
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
@@ -36,3 +39,60 @@ class Chapter(models.Model):
         validate_text_start(self.title, 5, "Title")
         if self.description:
             validate_text_start(self.description, 10, "Description")
+
+
+class VideoStream(models.Model):
+    """
+    Adaptive (HLS) version of a chapter video, built by a background job from
+    the uploaded file, which is left untouched (see chapitre/transcoding.py).
+    Files live in the media storage under `stream_dir`: master.m3u8, one
+    playlist and its segments per rendition, and poster.jpg.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, related_name='stream')
+    source = models.CharField(max_length=255, help_text="Name of the upload the stream was built from")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    stream_dir = models.CharField(max_length=255, blank=True)
+    renditions = models.JSONField(default=list, blank=True)  # [{'name', 'height', 'video_bitrate'}]
+    duration = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.chapter} - {self.status}"
+
+    @property
+    def is_ready(self):
+        return self.status == self.READY
+
+    @property
+    def playlist_url(self):
+        return default_storage.url(f"{self.stream_dir}/master.m3u8") if self.is_ready else ""
+
+    @property
+    def poster_url(self):
+        return default_storage.url(f"{self.stream_dir}/poster.jpg") if self.is_ready else ""
+
+
+@receiver(post_save, sender=Chapter)
+def transcode_video_on_upload(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from .transcoding import schedule_transcoding
+        schedule_transcoding(instance)
+
+
+@receiver(post_delete, sender=VideoStream)
+def delete_stream_files_on_delete(sender, instance, **kwargs):
+    # Chapter deleted or video removed; only generated files go, never the upload
+    from .transcoding import delete_stream_files
+    transaction.on_commit(lambda: delete_stream_files(instance.stream_dir))
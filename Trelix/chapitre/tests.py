@@ -1,3 +1,224 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cours.models import Course
+from cours.outline import get_course_outline
+from Trelix.models import BackgroundJob
+from .admin import ChapterAdmin
+from .models import Chapter, VideoStream
+from .media import parse_range
+from .transcoding import hls_command, select_renditions
+
+UPLOAD = b"original mov bytes"
+
+
+def fake_ffmpeg(height=720, has_audio=True, fail=False):
+    """subprocess.run replacement answering like ffprobe/ffmpeg and writing their output files."""
+    def run(cmd, **kwargs):
+        if cmd[0] == 'ffprobe':
+            streams = [{'codec_type': 'video', 'height': height}]
+            if has_audio:
+                streams.append({'codec_type': 'audio'})
+            output = json.dumps({'streams': streams, 'format': {'duration': '120.0'}})
+            return subprocess.CompletedProcess(cmd, 0, stdout=output, stderr="")
+        if fail:
+            return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="Invalid data found when processing input")
+
+        target = cmd[-1]
+        if '-var_stream_map' in cmd:
+            names = re.findall(r"name:(\w+)", cmd[cmd.index('-var_stream_map') + 1])
+            out_dir = os.path.dirname(os.path.dirname(target))
+            for name in names:
+                os.makedirs(os.path.join(out_dir, name))
+                for file_name in ('index.m3u8', 'segment_0000.ts'):
+                    with open(os.path.join(out_dir, name, file_name), 'w') as f:
+                        f.write(name)
+            target = os.path.join(out_dir, 'master.m3u8')
+        with open(target, 'w') as f:
+            f.write("output")
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+    return run
+
+
+class VideoTranscodingTestCase(TestCase):
+    """Test the HLS transcoding of chapter videos"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, JOBS_EAGER=True, VIDEO_TRANSCODING=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+
+    def upload(self, **ffmpeg):
+        with patch('chapitre.transcoding.subprocess.run', side_effect=fake_ffmpeg(**ffmpeg)):
+            with self.captureOnCommitCallbacks(execute=True):
+                return Chapter.objects.create(
+                    course=self.course, title="Variables", description="Values", order=1,
+                    video=SimpleUploadedFile("lecture.mov", UPLOAD),
+                )
+
+    def test_upload_transcoded_to_hls(self):
+        """Test that an upload gets renditions, HLS playlists and a poster, next to the untouched original"""
+        chapter = self.upload(height=720)
+
+        stream = VideoStream.objects.get(chapter=chapter)
+        self.assertEqual(stream.status, VideoStream.READY)
+        self.assertEqual([r['name'] for r in stream.renditions], ['720p', '480p', '360p'])
+        for name in ('master.m3u8', 'poster.jpg', '720p/index.m3u8', '360p/segment_0000.ts'):
+            self.assertTrue(default_storage.exists(f"{stream.stream_dir}/{name}"), name)
+        with chapter.video.open('rb') as f:
+            self.assertEqual(f.read(), UPLOAD)
+
+        outline = get_course_outline(self.course.id)
+        self.assertTrue(outline[0]['stream'].endswith("/master.m3u8"))
+        self.assertTrue(outline[0]['poster'].endswith("/poster.jpg"))
+        self.assertEqual(outline[0]['video'], chapter.video.url)
+
+    def test_ffmpeg_failure_keeps_original(self):
+        """Test that a failed transcoding is recorded and players keep the upload"""
+        chapter = self.upload(fail=True)
+
+        stream = VideoStream.objects.get(chapter=chapter)
+        self.assertEqual(stream.status, VideoStream.FAILED)
+        self.assertIn("Invalid data found", stream.error)
+        self.assertEqual(BackgroundJob.objects.get().status, BackgroundJob.FAILED)
+        outline = get_course_outline(self.course.id)
+        self.assertEqual((outline[0]['stream'], outline[0]['video']), ("", chapter.video.url))
+
+    def test_saving_chapter_does_not_transcode_again(self):
+        """Test that only a new upload queues a new transcoding"""
+        chapter = self.upload()
+        chapter.title = "Variables and types"
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.save()
+
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        self.assertEqual(VideoStream.objects.get(chapter=chapter).status, VideoStream.READY)
+
+    def test_removing_video_deletes_stream(self):
+        """Test that clearing the video drops the stream and its files"""
+        chapter = self.upload()
+        directory = VideoStream.objects.get(chapter=chapter).stream_dir
+        chapter.video = None
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.save()
+
+        self.assertFalse(VideoStream.objects.filter(chapter=chapter).exists())
+        self.assertFalse(default_storage.exists(f"{directory}/master.m3u8"))
+
+    def test_admin_preview_uses_stream(self):
+        """Test that the admin preview plays the adaptive stream with the poster"""
+        chapter = Chapter.objects.select_related('stream').get(pk=self.upload().pk)
+        html = ChapterAdmin(Chapter, admin.site).video_preview(chapter)
+        self.assertIn(f'data-stream="{chapter.stream.playlist_url}"', html)
+        self.assertIn(chapter.stream.poster_url, html)
+
+
+class RenditionLadderTestCase(TestCase):
+    """Test the choice of renditions and the ffmpeg command"""
+
+    def test_no_upscaling(self):
+        """Test that renditions taller than the upload are skipped"""
+        self.assertEqual([r['name'] for r in select_renditions(480)], ['480p', '360p'])
+        self.assertEqual([r['name'] for r in select_renditions(241)], ['240p'])
+
+    def test_video_without_audio(self):
+        """Test that silent videos map no audio track"""
+        cmd = hls_command("in.avi", "/tmp/out", select_renditions(480), has_audio=False)
+        self.assertNotIn('a:0', cmd)
+        self.assertEqual(cmd[cmd.index('-var_stream_map') + 1], "v:0,name:480p v:1,name:360p")
+
+
+class ChapterMediaRangeTestCase(TestCase):
+    """Test serving chapter videos with range requests"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, VIDEO_SENDFILE_HEADER='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.data = bytes(range(256)) * 4
+        os.makedirs(os.path.join(self.media_root, "chapters", "videos"))
+        with open(os.path.join(self.media_root, "chapters", "videos", "lecture.mp4"), "wb") as f:
+            f.write(self.data)
+        self.url = reverse('chapter-media', args=["videos/lecture.mp4"])
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_whole_file(self):
+        """Test that a request without Range gets the file, advertising range support"""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertEqual(response['Accept-Ranges'], "bytes")
+        self.assertEqual(response['Content-Type'], "video/mp4")
+        self.assertTrue(response['ETag'])
+
+    def test_partial_content(self):
+        """Test that a byte range is answered with 206 and only those bytes"""
+        response = self.get(Range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], "bytes 100-199/1024")
+        self.assertEqual(response['Content-Length'], "100")
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+
+    def test_chunks_are_bounded(self):
+        """Test that a range is streamed in chunks, not read at once"""
+        with patch('chapitre.views.STREAM_CHUNK_SIZE', 64):
+            response = self.get(Range="bytes=0-")
+        chunks = list(response.streaming_content)
+        self.assertEqual(b"".join(chunks), self.data)
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 64)
+
+    def test_unsatisfiable_range(self):
+        """Test that a range past the end gets 416 with the file size"""
+        response = self.get(Range="bytes=2000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], "bytes */1024")
+
+    def test_etag_revalidation(self):
+        """Test If-None-Match and an outdated If-Range"""
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(If_None_Match=etag).status_code, 304)
+
+        response = self.get(Range="bytes=0-9", If_Range='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(Range="bytes=0-9", If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_sendfile_delegation(self):
+        """Test that the front server gets the file to send when configured"""
+        with override_settings(VIDEO_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.get(Range="bytes=0-9")
+        self.assertEqual(response['X-Accel-Redirect'], "/protected-media/chapters/videos/lecture.mp4")
+        self.assertEqual(response.content, b"")
+
+    def test_missing_file_and_traversal(self):
+        """Test that only existing files under MEDIA_ROOT are served"""
+        self.assertEqual(self.client.get(reverse('chapter-media', args=["videos/missing.mp4"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('chapter-media', args=["../../etc/passwd"])).status_code, 404)
+
+    def test_parse_range(self):
+        """Test the supported Range header forms"""
+        self.assertEqual(parse_range("bytes=-100", 1024), (924, 1023))
+        self.assertEqual(parse_range("bytes=1000-5000", 1024), (1000, 1023))
+        self.assertIsNone(parse_range("bytes=0-1,5-9", 1024))
+        self.assertIsNone(parse_range("items=0-1", 1024))
+        self.assertIsNone(parse_range("bytes=9-1", 1024))
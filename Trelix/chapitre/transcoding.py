@@ -0,0 +1,287 @@
+"""
+Offline transcoding of chapter videos into an adaptive (HLS) stream.
+
+Uploads (mp4, mov or avi, any codec and size) are kept as they are. A
+background job of the VIDEO_QUEUE, run by `manage.py run_jobs --queue video`
+and never by the web processes' job pool (see Trelix/jobs.py), runs ffmpeg on
+them to produce:
+
+- H.264/AAC renditions at the bitrates of settings.VIDEO_RENDITIONS, none
+  taller than the upload, with keyframes on segment boundaries so players
+  can switch rendition at every segment
+- HLS playlists of VIDEO_HLS_SEGMENT_SECONDS segments and a master playlist
+- a poster frame
+
+Files are written to the media storage under
+chapters/streams/<chapter id>/<hash of the upload name>/ and recorded in the
+chapter's VideoStream. Players use the original upload until the stream is
+ready, or when transcoding failed.
+
+Transcoding is off unless VIDEO_TRANSCODING is set, which needs a video
+queue worker. `manage.py transcode_videos` transcodes in the current process,
+e.g. for videos uploaded before the pipeline was enabled.
+"""
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from cours.outline import invalidate_outline
+from cours.utils import content_hash
+from Trelix.jobs import enqueue
+from .models import Chapter, VideoStream
+
+logger = logging.getLogger(__name__)
+
+STREAM_ROOT = "chapters/streams"
+VIDEO_QUEUE = 'video'
+POSTER_MAX_HEIGHT = 720
+STDERR_LINES = 5  # last lines of ffmpeg output kept as error message
+
+
+class VideoTranscodingError(Exception):
+    """ffmpeg or ffprobe failed, or the upload has no video track."""
+
+
+def stream_dir(chapter_id, source):
+    return f"{STREAM_ROOT}/{chapter_id}/{content_hash(source)[:16]}"
+
+
+def transcode_job_key(chapter_id, source):
+    return f"video-transcode:{chapter_id}:{content_hash(source)[:16]}"
+
+
+def schedule_transcoding(chapter, force=False):
+    """
+    Queue the transcoding of a chapter's upload, unless the stream of that
+    upload is already built or queued. A chapter whose video was removed
+    loses its stream.
+
+    Returns:
+        BackgroundJob or None when nothing was queued
+    """
+    stream = VideoStream.objects.filter(chapter=chapter).first()
+    if not chapter.video:
+        if stream:
+            stream.delete()
+        return None
+    if not settings.VIDEO_TRANSCODING:
+        return None
+    source = chapter.video.name
+    if stream and stream.source == source and stream.status != VideoStream.FAILED and not force:
+        return None
+
+    VideoStream.objects.update_or_create(
+        chapter=chapter, defaults={'source': source, 'status': VideoStream.PENDING, 'error': ''},
+    )
+    return enqueue(
+        'chapitre.transcoding.transcode_chapter_video',
+        key=transcode_job_key(chapter.pk, source),
+        payload={'chapter_id': chapter.pk},
+        queue=VIDEO_QUEUE,
+    )
+
+
+def run(cmd):
+    """
+    Run ffmpeg/ffprobe.
+
+    Returns:
+        subprocess.CompletedProcess
+    Raises:
+        VideoTranscodingError: the binary is missing, failed or timed out
+    """
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=settings.VIDEO_TRANSCODE_TIMEOUT)
+    except FileNotFoundError:
+        raise VideoTranscodingError(f"{cmd[0]} not found, install ffmpeg or set FFMPEG_BINARY/FFPROBE_BINARY")
+    except subprocess.TimeoutExpired:
+        raise VideoTranscodingError(f"{cmd[0]} did not finish within {settings.VIDEO_TRANSCODE_TIMEOUT}s")
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-STDERR_LINES:])
+        raise VideoTranscodingError(f"{cmd[0]} exited with status {result.returncode}: {tail}")
+    return result
+
+
+def probe(path):
+    """
+    Returns:
+        dict: {'height', 'has_audio', 'duration' (seconds or None)} of a video file
+    Raises:
+        VideoTranscodingError
+    """
+    output = run([
+        settings.FFPROBE_BINARY, '-v', 'error',
+        '-show_entries', 'stream=codec_type,height:format=duration',
+        '-of', 'json', path,
+    ]).stdout
+    info = json.loads(output)
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video' and s.get('height')), None)
+    if video is None:
+        raise VideoTranscodingError("The upload has no video track")
+    duration = info.get('format', {}).get('duration')
+    return {
+        'height': int(video['height']),
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+        'duration': float(duration) if duration else None,
+    }
+
+
+def select_renditions(source_height):
+    """
+    Renditions of the ladder no taller than the upload (never upscaled); a
+    smaller upload gets the lowest bitrate at its own (even) height.
+    """
+    ladder = sorted(settings.VIDEO_RENDITIONS, key=lambda r: r['height'], reverse=True)
+    renditions = [r for r in ladder if r['height'] <= source_height]
+    if not renditions:
+        renditions = [{**ladder[-1], 'height': max(2, source_height - source_height % 2)}]
+    return [{**r, 'name': f"{r['height']}p"} for r in renditions]
+
+
+def kbits(bitrate):
+    """'2800k' -> 2800"""
+    return int(str(bitrate).lower().rstrip('k'))
+
+
+def hls_command(source, out_dir, renditions, has_audio):
+    """
+    One ffmpeg run decoding the upload once and encoding every rendition,
+    as out_dir/master.m3u8 and out_dir/<name>/index.m3u8 + segments.
+    """
+    count = len(renditions)
+    graph = [f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))]
+    graph += [f"[v{i}]scale=-2:{r['height']}[v{i}out]" for i, r in enumerate(renditions)]
+
+    cmd = [settings.FFMPEG_BINARY, '-y', '-i', source, '-filter_complex', ";".join(graph)]
+    for i, rendition in enumerate(renditions):
+        bitrate = kbits(rendition['video_bitrate'])
+        cmd += [
+            '-map', f"[v{i}out]", f'-c:v:{i}', 'libx264',
+            f'-b:v:{i}', f"{bitrate}k", f'-maxrate:v:{i}', f"{bitrate * 107 // 100}k",
+            f'-bufsize:v:{i}', f"{bitrate * 2}k",
+        ]
+        if has_audio:
+            cmd += ['-map', 'a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', rendition['audio_bitrate']]
+
+    segment = settings.VIDEO_HLS_SEGMENT_SECONDS
+    if has_audio:
+        stream_map = [f"v:{i},a:{i},name:{r['name']}" for i, r in enumerate(renditions)]
+        cmd += ['-ac', '2']
+    else:
+        stream_map = [f"v:{i},name:{r['name']}" for i, r in enumerate(renditions)]
+    cmd += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        # Same keyframe positions in every rendition: switching is possible at each segment
+        '-sc_threshold', '0', '-force_key_frames', f"expr:gte(t,n_forced*{segment})",
+        '-f', 'hls', '-hls_time', str(segment), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(out_dir, '%v', 'segment_%04d.ts'),
+        '-master_pl_name', 'master.m3u8',
+        '-var_stream_map', " ".join(stream_map),
+        os.path.join(out_dir, '%v', 'index.m3u8'),
+    ]
+    return cmd
+
+
+def poster_command(source, path, info):
+    """A frame 10% into the video (at most 5s in, past fades from black), as JPEG."""
+    position = min(info['duration'] * 0.1, 5) if info['duration'] else 0
+    return [
+        settings.FFMPEG_BINARY, '-y', '-ss', f"{position:.2f}", '-i', source,
+        '-frames:v', '1', '-vf', f"scale=-2:{min(POSTER_MAX_HEIGHT, info['height'])}", '-q:v', '3', path,
+    ]
+
+
+@contextmanager
+def local_source(field_file):
+    """Path of an upload on local disk, downloaded to a temporary file for remote storages."""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(field_file.name)[1]) as tmp:
+        with field_file.open('rb') as f:
+            for chunk in f.chunks():
+                tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+def delete_stream_files(directory):
+    """Remove a stream directory from the media storage."""
+    if not directory or not default_storage.exists(directory):
+        return
+    dirs, files = default_storage.listdir(directory)
+    for name in files:
+        default_storage.delete(f"{directory}/{name}")
+    for name in dirs:
+        delete_stream_files(f"{directory}/{name}")
+
+
+def store_stream(local_dir, directory):
+    """Copy the ffmpeg output to the media storage, keeping file names (playlists refer to them)."""
+    delete_stream_files(directory)
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), local_dir).replace(os.sep, "/")
+            with open(os.path.join(root, name), 'rb') as f:
+                default_storage.save(f"{directory}/{relative}", File(f))
+
+
+def transcode_chapter_video(chapter_id):
+    """
+    Background task: build the HLS stream and poster of a chapter's upload.
+
+    Returns:
+        dict: {'stream_dir', 'renditions'} ({'skipped': True} without video)
+    Raises:
+        VideoTranscodingError: the stream is marked failed and players keep the upload
+    """
+    chapter = Chapter.objects.filter(pk=chapter_id).first()
+    if chapter is None or not chapter.video:
+        return {'skipped': True}
+    source = chapter.video.name
+    stream, _ = VideoStream.objects.get_or_create(chapter=chapter, defaults={'source': source})
+    previous_dir = stream.stream_dir
+    VideoStream.objects.filter(pk=stream.pk).update(status=VideoStream.PROCESSING, source=source, error='')
+
+    directory = stream_dir(chapter.pk, source)
+    try:
+        with local_source(chapter.video) as path, tempfile.TemporaryDirectory() as out_dir:
+            info = probe(path)
+            renditions = select_renditions(info['height'])
+            run(hls_command(path, out_dir, renditions, info['has_audio']))
+            run(poster_command(path, os.path.join(out_dir, 'poster.jpg'), info))
+            store_stream(out_dir, directory)
+    except Exception as e:
+        logger.error("Transcoding of chapter %s video failed: %s", chapter.pk, e)
+        VideoStream.objects.filter(pk=stream.pk, source=source).update(status=VideoStream.FAILED, error=str(e))
+        raise
+
+    # The upload may have been replaced meanwhile: that stream is then already outdated
+    ready = VideoStream.objects.filter(pk=stream.pk, source=source).update(
+        status=VideoStream.READY,
+        stream_dir=directory,
+        renditions=[
+            {'name': r['name'], 'height': r['height'], 'video_bitrate': r['video_bitrate']} for r in renditions
+        ],
+        duration=info['duration'],
+    )
+    if not ready:
+        delete_stream_files(directory)
+        return {'skipped': True}
+    if previous_dir and previous_dir != directory:
+        delete_stream_files(previous_dir)
+    invalidate_outline(chapter.course_id)
+    return {'stream_dir': directory, 'renditions': [r['name'] for r in renditions]}
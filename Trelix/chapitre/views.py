@@ -1,4 +1,18 @@
+import os
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+
+from .media import (
+    STREAM_CHUNK_SIZE, FileRange, RangeNotSatisfiable, content_type, file_etag, if_range_matches, parse_range,
+)
 from .models import Chapter
 
 def chapters_page(request):
@@ -6,3 +20,61 @@ def chapters_page(request):
     return render(request, 'trelix/chapters.html', {
         'chapters': chapters
     })
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_chapter_media(request, path):
+    """
+    Vidéo de chapitre (ou fichier de son flux HLS) depuis MEDIA_ROOT, avec
+    prise en charge des requêtes Range pour la lecture et la recherche
+    (see chapitre/media.py).
+    """
+    name = f"chapters/{path}"
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+
+    if settings.VIDEO_SENDFILE_HEADER:
+        # Le serveur frontal (nginx, Apache) envoie le fichier et gère Range lui-même
+        response = HttpResponse(content_type=content_type(name))
+        response[settings.VIDEO_SENDFILE_HEADER] = f"{settings.VIDEO_SENDFILE_ROOT}{name}"
+        return response
+
+    try:
+        file_stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404("File not found")
+
+    etag = file_etag(file_stat)
+    size = file_stat.st_size
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(file_stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = None
+    if if_range_matches(request.headers.get('If-Range'), etag, file_stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type(name))
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        # Fichier entier : sendfile() via wsgi.file_wrapper quand le serveur le propose
+        response = FileResponse(file, content_type=content_type(name))
+    response.block_size = STREAM_CHUNK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(file_stat.st_mtime)
+    patch_cache_control(response, public=True, max_age=settings.VIDEO_CACHE_MAX_AGE)
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Course
+from .tasks import enqueue_course_quizzes
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -8,6 +9,7 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ('level', 'is_published')
     search_fields = ('title', 'description')
     readonly_fields = ('image_preview',)
+    actions = ['pregenerate_quizzes']
 
 
     # Méthode pour afficher un aperçu de l'image
@@ -22,5 +24,12 @@ class CourseAdmin(admin.ModelAdmin):
             return format_html('<img id="image_preview" src="{}" style="max-width:300px; max-height:300px;" />', obj.image.url)
         return format_html('<img id="image_preview" style="max-width:300px; max-height:300px; display:none;" />')
     image_preview.short_description = 'Image preview'
+
+    @admin.action(description="Pre-generate chapter quizzes")
+    def pregenerate_quizzes(self, request, queryset):
+        for course in queryset:
+            enqueue_course_quizzes(course)
+        self.message_user(request, f"Quiz generation scheduled for {queryset.count()} course(s).")
+
     class Media:
         js = ('js/image_preview.js',)
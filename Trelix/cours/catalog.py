@@ -0,0 +1,65 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from .models import Course
+
+CATALOG_CACHE_KEY = "course-catalog"
+CATALOG_TIMEOUT = 60 * 60 * 24  # invalidated on Course save/delete, this is only a safety net
+CATALOG_MAX_AGE = 60  # seconds browsers may reuse a filter result before revalidating it
+DESCRIPTION_LENGTH = 120
+
+
+def course_card(course):
+    """What the course list shows of a course (same dict for the template and the JSON filter)."""
+    description = course.description or ""
+    if len(description) > DESCRIPTION_LENGTH:
+        description = description[:DESCRIPTION_LENGTH] + "..."
+    return {
+        "id": course.id,
+        "title": course.title,
+        "description": description,
+        "level": course.level.title(),
+        "image": course.image.url if course.image else "",
+    }
+
+
+def build_catalog():
+    """
+    Cards of all published courses, with one query.
+
+    Returns:
+        dict: {'cards': [card, ...] by id, 'levels': {level: [index in cards, ...]},
+               'version': hash of the cards, used as ETag}
+    """
+    cards, levels = [], {}
+    for course in Course.objects.filter(is_published=True).order_by('id'):
+        levels.setdefault(course.level, []).append(len(cards))
+        cards.append(course_card(course))
+    version = hashlib.md5(json.dumps(cards, sort_keys=True).encode("utf-8")).hexdigest()
+    return {'cards': cards, 'levels': levels, 'version': version}
+
+
+def get_catalog():
+    """Cached catalog, rebuilt after a Course is saved or deleted."""
+    catalog = cache.get(CATALOG_CACHE_KEY)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(CATALOG_CACHE_KEY, catalog, CATALOG_TIMEOUT)
+    return catalog
+
+
+def catalog_cards(catalog, levels=None):
+    """
+    Cards of the given levels (all of them if levels is empty or contains "all"),
+    in catalog order. Unknown levels are ignored.
+    """
+    if not levels or "all" in levels:
+        return catalog['cards']
+    indexes = sorted(i for level in set(levels) for i in catalog['levels'].get(level, []))
+    return [catalog['cards'][i] for i in indexes]
+
+
+def invalidate_catalog():
+    cache.delete(CATALOG_CACHE_KEY)
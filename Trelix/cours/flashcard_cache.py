@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FlashcardCache
+from .utils import content_hash
+
+
+def _expiry_threshold():
+    return timezone.now() - timedelta(seconds=settings.FLASHCARD_CACHE_TTL)
+
+
+def get_cached_flashcards(course, course_content, num_cards, model_name):
+    """
+    Flashcards stored for this exact course text, number of cards and model,
+    or None if missing or expired. A hit refreshes the entry's LRU timestamp.
+    """
+    entry = FlashcardCache.objects.filter(
+        course=course,
+        content_hash=content_hash(course_content),
+        num_cards=num_cards,
+        model_name=model_name,
+        created_at__gte=_expiry_threshold(),
+    ).only('pk', 'flashcards').first()
+    if entry is None:
+        return None
+
+    FlashcardCache.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+    return entry.flashcards
+
+
+def store_flashcards(course, course_content, num_cards, model_name, flashcards):
+    """Save generated flashcards, then drop expired and least recently used entries."""
+    now = timezone.now()
+    FlashcardCache.objects.update_or_create(
+        course=course,
+        content_hash=content_hash(course_content),
+        num_cards=num_cards,
+        model_name=model_name,
+        defaults={'flashcards': flashcards, 'created_at': now, 'last_used_at': now},
+    )
+    evict()
+
+
+def evict(max_entries=None):
+    """
+    Delete expired entries and keep at most max_entries (default
+    settings.FLASHCARD_CACHE_MAX_ENTRIES), dropping the least recently used.
+
+    Returns:
+        int: number of deleted entries
+    """
+    if max_entries is None:
+        max_entries = settings.FLASHCARD_CACHE_MAX_ENTRIES
+
+    deleted, _ = FlashcardCache.objects.filter(created_at__lt=_expiry_threshold()).delete()
+    stale_ids = list(
+        FlashcardCache.objects.order_by('-last_used_at').values_list('pk', flat=True)[max_entries:]
+    )
+    if stale_ids:
+        deleted += FlashcardCache.objects.filter(pk__in=stale_ids).delete()[0]
+    return deleted
+
+
+def invalidate_flashcards(course_id):
+    FlashcardCache.objects.filter(course_id=course_id).delete()
@@ -0,0 +1,234 @@
+"""
+Course progress and leaderboards, read from precomputed rows.
+
+- CourseProgress: per (user, course), chapters with a quiz attempt and the sum
+  of their best chapter quiz scores
+- LeaderboardEntry: per user, best chapter quiz scores, best exam scores and
+  badges weighted into points
+
+Both are recomputed for one user from that user's rows only, by the signal
+receivers of cours/models.py (quiz attempt, exam graded, badge won or removed),
+so no request ever scans the score tables. `manage.py rebuild_leaderboard`
+recomputes everything, e.g. after bulk updates that send no signals.
+
+Rankings are ordered by (-points, user id), which the models' indexes follow:
+a page is an index range scan and the rank of a user is an index count.
+Pages use keyset pagination with a signed cursor (points, user id, rank) of
+the last row, so deep pages cost the same as the first one.
+"""
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from examan.models import StudentExam
+from quiz.models import UserBadge
+from .models import ChapterQuizStats, CourseProgress, LeaderboardEntry
+from .outline import get_course_outline
+
+QUIZ_ANSWER_POINTS = 10  # per correct answer of the best attempt of a chapter quiz
+BADGE_POINTS = 50  # per badge; an exam is worth its best score (0-100)
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+CURSOR_SALT = "cours.leaderboard"
+
+GLOBAL_FIELDS = ['quiz_points', 'exam_points', 'badges']
+COURSE_FIELDS = ['chapters_attempted']
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by this module (or was altered)."""
+
+
+def weighted_points(quiz_points, exam_points, badges):
+    return quiz_points * QUIZ_ANSWER_POINTS + exam_points + badges * BADGE_POINTS
+
+
+def upsert(model, lookup, values, create=True):
+    """
+    Write the values on the row matching lookup, creating it if needed (unless
+    create is False, e.g. while the user is being deleted).
+    """
+    rows = model.objects.filter(**lookup)
+    if rows.update(**values) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **values)
+    except IntegrityError:
+        # Created concurrently by another request of the same user
+        rows.update(**values)
+
+
+def refresh_course_progress(user_id, course_id, create=True):
+    """Recompute a user's progress in a course from their chapter quiz rollups (one query)."""
+    totals = ChapterQuizStats.objects.filter(user_id=user_id, chapter__course_id=course_id).aggregate(
+        chapters=Count('id'), points=Sum('best_score'), last=Max('last_attempt_at'),
+    )
+    upsert(
+        CourseProgress,
+        {'user_id': user_id, 'course_id': course_id},
+        {'chapters_attempted': totals['chapters'], 'points': totals['points'] or 0, 'last_activity_at': totals['last']},
+        create,
+    )
+
+
+def best_exam_scores(student_filter):
+    """Best graded score per (student, exam), as {'student_id', 'exam_id', 'best'} rows."""
+    return (
+        StudentExam.objects.filter(student_filter, score__isnull=False)
+        .values('student_id', 'exam_id')
+        .annotate(best=Max('score'))
+        .order_by()
+    )
+
+
+def refresh_leaderboard_entry(user_id, create=True):
+    """Recompute a user's global points from their quiz rollups, exams and badges (three queries)."""
+    quiz_points = ChapterQuizStats.objects.filter(user_id=user_id).aggregate(points=Sum('best_score'))['points'] or 0
+    exam_points = sum(row['best'] for row in best_exam_scores(Q(student_id=user_id)))
+    badges = UserBadge.objects.filter(user_id=user_id).count()
+    upsert(
+        LeaderboardEntry,
+        {'user_id': user_id},
+        {
+            'quiz_points': quiz_points,
+            'exam_points': exam_points,
+            'badges': badges,
+            'points': weighted_points(quiz_points, exam_points, badges),
+            'updated_at': timezone.now(),
+        },
+        create,
+    )
+
+
+def rebuild_leaderboard(batch_size=1000):
+    """
+    Recompute every CourseProgress and LeaderboardEntry row with grouped queries.
+
+    Returns:
+        tuple: (course progress rows, leaderboard rows) written
+    """
+    progress = [
+        CourseProgress(**group)
+        for group in ChapterQuizStats.objects.values('user_id', course_id=F('chapter__course_id'))
+        .annotate(chapters_attempted=Count('id'), points=Sum('best_score'), last_activity_at=Max('last_attempt_at'))
+        .order_by()
+    ]
+    CourseProgress.objects.bulk_create(
+        progress,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'course'],
+        update_fields=['chapters_attempted', 'points', 'last_activity_at'],
+    )
+
+    totals = {}
+    for row in ChapterQuizStats.objects.values('user_id').annotate(points=Sum('best_score')).order_by():
+        totals.setdefault(row['user_id'], [0, 0, 0])[0] = row['points']
+    for row in best_exam_scores(Q()):
+        totals.setdefault(row['student_id'], [0, 0, 0])[1] += row['best']
+    for row in UserBadge.objects.values('user_id').annotate(count=Count('id')).order_by():
+        totals.setdefault(row['user_id'], [0, 0, 0])[2] = row['count']
+
+    now = timezone.now()
+    entries = [
+        LeaderboardEntry(
+            user_id=user_id, quiz_points=quiz, exam_points=exam, badges=badges,
+            points=weighted_points(quiz, exam, badges), updated_at=now,
+        )
+        for user_id, (quiz, exam, badges) in totals.items()
+    ]
+    LeaderboardEntry.objects.bulk_create(
+        entries,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['quiz_points', 'exam_points', 'badges', 'points', 'updated_at'],
+    )
+    return len(progress), len(entries)
+
+
+def encode_cursor(points, user_id, rank):
+    return signing.dumps([points, user_id, rank], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (points, user id, rank) of the last row of the previous page
+    Raises:
+        InvalidCursor
+    """
+    try:
+        points, user_id, rank = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor("Invalid leaderboard cursor")
+    return points, user_id, rank
+
+
+def leaderboard_page(queryset, fields, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of a ranking, starting after the cursor row (the top of the ranking without cursor).
+
+    Args:
+        queryset: CourseProgress or LeaderboardEntry rows to rank
+        fields: extra columns returned for each row
+        cursor: next_cursor of the previous page
+        limit: rows per page
+
+    Returns:
+        dict: {'results': [{'rank', 'user_id', 'username', 'points', *fields}], 'next_cursor': str or None}
+    Raises:
+        InvalidCursor
+    """
+    rows = queryset.order_by('-points', 'user_id')
+    rank = 0
+    if cursor:
+        points, user_id, rank = decode_cursor(cursor)
+        rows = rows.filter(Q(points__lt=points) | Q(points=points, user_id__gt=user_id))
+    rows = list(rows.values('user_id', 'user__username', 'points', *fields)[:limit + 1])
+
+    results = [
+        {'rank': rank + position, 'username': row.pop('user__username'), **row}
+        for position, row in enumerate(rows[:limit], 1)
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = results[-1]
+        next_cursor = encode_cursor(last['points'], last['user_id'], last['rank'])
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+def global_ranking(cursor=None, limit=PAGE_SIZE):
+    return leaderboard_page(LeaderboardEntry.objects.all(), GLOBAL_FIELDS, cursor, limit)
+
+
+def course_ranking(course_id, cursor=None, limit=PAGE_SIZE):
+    return leaderboard_page(CourseProgress.objects.filter(course_id=course_id), COURSE_FIELDS, cursor, limit)
+
+
+def rank_of(queryset, row):
+    """1-based position of a row in its ranking: one count over the ranking index."""
+    ahead = queryset.filter(Q(points__gt=row.points) | Q(points=row.points, user_id__lt=row.user_id))
+    return ahead.count() + 1
+
+
+def user_course_progress(user, course_id):
+    """
+    A user's progress and rank in a course.
+
+    Returns:
+        dict: {'course_id', 'chapters', 'chapters_attempted', 'percent', 'points', 'rank' (None before any attempt)}
+    """
+    chapters = len(get_course_outline(course_id))
+    progress = CourseProgress.objects.filter(user=user, course_id=course_id).first()
+    attempted = progress.chapters_attempted if progress else 0
+    return {
+        'course_id': course_id,
+        'chapters': chapters,
+        'chapters_attempted': attempted,
+        'percent': round(100 * attempted / chapters) if chapters else 0,
+        'points': progress.points if progress else 0,
+        'rank': rank_of(CourseProgress.objects.filter(course_id=course_id), progress) if progress else None,
+    }
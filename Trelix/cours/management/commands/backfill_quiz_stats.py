@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cours.models import ChapterQuizScore
+from cours.scores import rebuild_quiz_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-user, per-chapter quiz statistics (ChapterQuizStats) from all stored "
+        "ChapterQuizScore attempts. Safe to re-run; new attempts keep the rollup current on their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows written per INSERT")
+
+    def handle(self, *args, **options):
+        attempts = ChapterQuizScore.objects.count()
+        rows = rebuild_quiz_stats(batch_size=options['batch_size'])
+        self.stdout.write(f"✅ {rows} user/chapter statistics rebuilt from {attempts} attempts")
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from cours.summarization import asummarize_chunks, split_text
+
+
+def make_handler(latency, failure_rate):
+    class MockSummarizationHandler(BaseHTTPRequestHandler):
+        """Answers like NLP Cloud /summarization after a fixed latency."""
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            if random.random() < failure_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+
+            text = json.loads(body).get("text", "")
+            answer = json.dumps({"summary_text": text[:100]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(answer)))
+            self.end_headers()
+            self.wfile.write(answer)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockSummarizationHandler
+
+
+def sequential_summaries(url, chunks):
+    """The former summarize_course loop: one blocking request after another."""
+    summaries = []
+    for chunk in chunks:
+        payload = {"text": chunk, "min_length": 50, "max_length": 300}
+        response = requests.post(url, headers={"Content-Type": "application/json"}, data=json.dumps(payload))
+        if response.status_code == 200:
+            summaries.append(response.json().get("summary_text", ""))
+    return summaries
+
+
+class Command(BaseCommand):
+    help = "Benchmark course summarization, sequential vs parallel, against a local mock NLP Cloud server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunks', type=int, default=20, help="Number of 500-token chunks")
+        parser.add_argument('--latency', type=float, default=0.5, help="Mock API latency in seconds")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent requests for the parallel run")
+        parser.add_argument('--failure-rate', type=float, default=0.0,
+                            help="Share of mock answers that are 503 (retried by the parallel run)")
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(options['latency'], options['failure_rate']))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+        paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 30
+        chunks = split_text("\n\n".join([paragraph] * options['chunks']), max_tokens=500)
+        self.stdout.write(f"{len(chunks)} chunks, {options['latency']}s mock latency")
+
+        try:
+            with override_settings(NLP_CLOUD_BASE_URL=base_url, NLP_CLOUD_MODEL="mock", AI_HTTP_BACKOFF=0.1):
+                start = time.perf_counter()
+                sequential = sequential_summaries(f"{base_url}/mock/summarization", chunks)
+                sequential_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                summaries, errors = asyncio.run(asummarize_chunks(chunks, max_workers=options['workers']))
+                parallel_time = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+        self.stdout.write(f"Sequential:               {sequential_time:.2f}s ({len(sequential)} summaries)")
+        self.stdout.write(f"Parallel ({options['workers']} workers): {parallel_time:.2f}s "
+                          f"({len(chunks) - len(errors)} summaries, {len(errors)} failed)")
+        self.stdout.write(f"Speed-up: x{sequential_time / parallel_time:.2f}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from cours.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild course progress (CourseProgress) and the global leaderboard (LeaderboardEntry) from the "
+        "quiz statistics, exam scores and badges. Run after backfill_quiz_stats or bulk score updates; "
+        "new attempts, exams and badges keep them current on their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows written per INSERT")
+
+    def handle(self, *args, **options):
+        progress, entries = rebuild_leaderboard(batch_size=options['batch_size'])
+        self.stdout.write(f"✅ {progress} course progress rows and {entries} leaderboard entries rebuilt")
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chapitre', '0002_remove_chapter_video_url_chapter_video_and_more'),
+        ('cours', '0006_alter_course_image_cloudinary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedQuiz',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('questions', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generated_quizzes', to='chapitre.chapter')),
+            ],
+            options={
+                'unique_together': {('chapter', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cours', '0007_generatedquiz'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashcardCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('num_cards', models.PositiveIntegerField()),
+                ('model_name', models.CharField(max_length=100)),
+                ('flashcards', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flashcard_caches', to='cours.course')),
+            ],
+            options={
+                'unique_together': {('course', 'content_hash', 'num_cards', 'model_name')},
+            },
+        ),
+    ]
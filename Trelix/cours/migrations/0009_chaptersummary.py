@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chapitre', '0002_remove_chapter_video_url_chapter_video_and_more'),
+        ('cours', '0008_flashcardcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='chapitre.chapter')),
+            ],
+            options={
+                'unique_together': {('chapter', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chapitre', '0002_remove_chapter_video_url_chapter_video_and_more'),
+        ('cours', '0009_chaptersummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chapterquizscore',
+            index=models.Index(fields=['user', 'chapter', 'created_at'], name='cours_chapt_user_id_71ea3d_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chapitre', '0002_remove_chapter_video_url_chapter_video_and_more'),
+        ('cours', '0010_chapterquizscore_user_chapter_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterQuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('total_score', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('last_score', models.IntegerField(default=0)),
+                ('average_score', models.FloatField(default=0)),
+                ('last_attempt_at', models.DateTimeField()),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_stats', to='chapitre.chapter')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'chapter')},
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 import re
 from django.contrib.auth.models import User
@@ -45,5 +47,202 @@ class ChapterQuizScore(models.Model):
     score = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-user score lookups of the chapter page (see cours/scores.py)
+            models.Index(fields=['user', 'chapter', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.chapter} - {self.score}"
+
+
+class ChapterQuizStats(models.Model):
+    """
+    Rollup of a user's ChapterQuizScore attempts on a chapter, updated on every
+    new attempt and recomputed when one is edited or deleted (see
+    cours/scores.py) so progress and rankings never scan the attempts table.
+    Rebuilt from the attempts by `manage.py backfill_quiz_stats`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quiz_stats")
+    chapter = models.ForeignKey("chapitre.Chapter", on_delete=models.CASCADE, related_name="quiz_stats")
+    attempts = models.PositiveIntegerField(default=0)
+    total_score = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    last_score = models.IntegerField(default=0)
+    average_score = models.FloatField(default=0)
+    last_attempt_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'chapter']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.chapter} - best {self.best_score} ({self.attempts} attempts)"
+
+
+class CourseProgress(models.Model):
+    """
+    A user's progress in a course: chapters with a quiz attempt and the sum of
+    their best scores. Recomputed from the user's ChapterQuizStats on each
+    attempt (see cours/leaderboard.py) and ranked by points.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="course_progress")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="progress")
+    chapters_attempted = models.PositiveIntegerField(default=0)
+    points = models.IntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['user', 'course']
+        indexes = [
+            # Course leaderboard pages and ranks (see cours/leaderboard.py)
+            models.Index(fields=['course', '-points', 'user'], name='cours_progress_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.course} - {self.points} points"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A user's global standing: best chapter quiz scores, best exam scores and
+    badges, weighted into points (see cours/leaderboard.py). Recomputed for
+    the user whenever one of them changes, rebuilt by `manage.py rebuild_leaderboard`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="leaderboard_entry")
+    quiz_points = models.IntegerField(default=0)
+    exam_points = models.FloatField(default=0)
+    badges = models.PositiveIntegerField(default=0)
+    points = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Global leaderboard pages and ranks (see cours/leaderboard.py)
+            models.Index(fields=['-points', 'user'], name='cours_leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.points} points"
+
+
+class GeneratedQuiz(models.Model):
+    """
+    LLM-generated quiz of a chapter, stored per version of the chapter text
+    (content_hash is the SHA-256 of chapter.description).
+    """
+    chapter = models.ForeignKey("chapitre.Chapter", on_delete=models.CASCADE, related_name="generated_quizzes")
+    content_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    questions = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['chapter', 'content_hash']
+
+    def __str__(self):
+        return f"{self.chapter} - {self.content_hash[:8]}"
+
+
+class FlashcardCache(models.Model):
+    """
+    Flashcards generated by Gemini for a course, keyed by the hash of the
+    course text, the number of cards and the model. Entries expire after
+    FLASHCARD_CACHE_TTL and the least recently used are evicted beyond
+    FLASHCARD_CACHE_MAX_ENTRIES (see cours/flashcard_cache.py).
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="flashcard_caches")
+    content_hash = models.CharField(max_length=64)
+    num_cards = models.PositiveIntegerField()
+    model_name = models.CharField(max_length=100)
+    flashcards = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ['course', 'content_hash', 'num_cards', 'model_name']
+
     def __str__(self):
-        return f"{self.user.username} - {self.chapter} - {self.score}"
\ No newline at end of file
+        return f"{self.course} - {self.num_cards} cards ({self.model_name})"
+
+
+class ChapterSummary(models.Model):
+    """NLP Cloud summary of one version of a chapter text (content_hash of chapter.description)."""
+    chapter = models.ForeignKey("chapitre.Chapter", on_delete=models.CASCADE, related_name="summaries")
+    content_hash = models.CharField(max_length=64)
+    summary = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['chapter', 'content_hash']
+
+    def __str__(self):
+        return f"{self.chapter} - {self.content_hash[:8]}"
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_flashcards_on_course_change(sender, instance, **kwargs):
+    from .flashcard_cache import invalidate_flashcards
+    invalidate_flashcards(instance.pk)
+
+
+@receiver(post_save, sender=ChapterQuizScore)
+def update_quiz_stats_on_new_score(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .scores import record_attempt
+        from .leaderboard import refresh_course_progress, refresh_leaderboard_entry
+        record_attempt(instance)
+        refresh_course_progress(instance.user_id, instance.chapter.course_id)
+        refresh_leaderboard_entry(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=ChapterQuizScore)
+def update_quiz_stats_on_score_change(sender, instance, created=False, raw=False, **kwargs):
+    # New attempts are folded in above; edited or deleted ones recompute the row after commit
+    if not created and not raw:
+        from .scores import schedule_quiz_stats_recompute
+        schedule_quiz_stats_recompute(instance.user_id, instance.chapter_id)
+
+
+@receiver(post_delete, sender=ChapterQuizStats)
+def update_rankings_on_stats_delete(sender, instance, **kwargs):
+    # Chapter or user deleted: only existing rows are updated, the user may be on its way out too
+    from chapitre.models import Chapter
+    from .leaderboard import refresh_course_progress, refresh_leaderboard_entry
+    course_id = Chapter.objects.filter(pk=instance.chapter_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        refresh_course_progress(instance.user_id, course_id, create=False)
+    refresh_leaderboard_entry(instance.user_id, create=False)
+
+
+@receiver([post_save, post_delete], sender="examan.StudentExam")
+def update_leaderboard_on_exam_change(sender, instance, raw=False, **kwargs):
+    # An attempt counts once graded
+    if not raw and instance.score is not None:
+        from .leaderboard import refresh_leaderboard_entry
+        refresh_leaderboard_entry(instance.student_id, create=kwargs['signal'] is post_save)
+
+
+@receiver([post_save, post_delete], sender="quiz.UserBadge")
+def update_leaderboard_on_badge_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from .leaderboard import refresh_leaderboard_entry
+        refresh_leaderboard_entry(instance.user_id, create=kwargs['signal'] is post_save)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_catalog_on_course_change(sender, instance, **kwargs):
+    from .catalog import invalidate_catalog
+    invalidate_catalog()
+
+
+@receiver([post_save, post_delete], sender="chapitre.Chapter")
+def invalidate_flashcards_on_chapter_change(sender, instance, **kwargs):
+    from .flashcard_cache import invalidate_flashcards
+    invalidate_flashcards(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender="chapitre.Chapter")
+def invalidate_outline_on_chapter_change(sender, instance, **kwargs):
+    from .outline import invalidate_outline
+    invalidate_outline(instance.course_id)
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+
+from chapitre.models import Chapter
+
+OUTLINE_TIMEOUT = 60 * 60 * 24  # invalidated on Chapter save/delete and when a stream is ready, this is only a safety net
+
+
+def outline_cache_key(course_id):
+    return f"course:{course_id}:outline"
+
+
+def build_outline(course_id):
+    """
+    Chapters of a course in reading order, as rendered by the chapter page.
+
+    Returns:
+        list: [{'id', 'title', 'description', 'order', 'video', 'stream', 'poster'}]: URLs of the
+        upload, of its HLS master playlist and poster once transcoded, or ""
+    """
+    chapters = Chapter.objects.filter(course_id=course_id).select_related('stream').order_by('order', 'id')
+    return [chapter_entry(chapter) for chapter in chapters]
+
+
+def chapter_entry(chapter):
+    stream = getattr(chapter, 'stream', None)
+    return {
+        'id': chapter.id,
+        'title': chapter.title,
+        'description': chapter.description,
+        'order': chapter.order,
+        'video': chapter.video.url if chapter.video else "",
+        'stream': stream.playlist_url if stream else "",
+        'poster': stream.poster_url if stream else "",
+    }
+
+
+def get_course_outline(course_id):
+    """Cached outline of a course (one query when cold, none when warm)."""
+    key = outline_cache_key(course_id)
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_outline(course_id)
+        cache.set(key, outline, OUTLINE_TIMEOUT)
+    return outline
+
+
+def invalidate_outline(course_id):
+    cache.delete(outline_cache_key(course_id))
@@ -0,0 +1,98 @@
+import json
+import logging
+
+from Trelix.ai_client import hf_chat_completion
+from .models import GeneratedQuiz
+from .utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+QUIZ_MODEL = "deepseek-ai/DeepSeek-V3-0324"
+
+
+def build_prompt(content):
+    return f"""
+Create a short quiz (3 questions) in English based on the following text:
+---
+{content}
+---
+Each question should have 3 options (A, B, C) and indicate which one is correct.
+Format it strictly as JSON, like this:
+[
+  {{
+    "question": "...",
+    "options": ["A", "B", "C"],
+    "answer": "A"
+  }},
+  ...
+]
+Do not include any extra text or explanation outside the JSON array.
+"""
+
+
+def parse_quiz(raw_text):
+    """
+    Turn the model answer into the quiz sent to the page.
+
+    Returns:
+        list: questions with options as [{"label", "value"}], empty if the JSON is invalid
+    """
+    try:
+        # Supprimer les ```json ... ``` si présent
+        clean_text = raw_text.strip().strip("```").replace("json", "").strip()
+        quiz_json = json.loads(clean_text)
+        for q in quiz_json:
+            q['options'] = [{"label": opt, "value": opt} for opt in q.get('options', [])]
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        logger.warning("HuggingFace returned invalid JSON: %s", raw_text)
+        quiz_json = []
+    return quiz_json
+
+
+def request_quiz(content):
+    """Ask the HuggingFace DeepSeek endpoint for a quiz on the given text."""
+    raw_text = hf_chat_completion(QUIZ_MODEL, [{"role": "user", "content": build_prompt(content)}])
+    return parse_quiz(raw_text)
+
+
+def get_cached_quiz(chapter):
+    """Stored quiz for the current chapter text, or None."""
+    return GeneratedQuiz.objects.filter(
+        chapter=chapter, content_hash=content_hash(chapter.description)
+    ).first()
+
+
+def get_or_generate_quiz(chapter, regenerate=False):
+    """
+    Quiz of a chapter, generated only when the chapter text changed since the
+    last generation. Quizzes of older versions of the text are dropped.
+
+    Args:
+        chapter: Chapter instance
+        regenerate: ignore the stored quiz and ask the model again
+
+    Returns:
+        list: the questions (empty if the model answer could not be parsed)
+    """
+    digest = content_hash(chapter.description)
+    if not regenerate:
+        stored = get_cached_quiz(chapter)
+        if stored:
+            return stored.questions
+
+    questions = request_quiz(chapter.description or "")
+    # Don't store a failed generation, the next request retries
+    if questions:
+        store_quiz(chapter, digest, questions)
+    return questions
+
+
+def store_quiz(chapter, digest, questions):
+    """Save a generated quiz; quizzes of older versions of the text are dropped."""
+    GeneratedQuiz.objects.update_or_create(
+        chapter=chapter,
+        content_hash=digest,
+        defaults={'questions': questions, 'model': QUIZ_MODEL},
+    )
+    GeneratedQuiz.objects.filter(chapter=chapter).exclude(content_hash=digest).delete()
+
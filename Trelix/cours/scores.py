@@ -0,0 +1,165 @@
+import threading
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, FloatField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Greatest
+
+from chapitre.models import Chapter
+from .leaderboard import refresh_course_progress, refresh_leaderboard_entry
+from .models import ChapterQuizScore, ChapterQuizStats
+
+_local = threading.local()
+
+
+def record_attempt(attempt):
+    """
+    Fold a new ChapterQuizScore into the (user, chapter) rollup with an atomic
+    upsert: a single UPDATE computed by the database, or the first row.
+    Concurrent attempts of the same user can't lose an update.
+    """
+    stats = ChapterQuizStats.objects.filter(user_id=attempt.user_id, chapter_id=attempt.chapter_id)
+    changes = {
+        'attempts': F('attempts') + 1,
+        'total_score': F('total_score') + attempt.score,
+        'best_score': Greatest(F('best_score'), attempt.score),
+        'last_score': attempt.score,
+        # Evaluated on the row before the update, like the other columns
+        'average_score': Cast(F('total_score') + attempt.score, FloatField()) / (F('attempts') + 1),
+        'last_attempt_at': attempt.created_at,
+    }
+    if stats.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ChapterQuizStats.objects.create(
+                user_id=attempt.user_id,
+                chapter_id=attempt.chapter_id,
+                attempts=1,
+                total_score=attempt.score,
+                best_score=attempt.score,
+                last_score=attempt.score,
+                average_score=attempt.score,
+                last_attempt_at=attempt.created_at,
+            )
+    except IntegrityError:
+        # Another attempt created the row first
+        stats.update(**changes)
+
+
+STATS_FIELDS = ['attempts', 'total_score', 'best_score', 'last_score', 'average_score', 'last_attempt_at']
+
+
+def _attempt_groups(attempts):
+    """Rollup values of each (user, chapter) of an attempts queryset, as one grouped query."""
+    latest = ChapterQuizScore.objects.filter(
+        user_id=OuterRef('user_id'), chapter_id=OuterRef('chapter_id')
+    ).order_by('-created_at', '-id')
+    return (
+        attempts.values('user_id', 'chapter_id')
+        .annotate(
+            attempts=Count('id'),
+            total_score=Sum('score'),
+            best_score=Max('score'),
+            last_attempt_at=Max('created_at'),
+            last_score=Subquery(latest.values('score')[:1]),
+        )
+        .order_by()
+    )
+
+
+def rebuild_quiz_stats(batch_size=1000):
+    """
+    Recompute every rollup row from the attempts table (one grouped query),
+    e.g. for attempts stored before the rollup existed.
+
+    Returns:
+        int: number of (user, chapter) rows written
+    """
+    rows = [
+        ChapterQuizStats(average_score=group['total_score'] / group['attempts'], **group)
+        for group in _attempt_groups(ChapterQuizScore.objects.all())
+    ]
+    ChapterQuizStats.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'chapter'],
+        update_fields=STATS_FIELDS,
+    )
+    return len(rows)
+
+
+def recompute_quiz_stats(user_id, chapter_id):
+    """
+    Recompute one rollup row from its attempts, after an attempt was edited or
+    deleted (record_attempt only folds in new ones). The row is deleted once
+    no attempt is left.
+
+    Returns:
+        ChapterQuizStats or None when the row was deleted
+    """
+    attempts = ChapterQuizScore.objects.filter(user_id=user_id, chapter_id=chapter_id)
+    group = next(iter(_attempt_groups(attempts)), None)
+    if group is None:
+        ChapterQuizStats.objects.filter(user_id=user_id, chapter_id=chapter_id).delete()
+        return None
+    group['average_score'] = group['total_score'] / group['attempts']
+    stats, _ = ChapterQuizStats.objects.update_or_create(
+        user_id=group.pop('user_id'), chapter_id=group.pop('chapter_id'), defaults=group,
+    )
+    return stats
+
+
+class _RecomputeBatch:
+    """(user, chapter) rollups to recompute once the current transaction commits."""
+
+    def __init__(self):
+        self.pairs = set()
+
+    def __call__(self):
+        if getattr(_local, 'batch', None) is self:
+            _local.batch = None
+        recompute_quiz_stats_batch(self.pairs)
+
+
+def schedule_quiz_stats_recompute(user_id, chapter_id):
+    """
+    Recompute a rollup row after its transaction commits. Deleting a user or
+    a chapter cascades to all their attempts: each (user, chapter) is then
+    recomputed once, not once per attempt.
+    """
+    batch = getattr(_local, 'batch', None)
+    # A batch is reused while its callback is still registered (not run, not rolled back)
+    if batch is None or not any(callback[1] is batch for callback in connection.run_on_commit):
+        batch = _local.batch = _RecomputeBatch()
+        transaction.on_commit(batch)
+    batch.pairs.add((user_id, chapter_id))
+
+
+def recompute_quiz_stats_batch(pairs):
+    """
+    Recompute the rollup rows of (user, chapter) pairs, then the progress and
+    global entry of each user concerned, once each. Deleted rows update the
+    rankings themselves (see update_rankings_on_stats_delete).
+    """
+    kept = [(user_id, chapter_id) for user_id, chapter_id in pairs if recompute_quiz_stats(user_id, chapter_id)]
+    chapter_ids = {chapter_id for _, chapter_id in kept}
+    courses = dict(Chapter.objects.filter(pk__in=chapter_ids).values_list('pk', 'course_id'))
+    for user_id, course_id in {(user_id, courses[chapter_id]) for user_id, chapter_id in kept if chapter_id in courses}:
+        refresh_course_progress(user_id, course_id, create=False)
+    for user_id in {user_id for user_id, _ in kept}:
+        refresh_leaderboard_entry(user_id, create=False)
+
+
+def best_chapter_scores(user, chapter_ids):
+    """
+    Best quiz score of a user for each of the given chapters, read from the
+    rollup (one row per attempted chapter). No query for anonymous users.
+
+    Returns:
+        dict: {chapter_id: best score}, chapters without attempt left out
+    """
+    if not user.is_authenticated or not chapter_ids:
+        return {}
+    rows = ChapterQuizStats.objects.filter(user=user, chapter_id__in=chapter_ids).values_list('chapter_id', 'best_score')
+    return dict(rows)
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from Trelix.ai_client import AIProviderError, anlpcloud_summarize
+from .models import ChapterSummary
+from .utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English text, close enough to size API inputs
+CHARS_PER_TOKEN = 4
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class SummarizationError(Exception):
+    """A chunk could not be summarized, even after retries."""
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _pieces(text, max_tokens):
+    """Paragraphs, or the sentences (then word windows) of paragraphs too long for one chunk."""
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            yield paragraph, "\n\n"
+            continue
+
+        separator = "\n\n"
+        for sentence in SENTENCE_END.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                yield sentence, separator
+            else:
+                # A single overlong sentence: cut between words
+                words, window = sentence.split(), []
+                for word in words:
+                    if window and estimate_tokens(" ".join(window + [word])) > max_tokens:
+                        yield " ".join(window), separator
+                        separator = " "
+                        window = []
+                    window.append(word)
+                if window:
+                    yield " ".join(window), separator
+            separator = " "
+
+
+def split_text(text, max_tokens=None):
+    """
+    Split a text into chunks of at most max_tokens (default
+    settings.SUMMARY_CHUNK_TOKENS) estimated tokens.
+
+    Chunks are packed from whole paragraphs; a paragraph is only cut
+    between sentences, and a sentence only between words, when it does
+    not fit in a chunk on its own.
+    """
+    max_tokens = max_tokens or settings.SUMMARY_CHUNK_TOKENS
+    chunks, current = [], ""
+    for piece, separator in _pieces(text, max_tokens):
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def asummarize_chunk(text):
+    """
+    Summarize one chunk with NLP Cloud, through Trelix/ai_client.py (shared
+    client, retries, circuit breaker and concurrency limit of the provider).
+
+    Returns:
+        str: the summary text
+    Raises:
+        SummarizationError: when the call failed, after retries
+    """
+    try:
+        return await anlpcloud_summarize(text)
+    except AIProviderError as e:
+        raise SummarizationError(str(e)) from e
+
+
+async def aiter_summaries(chunks, max_workers=None):
+    """
+    Summarize chunks concurrently, at most max_workers requests in flight.
+
+    Args:
+        chunks: list of texts
+        max_workers: concurrent API requests (default settings.SUMMARY_MAX_WORKERS)
+
+    Yields:
+        tuple: (chunk index, summary or None, error message or None), as each chunk finishes
+    """
+    if not chunks:
+        return
+    semaphore = asyncio.Semaphore(max(1, max_workers or settings.SUMMARY_MAX_WORKERS))
+
+    async def run(i, chunk):
+        async with semaphore:
+            try:
+                return i, await asummarize_chunk(chunk), None
+            except Exception as e:
+                logger.warning("Chunk %s/%s could not be summarized: %s", i + 1, len(chunks), e)
+                return i, None, str(e)
+
+    tasks = [asyncio.ensure_future(run(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop pending requests if the consumer goes away (e.g. closed stream)
+        for task in tasks:
+            task.cancel()
+
+
+async def asummarize_chunks(chunks, max_workers=None):
+    """
+    Summarize chunks concurrently (see aiter_summaries), keeping their order.
+
+    Returns:
+        tuple: (summaries, errors) where summaries[i] is the summary of chunks[i]
+               or None if it failed, and errors maps failed indexes to their message
+    """
+    summaries = [None] * len(chunks)
+    errors = {}
+    async for i, summary, error in aiter_summaries(chunks, max_workers):
+        if error is None:
+            summaries[i] = summary
+        else:
+            errors[i] = error
+    return summaries, errors
+
+
+class CourseSummarizer:
+    """
+    Map step of the course summary: one summary per chapter, stored per
+    version of its text (ChapterSummary).
+
+    Only chapters whose description changed are split and sent to the API,
+    all their chunks at once through aiter_summaries. An unchanged course
+    costs no API call. Chapters are taken in order while their chunks fit
+    in max_calls; the others are left for a later call. A chapter with more
+    chunks than max_calls could never fit and is reported as too long. A
+    chapter with a failed chunk is not stored.
+
+    aiter_chapters() yields events as summaries become available, for
+    streaming; arun() returns the whole map-reduce result.
+    """
+
+    def __init__(self, chapters, max_calls=None, **kwargs):
+        self.chapters = [chapter for chapter in chapters if chapter.description]
+        self.max_calls = settings.SUMMARY_MAX_CALLS if max_calls is None else max_calls
+        self.kwargs = kwargs
+        self.hashes = {chapter.pk: content_hash(chapter.description) for chapter in self.chapters}
+        self.summaries = {}
+        self.failed_chunks = 0
+        self.pending_chapters = 0
+        self.too_long_chapters = 0
+        self.api_calls = 0
+
+    def _store(self, chapter_id, summary):
+        digest = self.hashes[chapter_id]
+        ChapterSummary.objects.update_or_create(
+            chapter_id=chapter_id, content_hash=digest, defaults={'summary': summary},
+        )
+        ChapterSummary.objects.filter(chapter_id=chapter_id).exclude(content_hash=digest).delete()
+        self.summaries[chapter_id] = summary
+
+    def _plan(self):
+        """
+        Load stored summaries and split the chapters left to summarize.
+
+        Returns:
+            tuple: (events of the stored chapter summaries, chunks to send to the API)
+        """
+        self._positions = {chapter.pk: position for position, chapter in enumerate(self.chapters)}
+        stored = {
+            chapter_id: summary
+            for chapter_id, digest, summary in ChapterSummary.objects.filter(
+                chapter_id__in=self.hashes
+            ).values_list('chapter_id', 'content_hash', 'summary')
+            if digest == self.hashes[chapter_id]
+        }
+
+        # Chunks of the chapters to (re)summarize, remembering where each belongs
+        events, chunks, self._owners, self._parts, self._failed = [], [], [], {}, set()
+        for chapter in self.chapters:
+            summary = stored.get(chapter.pk)
+            if summary is not None:
+                self.summaries[chapter.pk] = summary
+                events.append({'type': 'chunk', 'chapter': chapter.pk, 'position': self._positions[chapter.pk],
+                               'part': 0, 'parts': 1, 'summary': summary, 'cached': True})
+                continue
+            chapter_chunks = split_text(chapter.description)
+            if len(chapter_chunks) > self.max_calls:
+                # Over the budget on its own: no later call would summarize it
+                self.too_long_chapters += 1
+                continue
+            if len(chunks) + len(chapter_chunks) > self.max_calls:
+                self.pending_chapters += 1
+                continue
+            for part, chunk in enumerate(chapter_chunks):
+                chunks.append(chunk)
+                self._owners.append((chapter.pk, part))
+            self._parts[chapter.pk] = [None] * len(chapter_chunks)
+
+        self.api_calls += len(chunks)
+        return events, chunks
+
+    def _on_result(self, i, summary, error):
+        """Event for the result of chunk i; stores its chapter once all its chunks are done."""
+        chapter_id, part = self._owners[i]
+        event = {'chapter': chapter_id, 'position': self._positions[chapter_id], 'part': part}
+        if error is not None:
+            self.failed_chunks += 1
+            self._failed.add(chapter_id)
+            return {'type': 'chunk_error', **event, 'error': error}
+
+        parts = self._parts[chapter_id]
+        parts[part] = summary or ""
+        if chapter_id not in self._failed and all(p is not None for p in parts):
+            self._store(chapter_id, "\n\n".join(p for p in parts if p))
+        return {'type': 'chunk', **event, 'parts': len(parts), 'summary': summary or "", 'cached': False}
+
+    async def aiter_chapters(self):
+        """
+        Yields:
+            dict: {'type': 'chunk', 'chapter', 'position', 'part', 'parts', 'summary', 'cached'}
+                  for each stored chapter summary first, then for each new chunk summary
+                  as soon as it is ready; {'type': 'chunk_error', 'chapter', 'position', 'part', 'error'}
+                  for a failed chunk
+        """
+        events, chunks = await sync_to_async(self._plan)()
+        for event in events:
+            yield event
+        async for i, summary, error in aiter_summaries(chunks, **self.kwargs):
+            yield await sync_to_async(self._on_result)(i, summary, error)
+
+    def chapter_summaries(self):
+        """Summaries available after aiter_chapters(), in chapter order."""
+        return [self.summaries[chapter.pk] for chapter in self.chapters if chapter.pk in self.summaries]
+
+    def _result(self, summary, reduce_calls):
+        self.api_calls += reduce_calls
+        return {
+            'summary': summary,
+            'failed_chunks': self.failed_chunks,
+            'pending_chapters': self.pending_chapters,
+            'too_long_chapters': self.too_long_chapters,
+            'api_calls': self.api_calls,
+        }
+
+    async def aresult(self):
+        """Reduce the chapter summaries (see areduce_summaries) once aiter_chapters() is consumed."""
+        return self._result(*await areduce_summaries(
+            self.chapter_summaries(), self.max_calls - self.api_calls, **self.kwargs
+        ))
+
+    async def arun(self):
+        async for _ in self.aiter_chapters():
+            pass
+        return await self.aresult()
+
+
+async def areduce_summaries(parts, max_calls, **kwargs):
+    """
+    Reduce step: summarize groups of summaries, level after level, until the
+    text fits settings.SUMMARY_TARGET_TOKENS.
+
+    Stops at the last complete level when a level would exceed max_calls,
+    has a failed chunk or does not shorten the text. Finished reductions
+    are cached by the hash of their input, so they are not paid twice.
+
+    Returns:
+        tuple: (summary text, API calls)
+    """
+    text = "\n\n".join(parts)
+    target = settings.SUMMARY_TARGET_TOKENS
+    if estimate_tokens(text) <= target:
+        return text, 0
+
+    key = f"course-summary:{content_hash(text)}:{target}"
+    reduced = await cache.aget(key)
+    if reduced is not None:
+        return reduced, 0
+
+    calls, complete = 0, True
+    while estimate_tokens(text) > target:
+        groups = split_text(text)
+        if calls + len(groups) > max_calls:
+            complete = False
+            break
+        summaries, errors = await asummarize_chunks(groups, **kwargs)
+        calls += len(groups)
+        if errors:
+            complete = False
+            break
+        shorter = "\n\n".join(s for s in summaries if s)
+        if estimate_tokens(shorter) >= estimate_tokens(text):
+            break
+        text = shorter
+
+    if complete:
+        await cache.aset(key, text, None)
+    return text, calls
+
+
+async def asummarize_course_text(chapters, max_calls=None, **kwargs):
+    """
+    Hierarchical (map-reduce) course summary: chapter summaries, then
+    summaries of groups of summaries until the result fits the target length.
+
+    Args:
+        chapters: chapters in display order
+        max_calls: API calls allowed for this course (default settings.SUMMARY_MAX_CALLS)
+        **kwargs: passed to asummarize_chunks
+
+    Returns:
+        dict: {'summary', 'failed_chunks', 'pending_chapters', 'too_long_chapters', 'api_calls'}
+    """
+    return await CourseSummarizer(chapters, max_calls, **kwargs).arun()
@@ -0,0 +1,98 @@
+import glob
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+from chapitre.models import Chapter
+from Trelix.jobs import enqueue
+from .models import Course
+from .utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump when trelix/summary_pdf.html changes so cached PDFs are rebuilt
+TEMPLATE_VERSION = 1
+
+
+class SummaryPDFError(Exception):
+    """pisa could not render the summary PDF."""
+
+
+def summary_pdf_text(course):
+    chapters = Chapter.objects.filter(course=course).order_by('id')
+    return "\n\n".join([c.description for c in chapters if c.description])
+
+
+def summary_pdf_hash(course, full_text):
+    return content_hash(f"{TEMPLATE_VERSION}\n{course.title}\n{full_text}")
+
+
+def summary_pdf_path(course_id, digest):
+    return os.path.join(settings.SUMMARY_PDF_CACHE_DIR, f"course_{course_id}_{digest}.pdf")
+
+
+def render_summary_pdf(course, full_text):
+    """
+    Returns:
+        bytes: the PDF of trelix/summary_pdf.html
+    """
+    html_string = render_to_string('trelix/summary_pdf.html', {
+        'course': course,
+        'summary': full_text.replace("\n", "<br>")
+    })
+    buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(html_string, dest=buffer)
+    if pisa_status.err:
+        raise SummaryPDFError(f"pisa reported {pisa_status.err} error(s)")
+    return buffer.getvalue()
+
+
+def build_summary_pdf(course, full_text=None):
+    """
+    Render the summary PDF of a course into the disk cache, unless the file
+    for the current content is already there. Files of older versions of
+    the course are removed.
+
+    Returns:
+        str: path of the cached PDF
+    """
+    if full_text is None:
+        full_text = summary_pdf_text(course)
+    path = summary_pdf_path(course.pk, summary_pdf_hash(course, full_text))
+    if os.path.exists(path):
+        return path
+
+    pdf_bytes = render_summary_pdf(course, full_text)
+    os.makedirs(settings.SUMMARY_PDF_CACHE_DIR, exist_ok=True)
+    # Write then rename, so a concurrent download never reads a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=settings.SUMMARY_PDF_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, path)
+
+    for old_path in glob.glob(summary_pdf_path(course.pk, "*")):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return path
+
+
+def render_summary_pdf_task(course_id):
+    """Background task: fill the disk cache for a large course."""
+    return {'path': build_summary_pdf(Course.objects.get(pk=course_id))}
+
+
+def enqueue_summary_pdf(course, digest):
+    """Schedule the first render of a large course (one job per course version)."""
+    return enqueue(
+        'cours.summary_pdf.render_summary_pdf_task',
+        key=f"summary-pdf:{course.pk}:{digest}",
+        payload={'course_id': course.pk},
+    )
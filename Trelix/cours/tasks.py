@@ -0,0 +1,73 @@
+import logging
+
+from chapitre.models import Chapter
+from Trelix.jobs import enqueue
+from .flashcard_cache import get_cached_flashcards, store_flashcards
+from .models import Course
+from .quiz_generation import get_cached_quiz, get_or_generate_quiz
+from .utils import GeminiFlashcardGenerator, get_course_content_for_flashcards
+
+logger = logging.getLogger(__name__)
+
+
+def course_quizzes_job_key(course_id):
+    return f"course-quizzes:{course_id}"
+
+
+def pregenerate_course_quizzes(course_id):
+    """
+    Background task: generate the quiz of every chapter of a course whose
+    current text has no stored quiz yet.
+    """
+    generated = skipped = failed = 0
+    for chapter in Chapter.objects.filter(course_id=course_id).order_by('order'):
+        if get_cached_quiz(chapter):
+            skipped += 1
+            continue
+        try:
+            if get_or_generate_quiz(chapter):
+                generated += 1
+            else:
+                failed += 1
+        except Exception:
+            # One failing chapter must not stop the others
+            logger.exception("Quiz generation failed for chapter %s", chapter.pk)
+            failed += 1
+
+    return {'course_id': course_id, 'generated': generated, 'skipped': skipped, 'failed': failed}
+
+
+def enqueue_course_quizzes(course):
+    """Schedule quiz pre-generation for all chapters of a course (one job per course)."""
+    return enqueue(
+        'cours.tasks.pregenerate_course_quizzes',
+        key=course_quizzes_job_key(course.pk),
+        payload={'course_id': course.pk},
+    )
+
+
+def generate_chapter_quiz(chapter_id):
+    """AI job (see Trelix/ai_jobs.py): quiz of a chapter for its current text."""
+    chapter = Chapter.objects.get(pk=chapter_id)
+    return {'quiz': get_or_generate_quiz(chapter)}
+
+
+def generate_course_flashcards(course_id, num_cards=10, model_name=None):
+    """
+    AI job (see Trelix/ai_jobs.py): flashcards of a course, stored in the
+    flashcard cache.
+
+    Returns:
+        dict: same payload as the generate_flashcards view
+    """
+    course = Course.objects.get(pk=course_id)
+    course_content = get_course_content_for_flashcards(course)
+    generator = GeminiFlashcardGenerator(model_name=model_name)
+
+    flashcards = get_cached_flashcards(course, course_content, num_cards, generator.model_name)
+    cached = flashcards is not None
+    if not cached:
+        flashcards = generator.generate_flashcards(course_content, num_cards=num_cards)
+        store_flashcards(course, course_content, num_cards, generator.model_name, flashcards)
+
+    return {'flashcards': flashcards, 'course_title': course.title, 'count': len(flashcards), 'cached': cached}
@@ -1,3 +1,714 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+import httpx
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from chapitre.models import Chapter
+from examan.models import Exam, StudentExam
+from quiz.models import Badge, Quiz, UserBadge
+from Trelix.models import BackgroundJob
+from .catalog import CATALOG_CACHE_KEY
+from .flashcard_cache import evict
+from .summarization import asummarize_chunks, asummarize_course_text, estimate_tokens, split_text
+from .utils import content_hash
+from .leaderboard import BADGE_POINTS, QUIZ_ANSWER_POINTS, rebuild_leaderboard
+from .models import (
+    Course, GeneratedQuiz, FlashcardCache, ChapterSummary, ChapterQuizScore, ChapterQuizStats, CourseProgress,
+    LeaderboardEntry,
+)
+from .outline import outline_cache_key
+from .scores import rebuild_quiz_stats, recompute_quiz_stats
+from .tasks import enqueue_course_quizzes, pregenerate_course_quizzes
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+QUIZ = [{"question": "Q?", "options": [{"label": "A", "value": "A"}], "answer": "A"}]
+
+
+def ai_request(test, method, url, *args, **kwargs):
+    """
+    Call an AI generation view; when the work is queued, run the job (JOBS_EAGER)
+    and return the result served by the job status URL.
+    """
+    with test.captureOnCommitCallbacks(execute=True):
+        response = method(url, *args, **kwargs)
+    if response.status_code != 202:
+        return response.json()
+    state = test.client.get(response.json()['status_url']).json()
+    test.assertEqual(state['status'], BackgroundJob.DONE)
+    return state['result']
+
+
+@override_settings(JOBS_EAGER=True)
+class GeneratedQuizCacheTestCase(TestCase):
+    """Test that chapter quizzes are generated once per version of the chapter text"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+        self.chapter = Chapter.objects.create(course=self.course, title="Variables", description="Variables hold values", order=1)
+        self.url = reverse('generate-quiz', args=[self.chapter.id])
+
+    def get_quiz(self):
+        return ai_request(self, self.client.get, self.url)
+
+    @patch('cours.quiz_generation.request_quiz', return_value=QUIZ)
+    def test_quiz_served_from_store(self, request_quiz):
+        """Test that a second request does not call the model"""
+        first = self.get_quiz()
+        second = self.get_quiz()
+
+        self.assertEqual(first, {"quiz": QUIZ})
+        self.assertEqual(second, first)
+        request_quiz.assert_called_once()
+
+    @patch('cours.quiz_generation.request_quiz', return_value=QUIZ)
+    def test_quiz_regenerated_when_description_changes(self, request_quiz):
+        """Test that editing the chapter text invalidates the stored quiz"""
+        self.get_quiz()
+        self.chapter.description = "Variables hold values and have a type"
+        self.chapter.save()
+        self.get_quiz()
+
+        self.assertEqual(request_quiz.call_count, 2)
+        self.assertEqual(GeneratedQuiz.objects.filter(chapter=self.chapter).count(), 1)
+
+    @patch('cours.quiz_generation.request_quiz', return_value=[])
+    def test_failed_generation_not_stored(self, request_quiz):
+        """Test that an unparsable answer is retried on the next request"""
+        self.get_quiz()
+        self.get_quiz()
+
+        self.assertEqual(request_quiz.call_count, 2)
+        self.assertFalse(GeneratedQuiz.objects.exists())
+
+    @patch('cours.quiz_generation.request_quiz', return_value=QUIZ)
+    def test_pregenerate_course_quizzes(self, request_quiz):
+        """Test background pre-generation of every chapter of a course"""
+        Chapter.objects.create(course=self.course, title="Loops", description="for and while", order=2)
+        self.get_quiz()
+
+        result = pregenerate_course_quizzes(self.course.id)
+        self.assertEqual(result, {'course_id': self.course.id, 'generated': 1, 'skipped': 1, 'failed': 0})
+        self.assertEqual(GeneratedQuiz.objects.count(), 2)
+
+    @override_settings(AI_JOB_USER_BURST=1)
+    def test_rate_limited(self):
+        """Test that generations beyond the user quota are refused with Retry-After"""
+        loops = Chapter.objects.create(course=self.course, title="Loops", description="for and while", order=2)
+        self.client.get(self.url)
+        response = self.client.get(reverse('generate-quiz', args=[loops.id]))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_enqueue_course_quizzes_once(self):
+        """Test that scheduling twice keeps a single pending job"""
+        enqueue_course_quizzes(self.course)
+        enqueue_course_quizzes(self.course)
+        self.assertEqual(BackgroundJob.objects.filter(key=f"course-quizzes:{self.course.id}").count(), 1)
+
+
+CARDS = [{"front": "Variable", "back": "A named value"}]
+
+
+@override_settings(JOBS_EAGER=True, GOOGLE_API_KEY="key")
+@patch('cours.tasks.GeminiFlashcardGenerator.generate_flashcards', return_value=CARDS)
+class FlashcardCacheTestCase(TestCase):
+    """Test the database cache of generated flashcards"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='student', password='testpass123'))
+        self.course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+        self.chapter = Chapter.objects.create(
+            course=self.course, title="Variables", description="Variables hold values of any type", order=1
+        )
+        self.url = reverse('generate-flashcards', args=[self.course.id])
+
+    def post(self, num_cards=10):
+        return ai_request(self, self.client.post, self.url, json.dumps({"num_cards": num_cards}),
+                          content_type="application/json")
+
+    def test_repeat_request_served_from_cache(self, generate):
+        """Test that the same course and num_cards only call Gemini once"""
+        first = self.post()
+        second = self.post()
+
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["flashcards"], CARDS)
+        generate.assert_called_once()
+
+    def test_num_cards_is_part_of_the_key(self, generate):
+        """Test that another number of cards is generated separately"""
+        self.post(10)
+        self.post(20)
+        self.assertEqual(generate.call_count, 2)
+
+    def test_invalidated_on_chapter_and_course_save(self, generate):
+        """Test that saving a Chapter or a Course empties its cache"""
+        self.post()
+        self.chapter.save()
+        self.assertFalse(FlashcardCache.objects.exists())
+
+        self.post()
+        self.course.save()
+        self.assertFalse(FlashcardCache.objects.exists())
+
+    @override_settings(FLASHCARD_CACHE_TTL=60)
+    def test_expired_entry_regenerated(self, generate):
+        """Test that entries older than the TTL are not served"""
+        self.post()
+        FlashcardCache.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+        self.assertFalse(self.post()["cached"])
+
+    def test_lru_eviction(self, generate):
+        """Test that the least recently used entries are evicted first"""
+        for num_cards in (5, 6, 7):
+            self.post(num_cards)
+        FlashcardCache.objects.filter(num_cards=5).update(last_used_at=timezone.now() + timedelta(seconds=1))
+
+        self.assertEqual(evict(max_entries=2), 1)
+        self.assertEqual(set(FlashcardCache.objects.values_list('num_cards', flat=True)), {5, 7})
+
+
+class MockNLPCloud:
+    """
+    Patch the HTTP client of the summarizer with a mock NLP Cloud.
+    answer(text) returns (status_code, summary).
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def handler(self, request):
+        self.calls += 1
+        status_code, summary = self.answer(json.loads(request.content)["text"])
+        return httpx.Response(status_code, json={"summary_text": summary})
+
+    def __enter__(self):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        self.patch = patch('Trelix.ai_client.get_async_client', return_value=client)
+        self.patch.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.patch.stop()
+
+
+@override_settings(NLP_CLOUD_MODEL="mock", AI_HTTP_BACKOFF=0)
+class ParallelSummarizationTestCase(TestCase):
+    """Test concurrent chunk summarization"""
+
+    async def test_order_preserved(self):
+        """Test that summaries come back in chunk order"""
+        with MockNLPCloud(lambda text: (200, text.upper())):
+            summaries, errors = await asummarize_chunks(["a", "b", "c", "d"], max_workers=3)
+        self.assertEqual(summaries, ["A", "B", "C", "D"])
+        self.assertEqual(errors, {})
+
+    async def test_transient_errors_retried(self):
+        """Test that a 503 is retried and a 400 is not"""
+        answers = iter([(503, None), (200, "ok")])
+        with MockNLPCloud(lambda text: next(answers)) as api:
+            self.assertEqual((await asummarize_chunks(["a"]))[0], ["ok"])
+        self.assertEqual(api.calls, 2)
+
+        with MockNLPCloud(lambda text: (400, None)) as api:
+            summaries, errors = await asummarize_chunks(["a"])
+        self.assertEqual(api.calls, 1)
+        self.assertEqual(summaries, [None])
+        self.assertIn("400", errors[0])
+
+    def test_partial_summary(self):
+        """Test that the view returns the chunks that succeeded"""
+        self.client.force_login(User.objects.create_user(username='student', password='testpass123'))
+        course = Course.objects.create(title="Python basics", is_published=True)
+        Chapter.objects.create(course=course, title="One", description="First chapter " * 100, order=1)
+        Chapter.objects.create(course=course, title="Two", description="Second chapter " * 100, order=2)
+
+        def answer(text):
+            return (500, None) if text.startswith("Second") else (200, "first summary")
+
+        with MockNLPCloud(answer):
+            data = self.client.get(reverse('summarize_course', args=[course.id])).json()
+        self.assertEqual(data, {"summary": "first summary", "partial": True, "failed_chunks": 1, "pending_chapters": 0,
+                                "too_long_chapters": 0})
+
+
+@override_settings(NLP_CLOUD_MODEL="mock", AI_HTTP_BACKOFF=0, CACHES=LOCMEM_CACHE)
+class ChapterSummaryCacheTestCase(TestCase):
+    """Test that course summaries only re-summarize changed chapters"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='student', password='testpass123'))
+        self.course = Course.objects.create(title="Python basics", is_published=True)
+        self.first = Chapter.objects.create(course=self.course, title="One", description="Variables hold values", order=1)
+        self.second = Chapter.objects.create(course=self.course, title="Two", description="Loops repeat code", order=2)
+        self.url = reverse('summarize_course', args=[self.course.id])
+
+    def summarize(self):
+        with MockNLPCloud(lambda text: (200, f"summary of {text}")) as api:
+            data = self.client.get(self.url).json()
+        return data["summary"], api.calls
+
+    def test_unchanged_course_costs_no_api_call(self):
+        """Test that a second summary is served from stored chapter summaries"""
+        summary, calls = self.summarize()
+        self.assertEqual(summary, "summary of Variables hold values\n\nsummary of Loops repeat code")
+        self.assertEqual(calls, 2)
+
+        self.assertEqual(self.summarize(), (summary, 0))
+
+    def test_only_edited_chapter_resummarized(self):
+        """Test that editing one chapter re-summarizes only that chapter"""
+        self.summarize()
+        self.second.description = "Loops repeat code blocks"
+        self.second.save()
+
+        summary, calls = self.summarize()
+        self.assertEqual(calls, 1)
+        self.assertEqual(summary, "summary of Variables hold values\n\nsummary of Loops repeat code blocks")
+        self.assertEqual(ChapterSummary.objects.filter(chapter=self.second).count(), 1)
+
+
+class SplitTextTestCase(TestCase):
+    """Test the token-aware splitter"""
+
+    def test_paragraphs_kept_whole(self):
+        """Test that paragraphs are packed without being cut"""
+        paragraphs = [f"Paragraph {i} has a few words in it." for i in range(10)]
+        chunks = split_text("\n\n".join(paragraphs), max_tokens=25)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("\n\n".join(chunks).split("\n\n"), paragraphs)
+        self.assertTrue(all(estimate_tokens(chunk) <= 25 for chunk in chunks))
+
+    def test_long_paragraph_cut_between_sentences(self):
+        """Test that an oversized paragraph is cut at sentence boundaries"""
+        sentences = [f"Sentence number {i} ends here." for i in range(20)]
+        chunks = split_text(" ".join(sentences), max_tokens=30)
+
+        self.assertTrue(all(chunk.endswith(".") for chunk in chunks))
+        self.assertEqual(" ".join(chunks), " ".join(sentences))
+
+
+@override_settings(NLP_CLOUD_MODEL="mock", AI_HTTP_BACKOFF=0, CACHES=LOCMEM_CACHE,
+                   SUMMARY_CHUNK_TOKENS=50, SUMMARY_TARGET_TOKENS=30)
+class MapReduceSummaryTestCase(TestCase):
+    """Test hierarchical summarization of long courses"""
+
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(title="Python basics", is_published=True)
+        for i in range(4):
+            Chapter.objects.create(course=course, title=f"Chapter {i}", description=f"Chapter {i} text. " * 20, order=i)
+        self.chapters = list(Chapter.objects.filter(course=course).order_by('id'))
+
+    @staticmethod
+    def halve(text):
+        # Mock summary: half of the input
+        return 200, text[:len(text) // 2]
+
+    async def test_reduced_to_target_length(self):
+        """Test that summaries of summaries are made until the target length"""
+        with MockNLPCloud(self.halve):
+            result = await asummarize_course_text(self.chapters)
+        self.assertLessEqual(estimate_tokens(result['summary']), 30)
+        self.assertGreater(result['api_calls'], 8)
+
+        with MockNLPCloud(self.halve) as api:
+            self.assertEqual((await asummarize_course_text(self.chapters))['summary'], result['summary'])
+        self.assertEqual(api.calls, 0)
+
+    async def test_api_calls_capped(self):
+        """Test that a course never costs more than max_calls"""
+        with MockNLPCloud(self.halve) as api:
+            result = await asummarize_course_text(self.chapters, max_calls=5)
+        self.assertLessEqual(api.calls, 5)
+        self.assertEqual(result['api_calls'], api.calls)
+        self.assertGreater(result['pending_chapters'], 0)
+
+    async def test_chapter_over_budget_reported_too_long(self):
+        """Test that a chapter with more chunks than max_calls is reported as too long, not pending"""
+        self.assertEqual({len(split_text(chapter.description)) for chapter in self.chapters}, {2})
+        with MockNLPCloud(self.halve) as api:
+            result = await asummarize_course_text(self.chapters, max_calls=1)
+        self.assertEqual(api.calls, 0)
+        self.assertEqual((result['too_long_chapters'], result['pending_chapters']), (4, 0))
+
+
+@override_settings(NLP_CLOUD_MODEL="mock", AI_HTTP_BACKOFF=0, CACHES=LOCMEM_CACHE)
+class SummaryStreamTestCase(TestCase):
+    """Test the server-sent events summary endpoint"""
+
+    def setUp(self):
+        self.async_client.force_login(User.objects.create_user(username='student', password='testpass123'))
+        self.course = Course.objects.create(title="Python basics", is_published=True)
+        self.first = Chapter.objects.create(course=self.course, title="One", description="Variables hold values", order=1)
+        Chapter.objects.create(course=self.course, title="Two", description="Loops repeat code", order=2)
+        ChapterSummary.objects.create(
+            chapter=self.first, content_hash=content_hash(self.first.description), summary="stored summary"
+        )
+
+    async def stream(self, answer=lambda text: (200, f"summary of {text}")):
+        with MockNLPCloud(answer):
+            response = await self.async_client.get(reverse('summarize_course_stream', args=[self.course.id]))
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in body.strip().split("\n\n")
+        ]
+
+    async def test_chunk_events_then_done(self):
+        """Test that each chapter summary is sent before the final summary"""
+        events = await self.stream()
+
+        self.assertEqual([name for name, _ in events], ["start", "chunk", "chunk", "done"])
+        self.assertEqual(events[1][1]["summary"], "stored summary")
+        self.assertTrue(events[1][1]["cached"])
+        self.assertEqual(events[2][1]["summary"], "summary of Loops repeat code")
+        self.assertEqual(events[3][1]["summary"], "stored summary\n\nsummary of Loops repeat code")
+
+    async def test_failed_chunk_keeps_stream_open(self):
+        """Test that a failed chunk is a chunk_error event (not "error", which closes EventSource) before done"""
+        events = await self.stream(lambda text: (400, None))
+
+        self.assertEqual([name for name, _ in events], ["start", "chunk", "chunk_error", "done"])
+        self.assertEqual(events[2][1]["position"], 1)
+        self.assertTrue(events[3][1]["partial"])
+
+
+class SummaryPDFCacheTestCase(TestCase):
+    """Test that summary PDFs are rendered once per course content"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        settings_override = override_settings(SUMMARY_PDF_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client.force_login(User.objects.create_user(username='student', password='testpass123'))
+        self.course = Course.objects.create(title="Python basics", is_published=True)
+        self.chapter = Chapter.objects.create(course=self.course, title="One", description="Variables hold values", order=1)
+        self.url = reverse('download-summary-pdf', args=[self.course.id])
+
+    @patch('cours.summary_pdf.render_summary_pdf', return_value=b"%PDF-1.4 test")
+    def test_pdf_rendered_once_and_revalidated(self, render_pdf):
+        """Test disk caching and conditional GET with the ETag"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 test")
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        render_pdf.assert_called_once()
+
+        self.chapter.description = "Variables hold typed values"
+        self.chapter.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    @override_settings(SUMMARY_PDF_ASYNC_CHARS=5)
+    @patch('cours.summary_pdf.render_summary_pdf')
+    def test_large_course_rendered_in_background(self, render_pdf):
+        """Test that a large course answers 202 and schedules the render"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+        render_pdf.assert_not_called()
+        self.assertTrue(BackgroundJob.objects.filter(key__startswith=f"summary-pdf:{self.course.id}:").exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CourseCatalogTestCase(TestCase):
+    """Test the cached catalog behind course_list and filter_courses"""
+
+    def setUp(self):
+        cache.clear()
+        self.python = Course.objects.create(title="Python basics", description="Learn Python " * 20,
+                                            level='beginner', is_published=True)
+        self.django = Course.objects.create(title="Django internals", description="Deep dive",
+                                            level='advanced', is_published=True)
+        Course.objects.create(title="Draft course", level='beginner')
+        self.url = reverse('filter-courses')
+
+    def titles(self, response):
+        return [course["title"] for course in response.json()["courses"]]
+
+    def test_filter_by_levels_from_cache(self):
+        """Test level combinations served without query once the catalog is warm"""
+        self.assertEqual(self.titles(self.client.get(self.url)), ["Python basics", "Django internals"])
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"levels": ["advanced", "intermediate"]})
+        self.assertEqual(self.titles(response), ["Django internals"])
+
+        card = self.client.post(self.url, json.dumps({"levels": ["beginner"]}),
+                                content_type="application/json").json()["courses"][0]
+        self.assertEqual(card["level"], "Beginner")
+        self.assertTrue(card["description"].endswith("..."))
+        self.assertEqual(len(card["description"]), 123)
+
+    def test_conditional_get(self):
+        """Test ETag revalidation and cache headers"""
+        response = self.client.get(self.url, {"levels": "beginner"})
+        self.assertIn("max-age", response["Cache-Control"])
+
+        not_modified = self.client.get(self.url, {"levels": "beginner"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_invalidated_on_course_save_and_delete(self):
+        """Test that publishing, editing or deleting a course is visible at once"""
+        self.client.get(self.url)
+        self.django.title = "Django ORM internals"
+        self.django.save()
+        self.assertIsNone(cache.get(CATALOG_CACHE_KEY))
+        self.assertIn("Django ORM internals", self.titles(self.client.get(self.url)))
+
+        self.python.delete()
+        self.assertEqual(self.titles(self.client.get(self.url)), ["Django ORM internals"])
+
+    def test_course_list_renders_cards(self):
+        """Test the course list page from the cached cards"""
+        response = self.client.get(reverse('courses'))
+        self.assertContains(response, "Django internals")
+        self.assertNotContains(response, "Draft course")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CourseDetailTestCase(TestCase):
+    """Test the chapter page: cached outline and per-user best scores"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+        self.second = Chapter.objects.create(course=self.course, title="Loops", description="for and while", order=2)
+        self.first = Chapter.objects.create(course=self.course, title="Variables", description="Values", order=1)
+        self.url = reverse('course-detail', args=[self.course.id])
+
+    def test_anonymous_visitor(self):
+        """Test that anonymous visitors get the page, with no score query"""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):  # the course; the outline comes from the cache
+            response = self.client.get(self.url)
+        self.assertEqual([chapter['title'] for chapter in response.context['chapters']], ["Variables", "Loops"])
+        self.assertEqual(response.context['selected_chapter']['id'], self.first.id)
+        self.assertEqual(response.context['user_scores_json'], "{}")
+
+    def test_best_score_per_chapter(self):
+        """Test that the best attempt of each chapter is shown"""
+        user = User.objects.create(username='student')
+        self.client.force_login(user)
+        for score in (1, 3, 2):
+            ChapterQuizScore.objects.create(user=user, chapter=self.first, score=score)
+
+        response = self.client.get(self.url)
+        self.assertEqual(json.loads(response.context['user_scores_json']), {str(self.first.id): 3})
+
+    def test_outline_invalidated_on_chapter_save(self):
+        """Test that editing a chapter refreshes the outline"""
+        self.client.get(self.url)
+        self.second.title = "Loops and iterators"
+        self.second.save()
+        self.assertIsNone(cache.get(outline_cache_key(self.course.id)))
+        self.assertContains(self.client.get(self.url), "Loops and iterators")
+
+
+class ChapterQuizStatsTestCase(TestCase):
+    """Test the per-user, per-chapter rollup of quiz attempts"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.client.force_login(self.user)
+        course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+        self.chapter = Chapter.objects.create(course=course, title="Variables", description="Values", order=1)
+        GeneratedQuiz.objects.create(chapter=self.chapter, content_hash=content_hash("Values"),
+                                     model="gemini", questions=[{"question": "Q"}] * 3)
+
+    def submit(self, score):
+        return self.client.post(reverse('submit_quiz_score'),
+                                json.dumps({"chapter_id": self.chapter.id, "score": score}),
+                                content_type="application/json")
+
+    def test_rollup_updated_on_each_attempt(self):
+        """Test attempts, best, last and average after several submissions"""
+        for score in (2, 3, 1):
+            self.submit(score)
+
+        stats = ChapterQuizStats.objects.get(user=self.user, chapter=self.chapter)
+        self.assertEqual((stats.attempts, stats.total_score, stats.best_score, stats.last_score), (3, 6, 3, 1))
+        self.assertAlmostEqual(stats.average_score, 2.0)
+
+    def test_invalid_score_rejected(self):
+        """Test that only whole scores between 0 and the stored quiz length, sent in a JSON object, are recorded"""
+        for score in (-1, 4, 2.5, "3", True, None):
+            self.assertEqual(self.submit(score).status_code, 400, score)
+        for body in ("[]", "5", '"text"', "null"):
+            response = self.client.post(reverse('submit_quiz_score'), body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.submit(3).status_code, 200)
+
+        GeneratedQuiz.objects.all().delete()
+        self.assertEqual(self.submit(1).status_code, 400)
+        self.assertEqual(ChapterQuizScore.objects.count(), 1)
+
+    def test_bulk_delete_recomputes_once_per_chapter(self):
+        """Test that deleting many attempts recomputes each (user, chapter) rollup once, after the delete"""
+        for score in (2, 3, 1):
+            self.submit(score)
+        with patch('cours.scores.recompute_quiz_stats', wraps=recompute_quiz_stats) as recompute:
+            with self.captureOnCommitCallbacks(execute=True):
+                ChapterQuizScore.objects.filter(user=self.user).delete()
+                recompute.assert_not_called()
+        recompute.assert_called_once_with(self.user.pk, self.chapter.pk)
+        self.assertFalse(ChapterQuizStats.objects.exists())
+
+    def test_backfill_matches_rollup(self):
+        """Test that rebuilding from the attempts gives the incremental result"""
+        for score in (2, 3, 1):
+            self.submit(score)
+        expected = ChapterQuizStats.objects.values().get()
+        ChapterQuizStats.objects.all().delete()
+
+        self.assertEqual(rebuild_quiz_stats(), 1)
+        rebuilt = ChapterQuizStats.objects.values().get()
+        expected.pop('id'), rebuilt.pop('id')
+        self.assertEqual(rebuilt, expected)
+
+    def test_rollup_follows_deleted_and_edited_attempts(self):
+        """Test that removing or correcting an attempt recomputes the rollup and the progress"""
+        for score in (2, 3, 1):
+            self.submit(score)
+        attempts = list(ChapterQuizScore.objects.order_by('id'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attempts[1].delete()
+        stats = ChapterQuizStats.objects.get(user=self.user, chapter=self.chapter)
+        self.assertEqual((stats.attempts, stats.total_score, stats.best_score, stats.last_score), (2, 3, 2, 1))
+        self.assertEqual(CourseProgress.objects.get(user=self.user).points, 2)
+
+        attempts[0].score = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            attempts[0].save()
+        self.assertEqual(ChapterQuizStats.objects.get(user=self.user, chapter=self.chapter).best_score, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChapterQuizScore.objects.all().delete()
+        self.assertFalse(ChapterQuizStats.objects.exists())
+        self.assertEqual(CourseProgress.objects.get(user=self.user).chapters_attempted, 0)
+
+
+class LeaderboardTestCase(TestCase):
+    """Test course progress and the course and global rankings"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title="Python basics", description="Learn Python", is_published=True)
+        self.first = Chapter.objects.create(course=self.course, title="Variables", description="Values", order=1)
+        self.second = Chapter.objects.create(course=self.course, title="Loops", description="for and while", order=2)
+        self.users = [User.objects.create(username=f'student{i}') for i in range(5)]
+        self.client.force_login(self.users[0])
+
+    def test_progress_updated_on_attempt(self):
+        """Test that progress counts attempted chapters and the best score of each"""
+        user = self.users[0]
+        for score in (1, 3):
+            ChapterQuizScore.objects.create(user=user, chapter=self.first, score=score)
+        ChapterQuizScore.objects.create(user=user, chapter=self.second, score=2)
+        ChapterQuizScore.objects.create(user=self.users[1], chapter=self.first, score=3)
+        ChapterQuizScore.objects.create(user=self.users[1], chapter=self.second, score=3)
+
+        response = self.client.get(reverse('course-progress', args=[self.course.id]))
+        self.assertEqual(response.json(), {
+            'course_id': self.course.id, 'chapters': 2, 'chapters_attempted': 2,
+            'percent': 100, 'points': 5, 'rank': 2,
+        })
+
+    def test_global_points_from_quizzes_exams_and_badges(self):
+        """Test that exams and badges are added to the global entry when they change"""
+        user = self.users[0]
+        ChapterQuizScore.objects.create(user=user, chapter=self.first, score=2)
+        exam = Exam.objects.create(title="Final", description="Final exam", duration=30)
+        StudentExam.objects.create(student=user, exam=exam, score=40)
+        StudentExam.objects.create(student=user, exam=exam, score=80)
+        badge = UserBadge.objects.create(
+            user=user, badge=Badge.objects.create(name="Gold Badge"), quiz=Quiz.objects.create(title="Quiz"), score=95,
+        )
+
+        entry = LeaderboardEntry.objects.get(user=user)
+        self.assertEqual((entry.quiz_points, entry.exam_points, entry.badges), (2, 80, 1))
+        self.assertEqual(entry.points, 2 * QUIZ_ANSWER_POINTS + 80 + BADGE_POINTS)
+
+        badge.delete()
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).badges, 0)
+
+    def test_cursor_pagination(self):
+        """Test that pages follow each other in rank order, ties broken by user id"""
+        for user, score in zip(self.users, (1, 3, 2, 3, 1)):
+            ChapterQuizScore.objects.create(user=user, chapter=self.first, score=score)
+
+        ranking, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(4):  # session, user, course, page
+                page = self.client.get(reverse('course-leaderboard', args=[self.course.id]), params).json()
+            ranking += page['results']
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        expected = [self.users[i].username for i in (1, 3, 2, 0, 4)]
+        self.assertEqual([row['username'] for row in ranking], expected)
+        self.assertEqual([row['rank'] for row in ranking], [1, 2, 3, 4, 5])
+        self.assertEqual(ranking[0]['points'], 3)
+
+    def test_invalid_cursor(self):
+        """Test that a cursor not produced by the server is refused"""
+        response = self.client.get(reverse('leaderboard'), {'cursor': 'forged'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_matches_incremental(self):
+        """Test that rebuilding the rankings gives the rows kept up to date by signals"""
+        exam = Exam.objects.create(title="Final", description="Final exam", duration=30)
+        for user, score in zip(self.users, (1, 3, 2)):
+            ChapterQuizScore.objects.create(user=user, chapter=self.first, score=score)
+            StudentExam.objects.create(student=user, exam=exam, score=score * 20)
+        expected = (
+            list(CourseProgress.objects.order_by('user').values('user', 'chapters_attempted', 'points')),
+            list(LeaderboardEntry.objects.order_by('user').values('user', 'quiz_points', 'exam_points', 'points')),
+        )
+        CourseProgress.objects.all().delete()
+        LeaderboardEntry.objects.all().delete()
+
+        self.assertEqual(rebuild_leaderboard(), (3, 3))
+        rebuilt = (
+            list(CourseProgress.objects.order_by('user').values('user', 'chapters_attempted', 'points')),
+            list(LeaderboardEntry.objects.order_by('user').values('user', 'quiz_points', 'exam_points', 'points')),
+        )
+        self.assertEqual(rebuilt, expected)
+
+    def test_chapter_deletion_updates_progress(self):
+        """Test that deleting a chapter removes its score from the progress"""
+        user = self.users[0]
+        ChapterQuizScore.objects.create(user=user, chapter=self.first, score=3)
+        ChapterQuizScore.objects.create(user=user, chapter=self.second, score=1)
+        self.second.delete()
+
+        progress = CourseProgress.objects.get(user=user, course=self.course)
+        self.assertEqual((progress.chapters_attempted, progress.points), (1, 3))
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).quiz_points, 3)
@@ -5,9 +5,14 @@ urlpatterns = [
     path('', views.course_list, name='courses'),
     path('filter/', views.filter_courses, name='filter-courses'),
     path('<int:course_id>/', views.course_detail, name='course-detail'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('<int:course_id>/leaderboard/', views.course_leaderboard, name='course-leaderboard'),
+    path('<int:course_id>/progress/', views.course_progress, name='course-progress'),
     path('quiz/<int:chapter_id>/', views.generate_quiz, name='generate-quiz'),
     path('quiz/score/', views.submit_quiz_score, name='submit_quiz_score'),
     path('summarize/<int:course_id>/', views.summarize_course, name='summarize_course'),
+    path('summarize/<int:course_id>/stream/', views.summarize_course_stream, name='summarize_course_stream'),
     path('summarize/pdf/<int:course_id>/', views.download_summary_pdf, name='download-summary-pdf'),
     path('flashcards/<int:course_id>/', views.generate_flashcards, name='generate-flashcards'),
+    path('ai-jobs/<int:job_id>/', views.ai_job_status, name='ai-job-status'),
 ]
\ No newline at end of file
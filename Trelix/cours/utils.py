@@ -1,10 +1,12 @@
 import re
 import html
 import json
-import google.generativeai as genai
+import hashlib
 from django.conf import settings
 from typing import List, Dict, Any
 
+from Trelix.ai_client import gemini_generate_content
+
 
 class GeminiFlashcardGenerator:
     
@@ -12,9 +14,12 @@ class GeminiFlashcardGenerator:
         self.api_key = api_key or getattr(settings, 'GOOGLE_API_KEY', None)
         if not self.api_key:
             raise ValueError("Google API key not found. Please set GOOGLE_API_KEY in settings or .env file.")
-        
-        genai.configure(api_key=self.api_key)
-        
+
+        # Calls go through the shared provider client (Trelix/ai_client.py)
+        self.model_name = self.resolve_model_name(model_name)
+    
+    @staticmethod
+    def resolve_model_name(model_name: str = None) -> str:
         # Determine model name from explicit argument, environment, or default
         configured_model = (
             model_name
@@ -22,16 +27,9 @@ class GeminiFlashcardGenerator:
             or 'models/gemini-2.5-flash-lite'
         )
 
-        # Normalize for SDK: strip optional 'models/' prefix
-        normalized_model = configured_model.replace('models/', '', 1) if configured_model.startswith('models/') else configured_model
+        # Normalize: strip optional 'models/' prefix
+        return configured_model.replace('models/', '', 1) if configured_model.startswith('models/') else configured_model
 
-        try:
-            self.model = genai.GenerativeModel(normalized_model)
-        except Exception as e:
-            raise ValueError(
-                f"Failed to initialize Gemini model. Configured='{configured_model}', used='{normalized_model}'. Error: {str(e)}"
-            )
-    
     @staticmethod
     def sanitize_text(text: str) -> str:
         if not text:
@@ -75,8 +73,17 @@ class GeminiFlashcardGenerator:
         
         return "\n".join(sections)
     
-    def generate_flashcards(self, course_content: str, num_cards: int = 10) -> List[Dict[str, Any]]:
-        prompt = f"""You are an educational assistant. Based on the following course content, create {num_cards} high-quality flashcards.
+    # Gemini REST generationConfig
+    GENERATION_CONFIG = {
+        "temperature": 0.7,
+        "topP": 0.8,
+        "topK": 40,
+        "maxOutputTokens": 8192,
+    }
+
+    @staticmethod
+    def build_prompt(course_content: str, num_cards: int = 10) -> str:
+        return f"""You are an educational assistant. Based on the following course content, create {num_cards} high-quality flashcards.
 
 COURSE CONTENT:
 {course_content}
@@ -101,45 +108,44 @@ OUTPUT FORMAT (strict JSON array):
 
 IMPORTANT: Return ONLY valid JSON array. No markdown, no code blocks, no explanations. Just the JSON array."""
 
+    @staticmethod
+    def parse_flashcards(response_text: str) -> List[Dict[str, Any]]:
+        response_text = response_text.strip()
+        
+        # Remove markdown code blocks if present
+        response_text = re.sub(r'```json\s*', '', response_text)
+        response_text = re.sub(r'```\s*', '', response_text)
+        response_text = response_text.strip()
+        
+        # Parse JSON
+        flashcards = json.loads(response_text)
+        
+        # Validate structure
+        if not isinstance(flashcards, list):
+            raise ValueError("Response is not a list")
+        
+        # Ensure all cards have front and back
+        validated_cards = []
+        for card in flashcards:
+            if isinstance(card, dict) and 'front' in card and 'back' in card:
+                validated_cards.append({
+                    'front': str(card['front']).strip(),
+                    'back': str(card['back']).strip()
+                })
+        
+        if not validated_cards:
+            raise ValueError("No valid flashcards found in response")
+        
+        return validated_cards
+
+    def generate_flashcards(self, course_content: str, num_cards: int = 10) -> List[Dict[str, Any]]:
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 8192,
-                }
+            response_text = gemini_generate_content(
+                self.model_name,
+                self.build_prompt(course_content, num_cards),
+                self.GENERATION_CONFIG,
             )
-            
-            # Extract text from response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            response_text = re.sub(r'```json\s*', '', response_text)
-            response_text = re.sub(r'```\s*', '', response_text)
-            response_text = response_text.strip()
-            
-            # Parse JSON
-            flashcards = json.loads(response_text)
-            
-            # Validate structure
-            if not isinstance(flashcards, list):
-                raise ValueError("Response is not a list")
-            
-            # Ensure all cards have front and back
-            validated_cards = []
-            for card in flashcards:
-                if isinstance(card, dict) and 'front' in card and 'back' in card:
-                    validated_cards.append({
-                        'front': str(card['front']).strip(),
-                        'back': str(card['back']).strip()
-                    })
-            
-            if not validated_cards:
-                raise ValueError("No valid flashcards found in response")
-            
-            return validated_cards
+            return self.parse_flashcards(response_text)
             
         except json.JSONDecodeError as e:
             raise Exception(f"Failed to parse JSON response from Gemini API: {str(e)}")
@@ -147,6 +153,11 @@ IMPORTANT: Return ONLY valid JSON array. No markdown, no code blocks, no explana
             raise Exception(f"Error generating flashcards: {str(e)}")
 
 
+def content_hash(text: str) -> str:
+    """SHA-256 of a course or chapter text, used as cache key for generated content."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
 def get_course_content_for_flashcards(course) -> str:
     chapters = course.chapters.all()
     return GeminiFlashcardGenerator.structure_course_content(course, chapters)
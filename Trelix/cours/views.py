@@ -1,71 +1,82 @@
-from django.shortcuts import render, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from .models import Course, ChapterQuizScore
 from chapitre.models import Chapter
-from django.http import JsonResponse
-from huggingface_hub import InferenceClient
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-import requests
 import json
-from xhtml2pdf import pisa
-from django.template.loader import render_to_string
-from django.http import HttpResponse
-from django.views.decorators.http import require_POST
-from .utils import GeminiFlashcardGenerator, get_course_content_for_flashcards
+import math
+import os
+from django.http import HttpResponse, FileResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET, require_http_methods
+from Trelix.ai_jobs import AI_JOB_PREFIX, RateLimited, ai_job_state, submit_ai_job
+from Trelix.models import BackgroundJob
+from .catalog import CATALOG_MAX_AGE, catalog_cards, get_catalog
+from .leaderboard import MAX_PAGE_SIZE, PAGE_SIZE, InvalidCursor, course_ranking, global_ranking, user_course_progress
+from .outline import get_course_outline
+from .scores import best_chapter_scores
+from .utils import GeminiFlashcardGenerator, content_hash, get_course_content_for_flashcards
+from .quiz_generation import get_cached_quiz
+from .flashcard_cache import get_cached_flashcards
+from .summarization import asummarize_course_text, CourseSummarizer
+from .summary_pdf import (
+    SummaryPDFError, build_summary_pdf, enqueue_summary_pdf, summary_pdf_hash, summary_pdf_path, summary_pdf_text,
+)
 
 
 def course_list(request):
     try:
-        courses = Course.objects.filter(is_published=True)
+        courses = get_catalog()['cards']
         return render(request, 'trelix/courses.html', {'courses': courses})
     except Exception as e:
         # Log error for debugging in production
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Error in course_list: {str(e)}")
-        # Return empty queryset to prevent server error
-        return render(request, 'trelix/courses.html', {'courses': Course.objects.none()})
+        # Return empty list to prevent server error
+        return render(request, 'trelix/courses.html', {'courses': []})
 
 @csrf_exempt
-@require_POST
+@require_http_methods(["GET", "POST"])
 def filter_courses(request):
     """
-    Filtre les cours par niveau via POST JSON
+    Filtre les cours par niveau : GET ?levels=beginner&levels=advanced
+    (réponse cacheable par le navigateur) ou POST JSON {"levels": [...]}.
+    Answered from the cached catalog, without query once it is warm.
     """
-    try:
-        body = json.loads(request.body)
-        levels = body.get("levels", [])
-    except json.JSONDecodeError:
-        levels = []
-
-    if not levels or "all" in levels:
-        courses = Course.objects.filter(is_published=True)
+    if request.method == "GET":
+        levels = request.GET.getlist("levels")
     else:
-        courses = Course.objects.filter(level__in=levels, is_published=True)
-
-    data = [
-        {
-            "id": c.id,
-            "title": c.title,
-            "description": c.description[:120] + "..." if len(c.description) > 120 else c.description,
-            "level": c.level.title(),
-            "image": c.image.url if c.image else "",
-        }
-        for c in courses
-    ]
-    return JsonResponse({"courses": data})
+        try:
+            levels = json.loads(request.body).get("levels", [])
+        except (json.JSONDecodeError, AttributeError):
+            levels = []
+
+    catalog = get_catalog()
+    etag = f'"{catalog["version"]}"'
+    if request.method == "GET":
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    response = JsonResponse({"courses": catalog_cards(catalog, levels)})
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=CATALOG_MAX_AGE)
+    return response
 
 def course_detail(request, course_id):
     course = get_object_or_404(Course, pk=course_id, is_published=True)
-    chapters = course.chapters.all().order_by('order')
-    selected_chapter = chapters.first() if chapters.exists() else None
+    # Plan du cours en cache, invalidé à chaque modification d'un chapitre
+    chapters = get_course_outline(course.pk)
+    selected_chapter = chapters[0] if chapters else None
 
-    user_scores = ChapterQuizScore.objects.filter(
-        user=request.user,
-        chapter__in=chapters
-    ).values_list('chapter_id', 'score')
-    user_scores_dict = {chapter_id: score for chapter_id, score in user_scores}
+    # Meilleur score par chapitre, en une requête (aucune pour un visiteur anonyme)
+    user_scores_dict = best_chapter_scores(request.user, [chapter['id'] for chapter in chapters])
 
     return render(request, 'trelix/chapters.html', {
         'course': course,
@@ -75,150 +86,221 @@ def course_detail(request, course_id):
     })
 
 
+def leaderboard_response(request, ranking, *args):
+    """
+    JSON page of a ranking: ?cursor= from the previous page's next_cursor, ?limit= rows (max MAX_PAGE_SIZE).
+    """
+    try:
+        limit = min(max(int(request.GET.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        return JsonResponse(ranking(*args, cursor=request.GET.get("cursor"), limit=limit))
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+
 
-# Génération du quiz avec JSON structuré
 @login_required
-def generate_quiz(request, chapter_id):
-    chapter = get_object_or_404(Chapter, pk=chapter_id)
-    content = chapter.description or ""
-
-    client = InferenceClient(token=settings.HF_API_TOKEN)
-    prompt = f"""
-Create a short quiz (3 questions) in English based on the following text:
----
-{content}
----
-Each question should have 3 options (A, B, C) and indicate which one is correct.
-Format it strictly as JSON, like this:
-[
-  {{
-    "question": "...",
-    "options": ["A", "B", "C"],
-    "answer": "A"
-  }},
-  ...
-]
-Do not include any extra text or explanation outside the JSON array.
-"""
-
-    completion = client.chat.completions.create(
-        model="deepseek-ai/DeepSeek-V3-0324",
-        messages=[{"role": "user", "content": prompt}],
-    )
+@require_GET
+def leaderboard(request):
+    """Classement général : quiz de chapitres, examens et badges."""
+    return leaderboard_response(request, global_ranking)
+
 
-    raw_text = completion.choices[0].message["content"]
+@login_required
+@require_GET
+def course_leaderboard(request, course_id):
+    """Classement des étudiants d'un cours (meilleurs scores des quiz de chapitres)."""
+    course = get_object_or_404(Course, pk=course_id, is_published=True)
+    return leaderboard_response(request, course_ranking, course.pk)
 
-    # Forcer JSON correct et transformer options
+
+@login_required
+@require_GET
+def course_progress(request, course_id):
+    """Progression et rang de l'utilisateur connecté dans un cours."""
+    course = get_object_or_404(Course, pk=course_id, is_published=True)
+    return JsonResponse(user_course_progress(request.user, course.pk))
+
+
+async def queue_ai_job(request, task, key, payload):
+    """
+    Queue an AI generation for the user (see Trelix/ai_jobs.py).
+
+    Returns:
+        JsonResponse: 202 with the URL to poll for the result, or 429 when a quota is exhausted
+    """
     try:
-        # Supprimer les ```json ... ``` si présent
-        clean_text = raw_text.strip().strip("```").replace("json", "").strip()
-        quiz_json = json.loads(clean_text)
-        for q in quiz_json:
-            q['options'] = [{"label": opt, "value": opt} for opt in q.get('options', [])]
-    except json.JSONDecodeError:
-        print("HuggingFace returned invalid JSON")
-        print("Raw text:", raw_text)
-        quiz_json = []
-
-    return JsonResponse({"quiz": quiz_json})
+        job = await sync_to_async(submit_ai_job)(request.user, task, key, payload)
+    except RateLimited as e:
+        retry_after = math.ceil(e.retry_after)
+        response = JsonResponse({"error": str(e), "retry_after": retry_after}, status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+    return JsonResponse(
+        {"status": job.status, "status_url": reverse('ai-job-status', args=[job.pk])},
+        status=202,
+    )
+
+
+@login_required
+def ai_job_status(request, job_id):
+    """State of a queued AI generation, with its result once done."""
+    job = get_object_or_404(BackgroundJob, pk=job_id, key__startswith=AI_JOB_PREFIX)
+    return JsonResponse(ai_job_state(job))
+
+
+# Génération du quiz avec JSON structuré
+@login_required
+async def generate_quiz(request, chapter_id):
+    chapter = await aget_object_or_404(Chapter, pk=chapter_id)
+
+    # Served from the store unless the chapter text changed since the last generation
+    stored = await sync_to_async(get_cached_quiz)(chapter)
+    if stored:
+        return JsonResponse({"quiz": stored.questions})
+
+    # Sinon génération en file d'attente (quotas, requêtes identiques regroupées)
+    return await queue_ai_job(
+        request,
+        'cours.tasks.generate_chapter_quiz',
+        key=f"quiz:{chapter.pk}:{content_hash(chapter.description)}",
+        payload={'chapter_id': chapter.pk},
+    )
 
 # Stocker le score
 @login_required
 def submit_quiz_score(request):
     if request.method == "POST":
-        data = json.loads(request.body)
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"status": "error", "error": "Invalid JSON"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"status": "error", "error": "Expected a JSON object"}, status=400)
         chapter_id = data.get("chapter_id")
         score = data.get("score")
 
         chapter = get_object_or_404(Chapter, pk=chapter_id)
+        # Le score compte dans les classements : au plus le nombre de questions du quiz stocké
+        stored = get_cached_quiz(chapter)
+        if stored is None:
+            return JsonResponse({"status": "error", "error": "No quiz for this chapter"}, status=400)
+        if type(score) is not int or not 0 <= score <= len(stored.questions):
+            return JsonResponse({"status": "error", "error": "Invalid score"}, status=400)
         ChapterQuizScore.objects.create(user=request.user, chapter=chapter, score=score)
         return JsonResponse({"status": "ok"})
     return JsonResponse({"status": "error"}, status=400)
-def chunk_text(text, max_chars=2000):
-    """
-    Divise le texte en chunks < max_chars pour éviter de dépasser la limite API.
-    """
-    chunks = []
-    while len(text) > max_chars:
-        split_at = text.rfind("\n\n", 0, max_chars)
-        if split_at == -1:
-            split_at = max_chars
-        chunks.append(text[:split_at].strip())
-        text = text[split_at:].strip()
-    if text:
-        chunks.append(text)
-    return chunks
-
 @csrf_exempt
-def summarize_course(request, course_id):
+async def summarize_course(request, course_id):
     try:
-        course = Course.objects.get(id=course_id)
-        chapters = Chapter.objects.filter(course=course).order_by('id')
+        course = await Course.objects.aget(id=course_id)
+        chapters = [chapter async for chapter in Chapter.objects.filter(course=course).order_by('id')]
 
-        full_text = "\n\n".join([chapter.description for chapter in chapters if chapter.description])
-        if not full_text:
+        if not any(chapter.description for chapter in chapters):
             return JsonResponse({"error": "No chapter descriptions to summarize."}, status=400)
 
-        url = f"https://api.nlpcloud.io/v1/{settings.NLP_CLOUD_MODEL}/summarization"
-        headers = {
-            "Authorization": f"Token {settings.NLP_CLOUD_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        # Découper le texte en chunks pour éviter le 413
-        chunks = chunk_text(full_text, max_chars=2000)
-        summaries = []
-
-        for i, chunk in enumerate(chunks, start=1):
-            payload = {"text": chunk, "min_length": 50, "max_length": 300}
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-
-            # Debug pour voir les réponses
-            print(f"Chunk {i}/{len(chunks)} - Status:", response.status_code)
-            print("Response text:", response.text)
-
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    summaries.append(data.get("summary_text", ""))
-                except json.JSONDecodeError:
-                    summaries.append("[Error decoding chunk summary]")
-            else:
-                summaries.append(f"[Error: API returned status {response.status_code}]")
+        # Résumés stockés par chapitre, puis réduits jusqu'à la longueur cible
+        result = await asummarize_course_text(chapters)
+        if not result['summary'] and result['failed_chunks']:
+            return JsonResponse({"error": "Summarization failed."}, status=502)
 
-        final_summary = "\n\n".join([s for s in summaries if s])
-        return JsonResponse({"summary": final_summary})
+        # Partial summary if some chunks failed, the API call budget ran out or a chapter is too long
+        return JsonResponse({
+            "summary": result['summary'],
+            "partial": bool(result['failed_chunks'] or result['pending_chapters'] or result['too_long_chapters']),
+            "failed_chunks": result['failed_chunks'],
+            "pending_chapters": result['pending_chapters'],
+            "too_long_chapters": result['too_long_chapters'],
+        })
 
     except Course.DoesNotExist:
         return JsonResponse({"error": "Course not found."}, status=404)
     except Exception as e:
         print("Exception in summarize_course:", e)
         return JsonResponse({"error": str(e)}, status=500)
+
+
+def sse_event(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def summarize_course_stream(request, course_id):
+    """
+    Same summary as summarize_course, as server-sent events: a "chunk" event
+    per chapter or chunk summary as soon as it is ready (stored chapters
+    first), a "chunk_error" event per failed chunk, then a "done" event with
+    the final (reduced) summary. Not named "error": EventSource hands that
+    name to its onerror handler, which would close the stream.
+    """
+    course = await aget_object_or_404(Course, pk=course_id)
+    chapters = [chapter async for chapter in Chapter.objects.filter(course=course).order_by('id')]
+    if not any(chapter.description for chapter in chapters):
+        return JsonResponse({"error": "No chapter descriptions to summarize."}, status=400)
+
+    summarizer = CourseSummarizer(chapters)
+
+    async def events():
+        yield sse_event("start", {"chapters": len(summarizer.chapters)})
+        async for event in summarizer.aiter_chapters():
+            yield sse_event(event.pop('type'), event)
+        result = await summarizer.aresult()
+        yield sse_event("done", {
+            "summary": result['summary'],
+            "partial": bool(result['failed_chunks'] or result['pending_chapters'] or result['too_long_chapters']),
+            "failed_chunks": result['failed_chunks'],
+            "pending_chapters": result['pending_chapters'],
+            "too_long_chapters": result['too_long_chapters'],
+        })
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx) so events reach the browser right away
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def download_summary_pdf(request, course_id):
-    course = Course.objects.get(id=course_id)
-    chapters = Chapter.objects.filter(course=course).order_by('id')
-    full_text = "\n\n".join([c.description for c in chapters if c.description])
+    course = get_object_or_404(Course, pk=course_id)
+    full_text = summary_pdf_text(course)
+    digest = summary_pdf_hash(course, full_text)
+    path = summary_pdf_path(course.id, digest)
 
-    html_string = render_to_string('trelix/summary_pdf.html', {
-        'course': course,
-        'summary': full_text.replace("\n", "<br>")
-    })
+    if not os.path.exists(path):
+        if len(full_text) > settings.SUMMARY_PDF_ASYNC_CHARS:
+            # Gros cours : premier rendu en tâche de fond, la page se recharge
+            enqueue_summary_pdf(course, digest)
+            response = HttpResponse("The PDF is being generated, this page will reload when it is ready.",
+                                    status=202, content_type="text/plain")
+            response['Retry-After'] = '5'
+            response['Refresh'] = '5'
+            return response
+        try:
+            path = build_summary_pdf(course, full_text)
+        except SummaryPDFError:
+            return HttpResponse("Error generating PDF", status=500)
+
+    etag = f'"{digest}"'
+    last_modified = os.path.getmtime(path)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="course_{course.id}_summary.pdf"'
-    pisa_status = pisa.CreatePDF(html_string, dest=response)
-    if pisa_status.err:
-        return HttpResponse("Error generating PDF", status=500)
+    response = FileResponse(open(path, 'rb'), as_attachment=True,
+                            filename=f"course_{course.id}_summary.pdf", content_type='application/pdf')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 
 @login_required
 @csrf_exempt
-def generate_flashcards(request, course_id):
+async def generate_flashcards(request, course_id):
     try:
         # Get course and validate access
-        course = get_object_or_404(Course, pk=course_id, is_published=True)
+        course = await aget_object_or_404(Course, pk=course_id, is_published=True)
         
         # Get parameters from request (optional, default 10 cards)
         num_cards = 10
@@ -234,24 +316,31 @@ def generate_flashcards(request, course_id):
                 pass  # Use defaults
         
         # Get and structure course content
-        course_content = get_course_content_for_flashcards(course)
+        course_content = await sync_to_async(get_course_content_for_flashcards)(course)
         
         if not course_content or len(course_content.strip()) < 50:
             return JsonResponse({
                 "error": "Course content is too short to generate meaningful flashcards. Please ensure the course has chapters with descriptions."
             }, status=400)
         
-        # Initialize flashcard generator
-        generator = GeminiFlashcardGenerator(model_name=model_name)
-        
-        # Generate flashcards
-        flashcards = generator.generate_flashcards(course_content, num_cards=num_cards)
-        
-        return JsonResponse({
-            "flashcards": flashcards,
-            "course_title": course.title,
-            "count": len(flashcards)
-        })
+        # Same course text, number of cards and model: answer from the cache
+        resolved_model = GeminiFlashcardGenerator.resolve_model_name(model_name)
+        flashcards = await sync_to_async(get_cached_flashcards)(course, course_content, num_cards, resolved_model)
+        if flashcards is not None:
+            return JsonResponse({
+                "flashcards": flashcards,
+                "course_title": course.title,
+                "count": len(flashcards),
+                "cached": True,
+            })
+
+        # Generated by the AI job queue, the page polls for the result
+        return await queue_ai_job(
+            request,
+            'cours.tasks.generate_course_flashcards',
+            key=f"flashcards:{course.pk}:{content_hash(course_content)}:{num_cards}:{resolved_model}",
+            payload={'course_id': course.pk, 'num_cards': num_cards, 'model_name': resolved_model},
+        )
         
     except ValueError as e:
         return JsonResponse({"error": str(e)}, status=400)
@@ -3,11 +3,11 @@ from django.core.files import File
 from django.utils.html import format_html
 from django.urls import path
 from django.http import JsonResponse
-from django.conf import settings
 from django import forms
-import os, io, json, requests
-from PIL import Image
+import os, json
+from Trelix.ai_client import AIProviderError, hf_text_to_image
 from .models import Evenement
+from .views import save_temp_image
 
 
 
@@ -20,14 +20,6 @@ class EvenementAdminForm(forms.ModelForm):
 
 
 
-def imageGen(payload):
-    API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
-    headers = {"Authorization": f"Bearer {settings.IMAGEGEN_KEY}"}
-    response = requests.post(API_URL, headers=headers, json=payload)
-    return response.content
-
-
-
 @admin.register(Evenement)
 class EvenementAdmin(admin.ModelAdmin):
     form = EvenementAdminForm
@@ -80,12 +72,11 @@ class EvenementAdmin(admin.ModelAdmin):
             data = json.loads(request.body)
             title = data.get("title", "")
 
-            image_bytes = imageGen({"inputs": f"Event poster for {title}, professional, modern"})
-            os.makedirs("media/images", exist_ok=True)
-
-            path = f"media/images/temp_gen_{title}.jpg"
-            img = Image.open(io.BytesIO(image_bytes))
-            img.save(path, format="JPEG")
+            try:
+                image_bytes = hf_text_to_image(f"Event poster for {title}, professional, modern")
+            except AIProviderError as e:
+                return JsonResponse({"error": str(e)}, status=502)
+            path = save_temp_image(image_bytes, title)
 
             return JsonResponse({
                 "image_url": "/" + path,
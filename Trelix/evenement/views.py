@@ -3,44 +3,41 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils import timezone
 from .models import Evenement
 from django.http import JsonResponse,HttpResponse
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
-import google.generativeai as genai
 import json
 import os
 import io
-import requests
 from PIL import Image
 from django.core.files import File
 from django.http import HttpResponse
+from Trelix.ai_client import AIProviderError, agemini_generate_content, ahf_text_to_image, gemini_list_models
 
 
 
 
+def save_temp_image(image_bytes, title):
+    image = Image.open(io.BytesIO(image_bytes))
 
-def imageGen(payload):
-    response = requests.post(API_URL, headers=HEADERS, json=payload)
-    if response.status_code == 200:
-        return response.content
-    else:
-        raise Exception(f"Hugging Face API Error: {response.status_code}, {response.text}")
+    # ✅ Sauvegarde temporaire dans /media/images/
+    image_name = f"temp_{title.replace(' ', '_')}.jpg"
+    image_path = os.path.join('media/images', image_name)
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+
+    image.save(image_path, format='JPEG')
+    return image_path
 
 
 @csrf_exempt
-def generate_image(request):
+async def generate_image(request):
     if request.method == 'POST':
         data = json.loads(request.body)
         title = data.get('title', 'événement')
 
         try:
-            image_bytes = imageGen({"inputs": f"Event poster for {title}, professional, modern"})
-            image = Image.open(io.BytesIO(image_bytes))
-
-            # ✅ Sauvegarde temporaire dans /media/images/
-            image_name = f"temp_{title.replace(' ', '_')}.jpg"
-            image_path = os.path.join('media/images', image_name)
-            os.makedirs(os.path.dirname(image_path), exist_ok=True)
-
-            image.save(image_path, format='JPEG')
+            # Attente non bloquante sur le client HTTP partagé
+            image_bytes = await ahf_text_to_image(f"Event poster for {title}, professional, modern")
+            image_path = await sync_to_async(save_temp_image, thread_sensitive=False)(image_bytes, title)
 
             return JsonResponse({
                 'image_url': '/' + image_path,   # ✅ Pour afficher l'image
@@ -57,33 +54,30 @@ def generate_image(request):
 
 
 def test_models(request):
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    models = genai.list_models()
-    # Utiliser l'attribut 'name' des objets Model
-    output = "<br>".join([m.name for m in models])
+    try:
+        models = gemini_list_models()
+    except AIProviderError as e:
+        return HttpResponse(str(e), status=502)
+    output = "<br>".join(models)
     return HttpResponse(output)
 
 
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-IMAGEGEN_KEY = os.getenv('IMAGEGEN_KEY')
-API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
-HEADERS = {"Authorization": f"Bearer {IMAGEGEN_KEY}"}
-
-def ai_generate_description(title):
+async def ai_generate_description(title):
     # Utiliser un modèle existant comme "gemini-2.5-flash"
-    model = genai.GenerativeModel('gemini-2.5-flash')
     prompt = f"Écris une description professionnelle et détaillée en 3 lignes pour un événement intitulé : {title}"
-    response = model.generate_content(prompt)
-    return response.text
+    return await agemini_generate_content('gemini-2.5-flash', prompt)
 
 
 @csrf_exempt
-def generate_description(request):
+async def generate_description(request):
     if request.method == "POST":
         data = json.loads(request.body)
         title = data.get("title", "")
-        description = ai_generate_description(title)
+        try:
+            description = await ai_generate_description(title)
+        except AIProviderError as e:
+            return JsonResponse({"error": str(e)}, status=502)
         return JsonResponse({"description": description})
     return JsonResponse({"error": "Méthode non autorisée"}, status=400)
 
@@ -0,0 +1,146 @@
+import os
+import threading
+from io import BytesIO
+
+from cloudinary import uploader
+from django.conf import settings
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+
+def default_template_path():
+    return os.path.join(settings.BASE_DIR, 'Trelix', 'static', 'certificate_design_trelix.pdf')
+
+
+def default_font_path():
+    return os.path.join(settings.BASE_DIR, 'Trelix', 'static', 'fonts', 'GreatVibes-Regular.ttf')
+
+
+class CertificateRenderer:
+    """
+    Overlays the student's name and exam title onto the pre-designed PDF
+    template using the Great Vibes font.
+
+    The template page is parsed and the font registered once, on first use,
+    then reused for every certificate rendered by this process. Certificates
+    are rendered into memory; nothing is written to disk.
+    """
+    FONT_NAME = 'GreatVibes'
+
+    # Customize coordinates to fit your template's placeholders
+    STUDENT_NAME_POSITION = (380, 260)
+    EXAM_TITLE_POSITION = (380, 150)
+    DATE_POSITION = (300, 50)
+
+    def __init__(self, template_path=None, font_path=None):
+        self.template_path = template_path or default_template_path()
+        self.font_path = font_path or default_font_path()
+        self._template_page = None
+        # pypdf reads template objects lazily from a shared stream
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._template_page is not None:
+            return
+
+        if self.FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.FONT_NAME, self.font_path))
+
+        with open(self.template_path, 'rb') as f:
+            template_pdf = PdfReader(BytesIO(f.read()))
+        self._template_page = template_pdf.pages[0]
+
+    def _overlay(self, student_name, exam_title, issued_on):
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=A4)
+
+        # Draw current date
+        can.setFont("Helvetica", 14)
+        can.drawCentredString(*self.DATE_POSITION, f"Date: {issued_on.strftime('%d %B %Y')}")
+        # Draw student name and exam title using Great Vibes
+        can.setFont(self.FONT_NAME, 36)
+        can.drawCentredString(*self.STUDENT_NAME_POSITION, student_name)
+        can.setFont(self.FONT_NAME, 28)
+        can.drawCentredString(*self.EXAM_TITLE_POSITION, exam_title)
+
+        can.save()
+        packet.seek(0)
+        return PdfReader(packet).pages[0]
+
+    def render(self, student_name, exam_title, issued_on=None):
+        """
+        Render one certificate.
+
+        Returns:
+            bytes: The PDF document
+        """
+        with self._lock:
+            self._load()
+
+        overlay_page = self._overlay(student_name, exam_title, issued_on or timezone.now())
+
+        output = BytesIO()
+        with self._lock:
+            output_pdf = PdfWriter()
+            # add_page() works on a copy, so the cached template stays pristine
+            page = output_pdf.add_page(self._template_page)
+            page.merge_page(overlay_page)
+            output_pdf.write(output)
+        return output.getvalue()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Process-wide CertificateRenderer."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = CertificateRenderer()
+        return _renderer
+
+
+def generate_certificate(student, exam):
+    """
+    Render the certificate of a student for an exam.
+
+    Returns:
+        bytes: The PDF document
+    """
+    return get_renderer().render(student.get_full_name() or student.username, exam.title)
+
+
+def upload_certificate_pdf(pdf_bytes):
+    """
+    Upload a rendered certificate PDF to Cloudinary straight from memory.
+
+    Returns:
+        str: The Cloudinary public_id
+    """
+    # Upload to Cloudinary with raw resource type for PDF
+    upload_result = uploader.upload(
+        BytesIO(pdf_bytes),
+        folder="certificates",
+        resource_type="raw",
+        format="pdf"
+    )
+    if not upload_result or 'public_id' not in upload_result:
+        raise ValueError(f"Incomplete Cloudinary upload result: {upload_result}")
+    return upload_result['public_id']
+
+
+def upload_certificate(cert_obj, pdf_bytes):
+    """
+    Upload a rendered certificate and store its public_id on the Certificate
+    (CloudinaryField will use this with get_certificate_url()).
+    Upload errors propagate so the calling job is marked as failed.
+    """
+    cert_obj.file_path = upload_certificate_pdf(pdf_bytes)
+    cert_obj.save(update_fields=['file_path'])
+    return cert_obj
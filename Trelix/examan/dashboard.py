@@ -0,0 +1,66 @@
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Exam, StudentExam, Certificate, PASSING_SCORE, build_certificate_url
+
+EXAMS_PER_PAGE = 12
+
+
+def exams_with_status(student):
+    """
+    Exams annotated with the student's latest attempt and first certificate.
+
+    Everything is resolved with correlated subqueries, so the whole catalog
+    (or one page of it) is fetched in a single query whatever its size.
+    """
+    latest_attempt = StudentExam.objects.filter(
+        student=student,
+        exam=OuterRef('pk')
+    ).order_by('-pk')
+    certificate = Certificate.objects.filter(
+        student=student,
+        exam=OuterRef('pk')
+    ).order_by('pk')
+
+    return Exam.objects.annotate(
+        question_count=Count('questions', distinct=True),
+        attempt_id=Subquery(latest_attempt.values('pk')[:1]),
+        attempt_score=Subquery(latest_attempt.values('score')[:1]),
+        certificate_file=Subquery(certificate.values('file_path')[:1]),
+    ).order_by('pk')
+
+
+def exam_status(exam):
+    """Dict consumed by trelix/exams.html for one annotated exam."""
+    completed = exam.attempt_id is not None
+    certificate = None
+    if completed and exam.attempt_score is not None and exam.attempt_score >= PASSING_SCORE:
+        certificate = build_certificate_url(exam.certificate_file)
+
+    return {
+        'exam': exam,
+        'question_count': exam.question_count,
+        'completed': completed,
+        'score': exam.attempt_score if completed else None,
+        'student_exam_id': exam.attempt_id,
+        'certificate': certificate,
+    }
+
+
+def exam_dashboard(student, page=1, per_page=EXAMS_PER_PAGE):
+    """
+    Paginated exam dashboard for a student.
+
+    Returns (page, exams_status): a fixed two queries per call (count + page),
+    independent of how many exams exist.
+    """
+    paginator = Paginator(exams_with_status(student), per_page)
+
+    try:
+        exams_page = paginator.page(page)
+    except PageNotAnInteger:
+        exams_page = paginator.page(1)
+    except EmptyPage:
+        exams_page = paginator.page(paginator.num_pages)
+
+    return exams_page, [exam_status(exam) for exam in exams_page]
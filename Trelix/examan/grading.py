@@ -0,0 +1,116 @@
+from django.db import transaction
+
+from .models import Answer, StudentExam
+
+
+def responses_from_post(data):
+    """
+    Extract {question_id: answer_text} from submitted exam form data.
+    Answer inputs are named "q<question_id>" in trelix/exam_detail.html.
+    """
+    responses = {}
+    for key, value in data.items():
+        if key.startswith('q') and key[1:].isdigit():
+            responses[int(key[1:])] = value
+    return responses
+
+
+def is_correct(question, answer_text):
+    return answer_text.lower() == question.correct_answer.lower()
+
+
+def compute_score(questions, responses):
+    """
+    Score responses against already-loaded questions, in memory.
+
+    Returns (score, correct_count) with score as a percentage.
+    """
+    correct_count = sum(
+        1 for question in questions
+        if is_correct(question, (responses.get(question.id) or "").strip())
+    )
+    score = (correct_count / len(questions)) * 100 if questions else 0
+    return score, correct_count
+
+
+def grade_submission(student_exam, responses):
+    """
+    Store and grade a student's answers for one exam attempt.
+
+    The exam questions are loaded once, every answer is scored in memory and
+    all Answer rows are written with a single upsert, inside one transaction.
+
+    Args:
+        student_exam: StudentExam being submitted (completed_at already set)
+        responses: dict {question_id: answer_text}
+
+    Returns:
+        float: The score as a percentage
+    """
+    questions = list(student_exam.exam.questions.all())
+    answers = [
+        Answer(
+            student_exam=student_exam,
+            question=question,
+            text=(responses.get(question.id) or "").strip()
+        )
+        for question in questions
+    ]
+    score, _ = compute_score(questions, responses)
+
+    with transaction.atomic():
+        Answer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=['student_exam', 'question'],
+            update_fields=['text'],
+        )
+        student_exam.score = score
+        student_exam.save(update_fields=['score', 'completed_at'])
+
+    return score
+
+
+def regrade_exam(exam, batch_size=500):
+    """
+    Recompute the score of every past submission of an exam from stored answers.
+
+    Questions are loaded once, submissions are processed in batches of
+    batch_size with their answers prefetched, and scores are written back with
+    one bulk_update per batch. bulk_update sends no post_save, so the
+    leaderboard entry of every student with a graded attempt is refreshed once
+    at the end.
+
+    Returns:
+        int: Number of submissions re-graded
+    """
+    questions = list(exam.questions.all())
+    submissions = StudentExam.objects.filter(exam=exam).order_by('pk')
+    regraded = 0
+    last_pk = 0
+    students = set()
+
+    while True:
+        batch = list(
+            submissions.filter(pk__gt=last_pk)
+            .prefetch_related('answers')[:batch_size]
+        )
+        if not batch:
+            break
+
+        for student_exam in batch:
+            responses = {answer.question_id: answer.text for answer in student_exam.answers.all()}
+            student_exam.score, _ = compute_score(questions, responses)
+            students.add(student_exam.student_id)
+
+        with transaction.atomic():
+            StudentExam.objects.bulk_update(batch, ['score'])
+
+        regraded += len(batch)
+        last_pk = batch[-1].pk
+
+    from cours.leaderboard import refresh_leaderboard_entry
+    for student_id in students:
+        refresh_leaderboard_entry(student_id)
+
+    return regraded
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from examan.certificates import CertificateRenderer, default_font_path, default_template_path
+
+
+def legacy_render(output_dir, student_name, exam_title):
+    """The former generate_certificate: re-reads template and font, writes to disk."""
+    file_path = os.path.join(output_dir, f"{student_name}_{exam_title}.pdf")
+    template_pdf = PdfReader(default_template_path())
+    output_pdf = PdfWriter()
+
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    pdfmetrics.registerFont(TTFont('GreatVibes', default_font_path()))
+    can.setFont("Helvetica", 14)
+    can.drawCentredString(300, 50, f"Date: {timezone.now().strftime('%d %B %Y')}")
+    can.setFont("GreatVibes", 36)
+    can.drawCentredString(380, 260, student_name)
+    can.setFont("GreatVibes", 28)
+    can.drawCentredString(380, 150, exam_title)
+    can.save()
+    packet.seek(0)
+
+    page = template_pdf.pages[0]
+    page.merge_page(PdfReader(packet).pages[0])
+    output_pdf.add_page(page)
+    with open(file_path, "wb") as f:
+        output_pdf.write(f)
+    return file_path
+
+
+class Command(BaseCommand):
+    help = "Benchmark certificate rendering (certificates per second), before and after caching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50, help="Certificates rendered per run")
+
+    def handle(self, *args, **options):
+        count = options['count']
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            for i in range(count):
+                legacy_render(output_dir, f"Student {i}", "Benchmark Exam")
+            legacy = count / (time.perf_counter() - start)
+
+        renderer = CertificateRenderer()
+        start = time.perf_counter()
+        for i in range(count):
+            renderer.render(f"Student {i}", "Benchmark Exam")
+        cached = count / (time.perf_counter() - start)
+
+        self.stdout.write(f"Legacy (re-parse template, register font, write file): {legacy:.1f} certificates/s")
+        self.stdout.write(f"CertificateRenderer (cached, in memory):             {cached:.1f} certificates/s")
+        self.stdout.write(f"Speed-up: x{cached / legacy:.2f}")
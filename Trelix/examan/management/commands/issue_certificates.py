@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from examan.certificates import get_renderer, upload_certificate_pdf
+from examan.models import Certificate, StudentExam, PASSING_SCORE
+
+
+def init_worker():
+    # Needed when the pool spawns fresh interpreters (Windows/macOS)
+    django.setup()
+
+
+def issue_worker(student_id, exam_id, student_name, exam_title):
+    """Runs in a worker process: render and upload one certificate, no DB access."""
+    pdf_bytes = get_renderer().render(student_name, exam_title)
+    return student_id, exam_id, upload_certificate_pdf(pdf_bytes)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render and upload missing certificates for every passing StudentExam, in parallel. "
+        "Each certificate is saved as soon as it is uploaded, so an interrupted run can simply be restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Worker processes, i.e. maximum concurrent renders/uploads (default 4)")
+        parser.add_argument('--exam', type=int, action='append', dest='exam_ids',
+                            help="Only this exam (repeatable)")
+        parser.add_argument('--reissue', action='store_true',
+                            help="Also regenerate existing certificates (e.g. after a new design)")
+        parser.add_argument('--issued-before',
+                            help="With --reissue: only certificates issued before this ISO datetime. "
+                                 "Pass the value printed by an interrupted run to resume it.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be issued")
+
+    def pending(self, options, issued_before):
+        """Distinct passing (student, exam) pairs that still need a certificate."""
+        certificates = Certificate.objects.filter(student=OuterRef('student'), exam=OuterRef('exam'))
+        if options['reissue']:
+            done = certificates.filter(date_issued__gte=issued_before)
+        else:
+            done = certificates.exclude(Q(file_path__isnull=True) | Q(file_path=''))
+
+        attempts = StudentExam.objects.filter(score__gte=PASSING_SCORE).filter(~Exists(done))
+        if options['exam_ids']:
+            attempts = attempts.filter(exam_id__in=options['exam_ids'])
+
+        return list(
+            attempts.values(
+                'student_id', 'exam_id',
+                'student__username', 'student__first_name', 'student__last_name', 'exam__title',
+            ).order_by('exam_id', 'student_id').distinct()
+        )
+
+    def save_certificate(self, student_id, exam_id, public_id):
+        certificate = Certificate.objects.filter(student_id=student_id, exam_id=exam_id).order_by('pk').first()
+        if certificate is None:
+            Certificate.objects.create(student_id=student_id, exam_id=exam_id, file_path=public_id)
+        else:
+            certificate.file_path = public_id
+            certificate.date_issued = timezone.now()
+            certificate.save(update_fields=['file_path', 'date_issued'])
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        issued_before = timezone.now()
+        if options['issued_before']:
+            issued_before = parse_datetime(options['issued_before'])
+            if issued_before is None:
+                raise CommandError("--issued-before must be an ISO datetime")
+        if options['reissue']:
+            self.stdout.write(f"Re-issuing certificates issued before {issued_before.isoformat()} "
+                              f"(use --issued-before {issued_before.isoformat()} to resume)")
+
+        pending = self.pending(options, issued_before)
+        total = len(pending)
+        self.stdout.write(f"{total} certificate(s) to issue with {options['workers']} worker(s)")
+        if options['dry_run'] or not total:
+            for row in pending:
+                self.stdout.write(f"  {row['student__username']} - {row['exam__title']}")
+            return
+
+        # Don't share the parent's DB connections with forked workers
+        connections.close_all()
+
+        issued = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+            futures = {
+                pool.submit(
+                    issue_worker,
+                    row['student_id'],
+                    row['exam_id'],
+                    f"{row['student__first_name']} {row['student__last_name']}".strip() or row['student__username'],
+                    row['exam__title'],
+                ): row
+                for row in pending
+            }
+
+            for done, future in enumerate(as_completed(futures), start=1):
+                row = futures[future]
+                label = f"{row['student__username']} - {row['exam__title']}"
+                try:
+                    self.save_certificate(*future.result())
+                    issued += 1
+                    self.stdout.write(f"[{done}/{total}] ✅ {label}")
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"[{done}/{total}] ❌ {label}: {str(e)}")
+
+        self.stdout.write(f"Issued {issued} certificate(s), {failed} failure(s)")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from examan.grading import regrade_exam
+from examan.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Re-grade stored submissions from their answers (all exams by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', type=int, help="Only re-grade these exams")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.order_by('pk')
+        if options['exam_ids']:
+            exams = exams.filter(pk__in=options['exam_ids'])
+
+        for exam in exams:
+            count = regrade_exam(exam, batch_size=options['batch_size'])
+            self.stdout.write(f"{exam.title}: {count} submission(s) re-graded")
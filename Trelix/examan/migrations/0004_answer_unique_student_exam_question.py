@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    """Keep only the most recent Answer per (student_exam, question)."""
+    Answer = apps.get_model('examan', 'Answer')
+    seen = set()
+    duplicates = []
+    for answer in Answer.objects.order_by('-pk').values('pk', 'student_exam_id', 'question_id').iterator():
+        key = (answer['student_exam_id'], answer['question_id'])
+        if key in seen:
+            duplicates.append(answer['pk'])
+        else:
+            seen.add(key)
+    if duplicates:
+        Answer.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examan', '0003_alter_certificate_file_path_cloudinary'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('student_exam', 'question')},
+        ),
+    ]
@@ -2,6 +2,10 @@ from django.db import models
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
 import cloudinary
+
+# Minimum score (%) that earns a certificate
+PASSING_SCORE = 50
+
 # Create your models here.
 class Exam(models.Model):
     title = models.CharField(max_length=255)
@@ -34,14 +38,19 @@ class Certificate(models.Model):
     
     def get_certificate_url(self):
         """Generate proper Cloudinary URL for PDF certificate (raw resource type)"""
-        if not self.file_path:
-            return None
-        # Build URL for raw resource (PDF)
-        return cloudinary.utils.cloudinary_url(
-            str(self.file_path),
-            resource_type='raw',
-            format='pdf'
-        )[0] 
+        return build_certificate_url(self.file_path)
+
+
+def build_certificate_url(file_path):
+    """Cloudinary URL of a certificate PDF from its stored public_id (or None)."""
+    if not file_path:
+        return None
+    # Build URL for raw resource (PDF)
+    return cloudinary.utils.cloudinary_url(
+        str(file_path),
+        resource_type='raw',
+        format='pdf'
+    )[0]
 
 
 # examapp/models.py
@@ -51,5 +60,8 @@ class Answer(models.Model):
     text = models.TextField()
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        unique_together = ['student_exam', 'question']
+
     def __str__(self):
         return f"{self.student_exam.student.username} - {self.question.text[:20]}"
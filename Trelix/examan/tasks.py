@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+
+from Trelix.jobs import enqueue, get_job
+from Trelix.models import BackgroundJob
+from .certificates import generate_certificate, upload_certificate
+from .models import Exam, Certificate
+
+
+def certificate_job_key(student_id, exam_id):
+    return f"certificate:{student_id}:{exam_id}"
+
+
+def get_or_create_certificate(student, exam):
+    """First Certificate row of (student, exam), created if missing."""
+    certificate = Certificate.objects.filter(student=student, exam=exam).order_by('pk').first()
+    if certificate is None:
+        certificate = Certificate.objects.create(student=student, exam=exam)
+    return certificate
+
+
+def issue_certificate(student_id, exam_id):
+    """
+    Background task: render and upload the certificate of a student for an exam.
+    Idempotent: does nothing if the certificate already has a file.
+    """
+    student = User.objects.get(pk=student_id)
+    exam = Exam.objects.get(pk=exam_id)
+    certificate = get_or_create_certificate(student, exam)
+
+    if not certificate.file_path:
+        upload_certificate(certificate, generate_certificate(student, exam))
+
+    return {'certificate_id': certificate.pk, 'public_id': str(certificate.file_path)}
+
+
+def enqueue_certificate(student, exam):
+    """Schedule certificate generation for a passing attempt (one job per student/exam)."""
+    return enqueue(
+        'examan.tasks.issue_certificate',
+        key=certificate_job_key(student.pk, exam.pk),
+        payload={'student_id': student.pk, 'exam_id': exam.pk},
+    )
+
+
+def certificate_status(student, exam_id):
+    """
+    Status of a student's certificate for an exam, for polling clients.
+
+    Returns:
+        dict: {'status': 'done'|'pending'|'running'|'failed'|'none', 'url': str or None}
+    """
+    certificate = Certificate.objects.filter(
+        student=student, exam_id=exam_id
+    ).exclude(file_path__isnull=True).exclude(file_path='').order_by('pk').first()
+    if certificate:
+        return {'status': BackgroundJob.DONE, 'url': certificate.get_certificate_url()}
+
+    job = get_job(certificate_job_key(student.pk, exam_id))
+    return {'status': job.status if job else 'none', 'url': None}
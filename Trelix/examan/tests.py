@@ -1,3 +1,287 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+
+from cours.models import LeaderboardEntry
+from Trelix.jobs import run_job
+from Trelix.models import BackgroundJob
+from .models import Exam, Question, StudentExam, Answer, Certificate
+from .dashboard import exam_dashboard
+from .grading import grade_submission, regrade_exam
+from .certificates import CertificateRenderer
+
+
+class ExamDashboardTestCase(TestCase):
+    """Test the exam dashboard data layer"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.exams = [
+            Exam.objects.create(title=f"Exam {i}", description="Description", duration=30)
+            for i in range(5)
+        ]
+        for exam in self.exams:
+            Question.objects.create(exam=exam, text="Q?", question_type='TXT', correct_answer="A")
+
+    def test_latest_attempt_is_used(self):
+        """Test that the latest attempt's score is reported"""
+        exam = self.exams[0]
+        StudentExam.objects.create(student=self.user, exam=exam, score=20)
+        latest = StudentExam.objects.create(student=self.user, exam=exam, score=80)
+
+        _, exams_status = exam_dashboard(self.user)
+        status = exams_status[0]
+        self.assertTrue(status['completed'])
+        self.assertEqual(status['score'], 80)
+        self.assertEqual(status['student_exam_id'], latest.id)
+        self.assertEqual(status['question_count'], 1)
+        self.assertFalse(exams_status[1]['completed'])
+
+    def test_constant_number_of_queries(self):
+        """Test that the dashboard cost does not grow with the catalog"""
+        for exam in self.exams:
+            StudentExam.objects.create(student=self.user, exam=exam, score=90)
+
+        with self.assertNumQueries(2):
+            exam_dashboard(self.user)
+
+    def test_pagination(self):
+        """Test that out-of-range pages fall back to the last page"""
+        page, exams_status = exam_dashboard(self.user, page=99, per_page=2)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(exams_status), 1)
+
+
+class GradingTestCase(TestCase):
+    """Test the set-based grading engine"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.exam = Exam.objects.create(title="Exam", description="Description", duration=30)
+        self.questions = [
+            Question.objects.create(exam=self.exam, text=f"Q{i}?", question_type='TXT', correct_answer="Paris")
+            for i in range(4)
+        ]
+        self.student_exam = StudentExam.objects.create(student=self.user, exam=self.exam)
+
+    def test_grade_submission(self):
+        """Test scoring and answer upsert"""
+        responses = {q.id: " paris " for q in self.questions[:3]}
+        self.assertEqual(grade_submission(self.student_exam, responses), 75)
+
+        # Resubmitting updates the existing rows instead of adding new ones
+        grade_submission(self.student_exam, {self.questions[0].id: "Paris"})
+        self.assertEqual(Answer.objects.filter(student_exam=self.student_exam).count(), 4)
+        self.student_exam.refresh_from_db()
+        self.assertEqual(self.student_exam.score, 25)
+
+    def test_grade_submission_query_count(self):
+        """Test that grading cost does not depend on the number of questions"""
+        responses = {q.id: "Paris" for q in self.questions}
+        # questions, savepoint, upsert, update, release, plus the student's leaderboard
+        # entry (3 reads, update, then insert within a savepoint for a first graded exam)
+        with self.assertNumQueries(12):
+            grade_submission(self.student_exam, responses)
+
+    def test_regrade_exam(self):
+        """Test re-grading after the expected answer changes"""
+        grade_submission(self.student_exam, {q.id: "Lyon" for q in self.questions})
+        Question.objects.filter(exam=self.exam).update(correct_answer="Lyon")
+
+        self.assertEqual(regrade_exam(self.exam, batch_size=1), 1)
+        self.student_exam.refresh_from_db()
+        self.assertEqual(self.student_exam.score, 100)
+
+    def test_regrade_exam_refreshes_leaderboard(self):
+        """Test that re-graded scores reach the leaderboard although bulk_update sends no signals"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        other_exam = StudentExam.objects.create(student=other, exam=self.exam)
+        grade_submission(self.student_exam, {q.id: "Lyon" for q in self.questions})
+        grade_submission(other_exam, {q.id: "Lyon" for q in self.questions[:2]})
+        Question.objects.filter(exam=self.exam).update(correct_answer="Lyon")
+
+        regrade_exam(self.exam, batch_size=1)
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.user).exam_points, 100)
+        self.assertEqual(LeaderboardEntry.objects.get(user=other).exam_points, 50)
+
+
+class CertificateRendererTestCase(TestCase):
+    """Test in-memory certificate rendering"""
+
+    def test_render_reuses_template(self):
+        """Test that repeated renders work from the cached template"""
+        renderer = CertificateRenderer()
+        first = renderer.render("Alice", "Exam One")
+        template_page = renderer._template_page
+        second = renderer.render("Bob", "Exam Two")
+
+        self.assertTrue(first.startswith(b"%PDF"))
+        self.assertTrue(second.startswith(b"%PDF"))
+        self.assertIs(renderer._template_page, template_page)
+
+
+@patch('examan.tasks.generate_certificate', return_value=b"%PDF-1.4 test")
+class CertificateJobTestCase(TestCase):
+    """Test the background certificate generation of passed exams"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.client.force_login(self.user)
+        self.exam = Exam.objects.create(title="Exam", description="Description", duration=30)
+        self.questions = [
+            Question.objects.create(exam=self.exam, text=f"Q{i}?", question_type='TXT', correct_answer="Paris")
+            for i in range(2)
+        ]
+        self.status_url = reverse('certificate_status', args=[self.exam.id])
+
+    def submit(self, answer):
+        # on_commit callbacks are captured, not run: the job stays pending
+        with self.captureOnCommitCallbacks():
+            self.client.post(reverse('submit_exam', args=[self.exam.id]),
+                             {f"q{q.id}": answer for q in self.questions})
+
+    def status(self):
+        return self.client.get(self.status_url).json()
+
+    def test_passing_exam_queues_one_job(self, render):
+        """Test that submitting a passing exam twice queues a single certificate job"""
+        self.submit("Paris")
+        self.submit("Paris")
+
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.key, f"certificate:{self.user.pk}:{self.exam.pk}")
+        self.assertEqual(job.status, BackgroundJob.PENDING)
+        self.assertEqual(self.status(), {'status': 'pending', 'url': None})
+
+    def test_failed_exam_has_no_certificate(self, render):
+        """Test that a failed exam queues nothing and reports the 'none' status"""
+        self.submit("Lyon")
+
+        self.assertFalse(BackgroundJob.objects.exists())
+        self.assertEqual(self.status(), {'status': 'none', 'url': None})
+
+    @patch('examan.certificates.uploader.upload', return_value={'public_id': 'certificates/abc'})
+    def test_status_done_once_uploaded(self, upload, render):
+        """Test that the job uploads the certificate and the status then gives its URL"""
+        self.submit("Paris")
+        run_job(BackgroundJob.objects.get().pk)
+
+        status = self.status()
+        self.assertEqual(status['status'], 'done')
+        self.assertIn("certificates/abc", status['url'])
+        self.assertEqual(str(Certificate.objects.get().file_path), 'certificates/abc')
+
+    @patch('examan.certificates.uploader.upload', side_effect=ConnectionError("Cloudinary down"))
+    def test_status_failed_when_upload_fails(self, upload, render):
+        """Test that a failed upload is reported as failed, without a certificate file"""
+        self.submit("Paris")
+        run_job(BackgroundJob.objects.get().pk)
+
+        self.assertEqual(self.status(), {'status': 'failed', 'url': None})
+        self.assertFalse(Certificate.objects.exclude(file_path='').exclude(file_path__isnull=True).exists())
+
+
+class FakeRenderer:
+    def render(self, student_name, exam_title):
+        return f"{student_name}|{exam_title}".encode()
+
+
+def fake_upload(pdf_bytes):
+    student_name, exam_title = pdf_bytes.decode().split("|")
+    if student_name == "broken":
+        raise ConnectionError("Cloudinary down")
+    return f"certificates/{student_name}-{exam_title}"
+
+
+COMMAND = 'examan.management.commands.issue_certificates'
+
+
+@patch(f'{COMMAND}.connections')
+@patch(f'{COMMAND}.ProcessPoolExecutor', ThreadPoolExecutor)
+@patch(f'{COMMAND}.upload_certificate_pdf', side_effect=fake_upload)
+@patch(f'{COMMAND}.get_renderer', return_value=FakeRenderer())
+class IssueCertificatesCommandTestCase(TestCase):
+    """Test the issue_certificates command, rendering and uploads stubbed, workers as threads"""
+
+    def setUp(self):
+        self.exam = Exam.objects.create(title="Python", description="Description", duration=30)
+        self.other_exam = Exam.objects.create(title="Django", description="Description", duration=30)
+
+    def attempt(self, username, score=80, exam=None):
+        user = User.objects.get_or_create(username=username)[0]
+        StudentExam.objects.create(student=user, exam=exam or self.exam, score=score)
+        return user
+
+    def certificate(self, user, file_path, issued_at):
+        certificate = Certificate.objects.create(student=user, exam=self.exam, file_path=file_path)
+        Certificate.objects.filter(pk=certificate.pk).update(date_issued=issued_at)
+
+    def issue(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('issue_certificates', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def files(self):
+        return sorted(str(c.file_path) for c in Certificate.objects.all())
+
+    def test_only_missing_certificates_issued(self, *mocks):
+        """Test that passing attempts without a certificate file are issued, once per student and exam"""
+        alice = self.attempt("alice")
+        self.attempt("alice")  # second passing attempt
+        self.attempt("bob", score=20)
+        carol = self.attempt("carol")
+        self.certificate(carol, "certificates/old-carol", timezone.now())
+        dave = self.attempt("dave")
+        self.certificate(dave, "", timezone.now())  # row left by a failed job
+
+        out, _ = self.issue()
+        self.assertIn("2 certificate(s) to issue", out)
+        self.assertIn("Issued 2 certificate(s), 0 failure(s)", out)
+        self.assertEqual(self.files(), ["certificates/alice-Python", "certificates/dave-Python",
+                                        "certificates/old-carol"])
+        self.assertEqual(Certificate.objects.filter(student=alice).count(), 1)
+        self.assertEqual(self.issue()[0].splitlines()[0], "0 certificate(s) to issue with 4 worker(s)")
+
+    def test_exam_filter_and_dry_run(self, *mocks):
+        """Test --exam and that --dry-run only lists the certificates"""
+        self.attempt("alice")
+        self.attempt("bob", exam=self.other_exam)
+
+        out, _ = self.issue('--exam', str(self.other_exam.pk), '--dry-run')
+        self.assertIn("1 certificate(s) to issue", out)
+        self.assertIn("bob - Django", out)
+        self.assertFalse(Certificate.objects.exists())
+
+    def test_reissue_resumes_from_issued_before(self, *mocks):
+        """Test that --reissue --issued-before only redoes certificates older than that run"""
+        started = timezone.now() - timedelta(hours=1)
+        self.certificate(self.attempt("alice"), "certificates/old-alice", started - timedelta(days=1))
+        self.certificate(self.attempt("bob"), "certificates/new-bob", started + timedelta(minutes=5))
+
+        out, _ = self.issue('--reissue', '--issued-before', started.isoformat())
+        self.assertIn(f"Re-issuing certificates issued before {started.isoformat()}", out)
+        self.assertEqual(self.files(), ["certificates/alice-Python", "certificates/new-bob"])
+
+    def test_failures_collected(self, *mocks):
+        """Test that a failed upload is reported and the other certificates are still saved"""
+        self.attempt("alice")
+        self.attempt("broken")
+
+        out, err = self.issue('--workers', '2')
+        self.assertIn("Issued 1 certificate(s), 1 failure(s)", out)
+        self.assertIn("broken - Python: Cloudinary down", err)
+        self.assertEqual(self.files(), ["certificates/alice-Python"])
 
-# Create your tests here.
+    def test_invalid_options(self, *mocks):
+        """Test that bad --workers and --issued-before values are refused"""
+        with self.assertRaises(CommandError):
+            self.issue('--workers', '0')
+        with self.assertRaises(CommandError):
+            self.issue('--reissue', '--issued-before', 'yesterday')
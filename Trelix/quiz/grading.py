@@ -0,0 +1,65 @@
+from django.core.cache import cache
+
+from .models import Question, Choice
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def answer_key_cache_key(quiz_id):
+    return f"quiz:{quiz_id}:answer_key"
+
+
+def build_answer_key(quiz_id):
+    """
+    Answer key of a quiz: {question_id: {'points': int, 'choices': {choice_id: is_correct}}}.
+    Built with two queries whatever the number of questions.
+    """
+    answer_key = {
+        question_id: {'points': points, 'choices': {}}
+        for question_id, points in Question.objects.filter(quiz_id=quiz_id).values_list('id', 'points')
+    }
+    choices = Choice.objects.filter(question__quiz_id=quiz_id).values_list('id', 'question_id', 'is_correct')
+    for choice_id, question_id, is_correct in choices:
+        answer_key[question_id]['choices'][choice_id] = is_correct
+    return answer_key
+
+
+def get_answer_key(quiz_id):
+    """Cached answer key, invalidated when a Question or Choice of the quiz changes."""
+    key = answer_key_cache_key(quiz_id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        cache.set(key, answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id):
+    cache.delete(answer_key_cache_key(quiz_id))
+
+
+def grade_quiz(quiz, data):
+    """
+    Grade a submitted quiz form (choice ids posted as "question_<question_id>").
+
+    A submitted choice only counts if it belongs to the question it was
+    posted for. Everything is checked against the cached answer key, so a
+    warm grading costs no query.
+
+    Returns:
+        tuple: (score as a percentage rounded to 2 decimals, points earned, total points)
+    """
+    answer_key = get_answer_key(quiz.id)
+    total = sum(question['points'] for question in answer_key.values())
+    points = 0
+
+    for question_id, question in answer_key.items():
+        choice_id = data.get(f"question_{question_id}")
+        if not choice_id or not str(choice_id).isdigit():
+            continue
+        # Unknown ids and choices of another question are ignored
+        if question['choices'].get(int(choice_id)):
+            points += question['points']
+
+    score = round((points / total) * 100, 2) if total else 0
+    return score, points, total
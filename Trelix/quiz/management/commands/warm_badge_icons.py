@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import Badge
+from quiz.tasks import DEFAULT_BADGES, generate_badge_icon, get_medal_png
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render the Gold/Silver/Bronze badge icons at deploy time so that no quiz "
+        "submission has to wait for one. Icons are drawn locally unless --from-api is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Re-render and re-upload icons that already exist")
+        parser.add_argument('--from-api', action='store_true',
+                            help="Generate the icons with the Stability AI API (local medal on failure)")
+
+    def handle(self, *args, **options):
+        for name in DEFAULT_BADGES:
+            badge, created = Badge.objects.get_or_create(name=name)
+            # Local medal cache, used as placeholder and fallback
+            get_medal_png(badge)
+
+            try:
+                result = generate_badge_icon(
+                    badge.pk,
+                    force=options['force'],
+                    use_api=True if options['from_api'] else None,
+                )
+            except Exception as e:
+                self.stderr.write(f"❌ {name}: {str(e)}")
+                continue
+
+            if result['fallback'] is None:
+                self.stdout.write(f"✔ {name}: icon already present ({result['icon']})")
+            else:
+                source = "local medal" if result['fallback'] else "Stability AI"
+                self.stdout.write(f"✅ {name}: uploaded {result['icon']} ({source})")
@@ -5,6 +5,8 @@ from cloudinary.models import CloudinaryField
 from cloudinary import uploader
 from .utils import generate_badge_image
 from django.utils.text import slugify
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 import os
 
 
@@ -51,6 +53,20 @@ class Choice(models.Model):
     def __str__(self):
         return self.text
 
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_quiz_answer_key_on_question_change(sender, instance, **kwargs):
+    from .grading import invalidate_answer_key
+    invalidate_answer_key(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_quiz_answer_key_on_choice_change(sender, instance, **kwargs):
+    from .grading import invalidate_answer_key
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    if quiz_id is not None:
+        invalidate_answer_key(quiz_id)
+
+
 class UserBadge(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     badge = models.ForeignKey('Badge', on_delete=models.CASCADE)
@@ -0,0 +1,116 @@
+from io import BytesIO
+
+from cloudinary import uploader
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from Trelix.jobs import enqueue, get_job
+from .models import Badge
+from .utils.badge_image import generate_badge_image, render_badge_medal
+
+# Badges awarded by quiz_detail, pre-rendered by the warm_badge_icons command
+DEFAULT_BADGES = ["Gold Badge", "Silver Badge", "Bronze Badge"]
+MEDAL_CACHE_TIMEOUT = None  # rendering is deterministic, the PNG never goes stale
+
+
+def badge_icon_job_key(badge):
+    return f"badge-icon:{badge.slug}"
+
+
+def medal_cache_key(slug):
+    return f"badge-medal:{slug}"
+
+
+def get_medal_png(badge):
+    """PNG bytes of the locally drawn medal of a badge, cached by slug."""
+    key = medal_cache_key(badge.slug)
+    png = cache.get(key)
+    if png is None:
+        buffer = BytesIO()
+        render_badge_medal(badge.name).save(buffer, format='PNG')
+        png = buffer.getvalue()
+        cache.set(key, png, MEDAL_CACHE_TIMEOUT)
+    return png
+
+
+def badge_placeholder(badge):
+    """URL of the local medal, shown until (or instead of) the uploaded icon."""
+    return reverse('badge_medal', args=[badge.slug])
+
+
+def upload_badge_icon(badge, pil_image):
+    """Upload a PIL image to Cloudinary from memory and store it as the badge icon."""
+    img_buffer = BytesIO()
+    pil_image.save(img_buffer, format='PNG')
+    img_buffer.seek(0)
+
+    # One asset per badge: re-generating replaces it instead of piling up uploads
+    upload_result = uploader.upload(
+        img_buffer,
+        folder="badges",
+        public_id=badge.slug,
+        overwrite=True,
+        resource_type="image",
+        format="png"
+    )
+    if not upload_result or 'public_id' not in upload_result:
+        raise ValueError(f"Incomplete Cloudinary upload result: {upload_result}")
+
+    badge.icon = upload_result['public_id']
+    # Use update_fields to avoid triggering save() recursively
+    badge.save(update_fields=['icon'])
+    return badge
+
+
+def render_badge_icon(badge, use_api=None):
+    """
+    Image for a badge icon: the local medal, or the Stability AI image when
+    use_api (default settings.BADGE_ICON_USE_API) is set.
+
+    Returns:
+        tuple: (PIL.Image, bool) where bool indicates the API was not used
+    """
+    if use_api is None:
+        use_api = settings.BADGE_ICON_USE_API
+    if use_api:
+        # Falls back to the same local medal when the API fails
+        return generate_badge_image(badge.name)
+    return render_badge_medal(badge.name), True
+
+
+def generate_badge_icon(badge_id, force=False, use_api=None):
+    """
+    Background task: render and upload the icon of a badge.
+    Does nothing if the badge already has an icon, unless force is set.
+    """
+    badge = Badge.objects.get(pk=badge_id)
+    is_fallback = None
+    if force or not badge.icon:
+        pil_image, is_fallback = render_badge_icon(badge, use_api)
+        upload_badge_icon(badge, pil_image)
+
+    return {'badge_id': badge.pk, 'icon': str(badge.icon), 'fallback': is_fallback}
+
+
+def enqueue_badge_icon(badge):
+    """
+    Schedule icon generation for a badge. Concurrent passes for the same badge
+    share a single job (keyed by slug).
+    """
+    return enqueue(
+        'quiz.tasks.generate_badge_icon',
+        key=badge_icon_job_key(badge),
+        payload={'badge_id': badge.pk},
+    )
+
+
+def badge_icon_status(badge):
+    """
+    Returns:
+        dict: {'status': 'done'|'pending'|'running'|'failed'|'none', 'url': str or None}
+    """
+    if badge.icon:
+        return {'status': 'done', 'url': badge.icon.url}
+    job = get_job(badge_icon_job_key(badge))
+    return {'status': job.status if job else 'none', 'url': None}
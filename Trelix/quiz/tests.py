@@ -1,3 +1,132 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.core.cache import cache
+from .models import Quiz, Question, Choice, Badge
+from .grading import grade_quiz
+from .tasks import generate_badge_icon, medal_cache_key
+from .utils.badge_image import render_badge_medal
+from Trelix.models import BackgroundJob
 
-# Create your tests here.
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class QuizGradingTestCase(TestCase):
+    """Test answer-key based quiz grading"""
+
+    def setUp(self):
+        cache.clear()
+        self.quiz = Quiz.objects.create(title="Quiz", pass_mark=50)
+        self.q1 = Question.objects.create(quiz=self.quiz, text="Q1", points=1)
+        self.q2 = Question.objects.create(quiz=self.quiz, text="Q2", points=3)
+        self.q1_right = Choice.objects.create(question=self.q1, text="right", is_correct=True)
+        self.q1_wrong = Choice.objects.create(question=self.q1, text="wrong")
+        self.q2_right = Choice.objects.create(question=self.q2, text="right", is_correct=True)
+
+    def test_grade_quiz(self):
+        """Test weighted scoring"""
+        data = {f"question_{self.q1.id}": str(self.q1_wrong.id), f"question_{self.q2.id}": str(self.q2_right.id)}
+        self.assertEqual(grade_quiz(self.quiz, data), (75.0, 3, 4))
+
+    def test_choice_must_belong_to_question(self):
+        """Test that a correct choice posted for another question is ignored"""
+        data = {f"question_{self.q1.id}": str(self.q2_right.id), f"question_{self.q2.id}": "not-an-id"}
+        self.assertEqual(grade_quiz(self.quiz, data), (0, 0, 4))
+
+    def test_warm_grading_needs_no_query(self):
+        """Test that the cached answer key makes grading query-free"""
+        data = {f"question_{self.q1.id}": str(self.q1_right.id)}
+        grade_quiz(self.quiz, data)
+        with self.assertNumQueries(0):
+            self.assertEqual(grade_quiz(self.quiz, data), (25.0, 1, 4))
+
+    def test_answer_key_invalidated_on_choice_save(self):
+        """Test that editing a choice is reflected immediately"""
+        data = {f"question_{self.q1.id}": str(self.q1_wrong.id)}
+        self.assertEqual(grade_quiz(self.quiz, data)[1], 0)
+
+        self.q1_wrong.is_correct = True
+        self.q1_wrong.save()
+        self.assertEqual(grade_quiz(self.quiz, data)[1], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class QuizDetailRenderingTestCase(TestCase):
+    """Test that rendering a quiz costs a fixed number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.client.force_login(self.user)
+        self.quiz = Quiz.objects.create(title="Big quiz")
+        for i in range(50):
+            question = Question.objects.create(quiz=self.quiz, text=f"Question {i}")
+            Choice.objects.bulk_create([
+                Choice(question=question, text=f"Choice {j}", is_correct=(j == 0)) for j in range(3)
+            ])
+
+    def test_quiz_detail_query_count(self):
+        """Test rendering a 50-question quiz"""
+        # session, user, profile (context processor), quiz, questions, choices
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('quiz_detail', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Question 49")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BadgeIconOffloadTestCase(TestCase):
+    """Test that badge icons are generated outside the submission request"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.client.force_login(self.user)
+        self.quiz = Quiz.objects.create(title="Quiz", pass_mark=50)
+        question = Question.objects.create(quiz=self.quiz, text="Q1")
+        self.right = Choice.objects.create(question=question, text="right", is_correct=True)
+        self.data = {f"question_{question.id}": str(self.right.id)}
+
+    def test_passing_renders_placeholder_and_enqueues_once(self):
+        """Test placeholder rendering and job de-duplication"""
+        url = reverse('quiz_detail', args=[self.quiz.id])
+        response = self.client.post(url, self.data)
+        self.client.post(url, self.data)
+
+        self.assertContains(response, 'id="badge-icon"')
+        self.assertEqual(BackgroundJob.objects.filter(key='badge-icon:gold-badge').count(), 1)
+
+        status = self.client.get(reverse('badge_icon_status', args=['gold-badge'])).json()
+        self.assertEqual(status, {'status': 'pending', 'url': None})
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BADGE_ICON_USE_API=False)
+class BadgeMedalTestCase(TestCase):
+    """Test the locally drawn badge medal used as icon fallback"""
+
+    def setUp(self):
+        cache.clear()
+        self.badge = Badge.objects.create(name="Gold Badge", icon="badges/gold-badge")
+
+    def test_medal_is_deterministic(self):
+        """Test that the same badge always renders the same medal"""
+        first = render_badge_medal("Gold Badge", size=128)
+        self.assertEqual(first.size, (128, 128))
+        self.assertEqual(first.tobytes(), render_badge_medal("Gold Badge", size=128).tobytes())
+        self.assertNotEqual(first.tobytes(), render_badge_medal("Bronze Badge", size=128).tobytes())
+
+    def test_medal_view_serves_cached_png(self):
+        """Test that the medal is served as PNG and cached by slug"""
+        response = self.client.get(reverse('badge_medal', args=[self.badge.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(cache.get(medal_cache_key(self.badge.slug)), response.content)
+
+    def test_icon_rendered_locally_by_default(self):
+        """Test that the API is not called unless enabled"""
+        with patch('quiz.tasks.generate_badge_image') as api, patch('quiz.tasks.upload_badge_icon') as upload:
+            result = generate_badge_icon(self.badge.pk, force=True)
+        api.assert_not_called()
+        upload.assert_called_once()
+        self.assertTrue(result['fallback'])
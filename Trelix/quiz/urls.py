@@ -5,4 +5,6 @@ urlpatterns = [
     path("", views.quiz_list, name="quiz_list"),
     path("<int:quiz_id>/", views.quiz_detail, name="quiz_detail"),
     path("badges/", views.my_badges, name="my_badges"),
+    path("badges/<slug:slug>/icon/", views.badge_icon_status_view, name="badge_icon_status"),
+    path("badges/<slug:slug>/medal.png", views.badge_medal_view, name="badge_medal"),
 ]
@@ -1,8 +1,19 @@
 # badge_image.py
 import base64
+import hashlib
+import math
+import os
 import requests
 from io import BytesIO
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
+
+# Medal colours per tier: (main, rim, highlight)
+TIER_COLORS = {
+    "gold": ((245, 190, 30), (176, 125, 10), (255, 226, 120)),
+    "silver": ((190, 194, 204), (120, 126, 138), (235, 238, 245)),
+    "bronze": ((205, 127, 50), (130, 74, 24), (236, 170, 110)),
+}
+RIBBON_COLORS = ((102, 126, 234), (118, 75, 162))
 
 # Load STABILITY_KEY dynamically to ensure we get the latest value
 def get_stability_key():
@@ -10,17 +21,89 @@ def get_stability_key():
     return getattr(settings, "STABILITY_API_KEY", None)
 
 
+def tier_colors(badge_name: str):
+    """Tier colours for a badge name; unknown badges get a stable colour derived from the name."""
+    lowered = badge_name.lower()
+    for tier, colors in TIER_COLORS.items():
+        if tier in lowered:
+            return colors
+
+    digest = hashlib.md5(badge_name.encode("utf-8")).digest()
+    main = (80 + digest[0] % 150, 80 + digest[1] % 150, 80 + digest[2] % 150)
+    rim = tuple(int(c * 0.6) for c in main)
+    highlight = tuple(min(255, int(c * 1.3)) for c in main)
+    return main, rim, highlight
+
+
+def _load_font(size: int):
+    from django.conf import settings
+    font_path = os.path.join(settings.BASE_DIR, "Trelix", "static", "fonts", "OpenSans-SemiBold.ttf")
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def _star_points(cx: float, cy: float, outer: float, inner: float):
+    points = []
+    for i in range(10):
+        radius = outer if i % 2 == 0 else inner
+        angle = -math.pi / 2 + i * math.pi / 5
+        points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+    return points
+
+
+def render_badge_medal(badge_name: str, size: int = 512):
+    """
+    Draw a medal locally with Pillow: ribbon, tier-coloured disc, star and name.
+    Deterministic for a given name and size, no network access.
+    Returns a PIL.Image (RGBA, transparent background).
+    """
+    main, rim, highlight = tier_colors(badge_name)
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    s = size / 512
+
+    # Ribbon
+    draw.polygon([(150 * s, 0), (230 * s, 0), (290 * s, 200 * s), (210 * s, 200 * s)], fill=RIBBON_COLORS[0])
+    draw.polygon([(362 * s, 0), (282 * s, 0), (222 * s, 200 * s), (302 * s, 200 * s)], fill=RIBBON_COLORS[1])
+
+    # Medal disc with rim and inner ring
+    cx, cy, radius = 256 * s, 316 * s, 180 * s
+    draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=rim)
+    inner = radius - 16 * s
+    draw.ellipse([cx - inner, cy - inner, cx + inner, cy + inner], fill=main)
+    ring = inner - 14 * s
+    draw.ellipse([cx - ring, cy - ring, cx + ring, cy + ring], outline=highlight, width=max(1, int(5 * s)))
+
+    # Star
+    draw.polygon(_star_points(cx, cy - 30 * s, 80 * s, 34 * s), fill=highlight, outline=rim)
+
+    # Name, e.g. "GOLD" for "Gold Badge"
+    label = badge_name.replace("Badge", "").strip().upper() or badge_name.upper()
+    font = _load_font(max(10, int(44 * s)))
+    while draw.textlength(label, font=font) > 2 * ring - 30 * s and font.size > 10:
+        font = _load_font(font.size - 2)
+    draw.text((cx, cy + 95 * s), label, fill=rim, font=font, anchor="mm")
+
+    return img
+
+
+def generate_fallback_image(badge_name: str):
+    return render_badge_medal(badge_name), True
+
+
 def generate_badge_image(badge_name: str):
     """
-    Generate badge image using Stability AI API or return fallback.
+    Generate badge image using Stability AI API or return the locally drawn medal
+    (render_badge_medal) as fallback.
     Returns tuple: (PIL.Image, bool) where bool indicates if it's a fallback.
     """
     # Re-check STABILITY_KEY each time in case settings changed
     stability_key = get_stability_key()
     if not stability_key:
         print("⚠️ STABILITY_API_KEY missing - using fallback image")
-        fallback_img = Image.new("RGB", (512, 512), (100, 100, 200))
-        return fallback_img, True  # Return image and is_fallback=True
+        return generate_fallback_image(badge_name)  # Return image and is_fallback=True
 
     url = "https://api.stability.ai/v2beta/stable-image/generate/sd3"
 
@@ -39,14 +122,12 @@ def generate_badge_image(badge_name: str):
         response = requests.post(url, headers=headers, files=files, timeout=90)
     except requests.RequestException as e:
         print(f"Request exception: {e}")
-        fallback_img = Image.new("RGB", (512, 512), (100, 100, 200))
-        return fallback_img, True
+        return generate_fallback_image(badge_name)
 
     print(f"🔄 API Status: {response.status_code}")
     if response.status_code != 200:
         print(f"❌ API error {response.status_code}: {response.text[:500]}")
-        fallback_img = Image.new("RGB", (512, 512), (100, 100, 200))
-        return fallback_img, True
+        return generate_fallback_image(badge_name)
 
     try:
         data = response.json()
@@ -55,8 +136,7 @@ def generate_badge_image(badge_name: str):
         img_b64 = data.get("image")
         if not img_b64:
             print("No 'image' field in response")
-            fallback_img = Image.new("RGB", (512, 512), (100, 100, 200))
-            return fallback_img, True
+            return generate_fallback_image(badge_name)
 
         img_bytes = base64.b64decode(img_b64)
         img = Image.open(BytesIO(img_bytes))
@@ -66,5 +146,4 @@ def generate_badge_image(badge_name: str):
 
     except Exception as exc:
         print(f"Image processing error: {exc}")
-        fallback_img = Image.new("RGB", (512, 512), (100, 100, 200))
-        return fallback_img, True
\ No newline at end of file
+        return generate_fallback_image(badge_name)
\ No newline at end of file
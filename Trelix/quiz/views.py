@@ -1,12 +1,12 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.files import File
-from django.conf import settings
-from cloudinary import uploader
-from io import BytesIO
-from .models import Quiz, Choice, UserBadge, Badge
-from .utils.badge_image import generate_badge_image
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.db.models import prefetch_related_objects
+from .models import Quiz, UserBadge, Badge
+from .grading import grade_quiz
+from .tasks import enqueue_badge_icon, badge_icon_status, badge_placeholder, get_medal_png
 
 @login_required(login_url='signin')
 def quiz_list(request):
@@ -19,21 +19,7 @@ def quiz_detail(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id, is_active=True)
 
     if request.method == "POST":
-        questions = quiz.questions.all()
-        total = sum(q.points for q in questions)
-        points = 0
-
-        for q in questions:
-            choice_id = request.POST.get(f"question_{q.id}")
-            if choice_id:
-                try:
-                    choice = Choice.objects.get(id=choice_id)
-                    if choice.is_correct:
-                        points += q.points
-                except Choice.DoesNotExist:
-                    pass
-
-        score = round((points / total) * 100, 2)
+        score, points, total = grade_quiz(quiz, request.POST)
         passed = score >= quiz.pass_mark
         badge = None
 
@@ -48,59 +34,9 @@ def quiz_detail(request, quiz_id):
 
             badge, created = Badge.objects.get_or_create(name=badge_name)
 
-            # ✅ Génération automatique de l'icône si elle n'existe pas ou si badge vient d'être créé
-            # Regenerate if badge was just created OR if icon doesn't exist
-            if created:
-                print(f"🆕 New badge created: {badge_name}")
-            elif not badge.icon:
-                print(f"🔄 Badge exists but has no icon: {badge_name}")
-            else:
-                print(f"ℹ️ Badge already has icon (will not regenerate): {badge_name}")
-                
-            if created or not badge.icon:
-                print(f"🎨 Generating image for badge: {badge_name}")
-                pil_image, is_fallback = generate_badge_image(badge_name)
-                
-                if is_fallback:
-                    print(f"⚠️ Generated image is fallback (blue) - API likely failed. Not saving to avoid overwriting.")
-                    print(f"⚠️ Will retry on next badge creation. Check STABILITY_API_KEY and API status.")
-                    # Don't save fallback images - leave icon empty so it retries next time
-                else:
-                    # Image is valid (not fallback), upload directly from memory to Cloudinary
-                    try:
-                        # Convert PIL Image to BytesIO for upload
-                        img_buffer = BytesIO()
-                        pil_image.save(img_buffer, format='PNG')
-                        img_buffer.seek(0)
-                        
-                        # Upload to Cloudinary from memory
-                        upload_result = uploader.upload(
-                            img_buffer,
-                            folder="badges",
-                            resource_type="image",
-                            format="png"
-                        )
-                        
-                        if upload_result and 'public_id' in upload_result:
-                            badge.icon = upload_result['public_id']
-                            # Use update_fields to avoid triggering save() recursively
-                            badge.save(update_fields=['icon'])
-                            print(f"✅ Badge icon uploaded to Cloudinary: {upload_result['public_id']}")
-                        else:
-                            print(f"⚠️ Upload result incomplete: {upload_result}")
-                    except Exception as e:
-                        print(f"❌ Cloudinary upload error: {str(e)}")
-                        # If upload fails, try the File.save method as fallback
-                        try:
-                            if badge.pk:
-                                img_buffer = BytesIO()
-                                pil_image.save(img_buffer, format='PNG')
-                                img_buffer.seek(0)
-                                badge.icon.save(f"{badge_name.replace(' ', '_').lower()}.png", File(img_buffer), save=False)
-                                badge.save(update_fields=['icon'])
-                                print(f"✅ Badge icon saved via fallback method")
-                        except Exception as e2:
-                            print(f"❌ Fallback save also failed: {str(e2)}")
+            # ✅ Génération de l'icône en tâche de fond (une seule tâche par badge)
+            if not badge.icon:
+                enqueue_badge_icon(badge)
 
             UserBadge.objects.get_or_create(
                 user=request.user,
@@ -110,9 +46,16 @@ def quiz_detail(request, quiz_id):
             )
             messages.success(request, f"🎉 Tu as gagné un nouveau badge : {badge.name}")
 
-        return render(request, "quiz/quiz_result.html",
-                      {"quiz": quiz, "score": score, "passed": passed, "badge": badge})
+        return render(request, "quiz/quiz_result.html", {
+            "quiz": quiz,
+            "score": score,
+            "passed": passed,
+            "badge": badge,
+            "badge_placeholder": badge_placeholder(badge) if badge else None,
+        })
 
+    # One query for all questions and one for all their choices, whatever the quiz size
+    prefetch_related_objects([quiz], "questions__choices")
     return render(request, "quiz/quiz_detail.html", {"quiz": quiz})
 
 
@@ -120,3 +63,17 @@ def quiz_detail(request, quiz_id):
 def my_badges(request):
     badges = UserBadge.objects.filter(user=request.user).select_related("badge", "quiz")
     return render(request, "quiz/my_badges.html", {"badges": badges})
+
+
+@login_required(login_url='signin')
+def badge_icon_status_view(request, slug):
+    """Polled by quiz/quiz_result.html until the generated icon is available."""
+    badge = get_object_or_404(Badge, slug=slug)
+    return JsonResponse(badge_icon_status(badge))
+
+
+@cache_control(public=True, max_age=60 * 60 * 24 * 7)
+def badge_medal_view(request, slug):
+    """Locally drawn medal of a badge, used until (or instead of) the uploaded icon."""
+    badge = get_object_or_404(Badge, slug=slug)
+    return HttpResponse(get_medal_png(badge), content_type="image/png")